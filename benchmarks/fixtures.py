@@ -0,0 +1,77 @@
+"""
+Fixture skins for the benchmarks.
+
+The synthetic skins are generated from a fixed seed, so every run measures the same pixels: each face of the skin
+gets its own base colour with some noise, the second layer is sparse and half-transparent, and the unused columns of
+slim arms are left transparent, just like in skins made by hand.
+"""
+import random
+from dataclasses import dataclass
+from io import BytesIO
+from pathlib import Path
+from typing import Optional
+
+from PIL import Image
+
+from wavy_totem_lib.skin import REGIONS
+
+
+@dataclass(frozen=True)
+class Fixture:
+    name: str
+    png: bytes
+    size: tuple[int, int]
+    rgba: bytes
+    slim: Optional[bool]  # None if unknown (real skins are detected)
+
+
+def _synthetic(version: str, slim: bool, seed: int) -> Image.Image:
+    rnd = random.Random(seed)
+    height = 64 if version == 'new' else 32
+    image = Image.new('RGBA', (64, height))
+
+    for (part, second, slim_box), faces in REGIONS.items():
+        if part.endswith('_hand') and slim_box != slim:
+            continue
+        if version == 'old' and (part.startswith('left_') or (second and part != 'head')):
+            continue
+
+        for x1, y1, x2, y2 in faces.values():
+            base = [rnd.randrange(40, 216) for _ in range(3)]
+            for y in range(y1, y2):
+                for x in range(x1, x2):
+                    if second and rnd.random() > 0.35:
+                        continue
+                    color = tuple(min(255, max(0, c + rnd.randrange(-24, 25))) for c in base)
+                    alpha = rnd.choice((128, 255)) if second else 255
+                    image.putpixel((x, y), color + (alpha,))
+
+    return image
+
+
+def _fixture(name: str, image: Image.Image, slim: Optional[bool], png: Optional[bytes] = None) -> Fixture:
+    if png is None:
+        buffer = BytesIO()
+        image.save(buffer, 'PNG')
+        png = buffer.getvalue()
+    rgba = image.convert('RGBA')
+    return Fixture(name, png, rgba.size, rgba.tobytes(), slim)
+
+
+def synthetic_fixtures() -> list[Fixture]:
+    """Four synthetic skins: new and old, wide and slim (old skins are always wide, so old-slim is forced)."""
+    fixtures = []
+    for seed, (version, slim) in enumerate((('new', False), ('new', True), ('old', False), ('old', True))):
+        name = f'{version}-{"slim" if slim else "wide"}'
+        fixtures.append(_fixture(name, _synthetic(version, slim, seed), slim))
+    return fixtures
+
+
+def real_fixtures(directory: Path) -> list[Fixture]:
+    """Skins from a directory of PNG files, named after the files and sorted for stable results."""
+    fixtures = []
+    for path in sorted(directory.glob('*.png')):
+        png = path.read_bytes()
+        with Image.open(BytesIO(png)) as image:
+            fixtures.append(_fixture(path.stem, image, None, png))
+    return fixtures
@@ -0,0 +1,116 @@
+"""
+Import time of the library, measured in fresh interpreters with `-X importtime`.
+
+    python benchmarks/import_time.py                          # print the results
+    python benchmarks/import_time.py -o imports.json          # save them as JSON
+    python benchmarks/import_time.py -b imports.json          # compare with a stored run
+
+Every case runs a statement in a new interpreter several times and reports the median and the best run of the time
+spent importing, in microseconds. The modules a case must not load are checked as well, so a module imported
+eagerly again fails the run even when it is fast on this machine.
+"""
+import argparse
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Optional
+
+from run import compare
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# name -> (statement, modules it must not import)
+CASES = {
+    'import.package': ('import wavy_totem_lib', ('asyncio', 'concurrent.futures', 'PIL')),
+    'import.layers': ('from wavy_totem_lib import TopLayer', ('asyncio', 'concurrent.futures', 'PIL')),
+    'import.pattern': ("from wavy_totem_lib.patterns import get; get('wavy')",
+                       ('asyncio', 'concurrent.futures', 'wavy_totem_lib.patterns.soul')),
+    'import.builder': ('from wavy_totem_lib import TotemBuilder', ('asyncio', 'concurrent.futures')),
+}
+
+
+def measure(statement: str) -> tuple[int, set[str]]:
+    """
+    Runs the statement in a new interpreter.
+    Returns the microseconds spent importing and the names of the modules it imported.
+    """
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement], cwd=ROOT,
+                             capture_output=True, text=True, check=True)
+
+    total, modules, started = 0, set(), False
+    for line in process.stderr.splitlines():
+        if not line.startswith('import time:') or line.endswith('| imported package'):
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        if not cumulative.strip().isdigit():
+            continue  # The header
+        # Everything before the first module of the library is imported by the interpreter startup
+        started = started or name.strip().startswith('wavy_totem_lib')
+        if not started:
+            continue
+        modules.add(name.strip())
+        if not name[1:].startswith(' '):  # Top-level imports only, nested ones are in their cumulative time
+            total += int(cumulative)
+
+    return total, modules
+
+
+def _loaded(forbidden: tuple[str, ...], modules: set[str]) -> list[str]:
+    return [name for name in forbidden if any(module == name or module.startswith(name + '.') for module in modules)]
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Import time of wavy-totem-lib.')
+    parser.add_argument('-o', '--output', type=Path, help='write the results to this JSON file')
+    parser.add_argument('-b', '--baseline', type=Path, help='compare with the results stored in this JSON file')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='relative slowdown reported as a regression (default: 0.25)')
+    parser.add_argument('--repeats', type=int, default=9)
+    args = parser.parse_args(argv)
+
+    results: dict[str, dict] = {}
+    failures: list[str] = []
+    for name, (statement, forbidden) in CASES.items():
+        times = []
+        for _ in range(args.repeats):
+            total, modules = measure(statement)
+            times.append(total)
+            for module in _loaded(forbidden, modules):
+                failures.append(f'{name}: {statement!r} imports {module}')
+
+        results[name] = {'unit': 'us', 'median': statistics.median(times), 'min': min(times)}
+        print(f'{name:<52} {results[name]["median"]:>12.0f} us  (min {results[name]["min"]:.0f})')
+
+    report = {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+        },
+        'results': results,
+    }
+    if args.output is not None:
+        args.output.write_text(json.dumps(report, indent=2))
+
+    status = 0
+    for failure in sorted(set(failures)):
+        print(failure)
+        status = 1
+
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text())['results']
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f'\n{len(regressions)} case(s) slower than the baseline by more than {args.threshold:.0%}')
+            status = 1
+
+    return status
+
+
+if __name__ == '__main__':
+    sys.exit(main())
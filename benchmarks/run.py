@@ -0,0 +1,322 @@
+"""
+Benchmarks of every stage of the library.
+
+    python benchmarks/run.py                                  # print the results
+    python benchmarks/run.py -o results.json                  # save them as JSON
+    python benchmarks/run.py -b baseline.json                 # compare with a stored run
+    python benchmarks/run.py --skins path/to/skins -k scale   # real skins, only the matching benchmarks
+
+Times are per call in microseconds: every benchmark is repeated several times, each repeat runs enough calls to
+take at least `--min-time` seconds, and the median and the best repeat are reported.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from typing import Callable, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import PIL
+
+from fixtures import Fixture, synthetic_fixtures, real_fixtures
+from wavy_totem_lib import TotemBuilder, BatchBuilder, Skin, Totem, ALL_TOP_LAYERS
+from wavy_totem_lib.archive import ArchiveWriter, SkinArchive
+from wavy_totem_lib.compiler import compile_pattern, _compile
+from wavy_totem_lib.patterns import Wavy, STT, load_pattern
+from wavy_totem_lib.postprocess import Pipeline, RoundHead, Outline, Shadow, Tint, PaletteSwap
+from wavy_totem_lib.sources import HTTPSource, LocalSkinServer
+
+# Wavy described as a declarative spec, to compare with the Python pattern
+WAVY_SPEC = Path(__file__).resolve().parent / 'wavy.json'
+PATTERNS = {'wavy': Wavy, 'stt': STT, 'wavy_spec': load_pattern(WAVY_SPEC, register=False)}
+SCALE_FACTORS = (1, 2, 4, 8, 16, 32)
+
+
+class Runner:
+    def __init__(self, min_time: float, repeats: int, keyword: Optional[str]):
+        self.min_time = min_time
+        self.repeats = repeats
+        self.keyword = keyword
+        self.results: dict[str, dict] = {}
+
+    def wanted(self, name: str) -> bool:
+        return self.keyword is None or self.keyword in name
+
+    def time(self, name: str, func: Callable[[], object], per: int = 1):
+        """Measures the time of one call of `func`, divided by `per` items processed by the call."""
+        if not self.wanted(name):
+            return
+
+        func()  # warm up caches (compiled patterns, crops)
+        number = 1
+        while True:
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            elapsed = time.perf_counter() - start
+            if elapsed >= self.min_time:
+                break
+            number *= 2 if elapsed == 0 else max(2, min(10, int(self.min_time / elapsed) + 1))
+
+        runs = [elapsed / number]
+        for _ in range(self.repeats - 1):
+            start = time.perf_counter()
+            for _ in range(number):
+                func()
+            runs.append((time.perf_counter() - start) / number)
+
+        self._add(name, 'us', statistics.median(runs) * 1e6 / per, min(runs) * 1e6 / per, number=number)
+
+    def value(self, name: str, unit: str, value: float, **extra):
+        self._add(name, unit, value, value, **extra)
+
+    def _add(self, name: str, unit: str, median: float, best: float, **extra):
+        self.results[name] = {'unit': unit, 'median': round(median, 3), 'min': round(best, 3), **extra}
+        print(f'{name:<52} {median:>12.2f} {unit}', flush=True)
+
+
+def bench_skin(runner: Runner, fixture: Fixture):
+    slim = ... if fixture.slim is None else fixture.slim
+    runner.time(f'skin.load[{fixture.name}]', lambda: Skin(BytesIO(fixture.png), slim))
+    runner.time(f'skin.from_rgba[{fixture.name}]', lambda: Skin.from_rgba(fixture.rgba, *fixture.size, slim))
+
+    skin = Skin(BytesIO(fixture.png))
+    runner.time(f'skin.detect_slim[{fixture.name}]', skin._detect_slim)
+
+
+def bench_patterns(runner: Runner, fixture: Fixture):
+    slim = ... if fixture.slim is None else fixture.slim
+    for name, pattern in PATTERNS.items():
+        def reference():
+            # A new skin every time, so crops cached by the skin don't hide the cost of cropping
+            return pattern(Skin.from_rgba(fixture.rgba, *fixture.size, slim), ALL_TOP_LAYERS).image
+
+        runner.time(f'pattern.{name}.image[{fixture.name}]', reference)
+
+        skin = Skin.from_rgba(fixture.rgba, *fixture.size, slim)
+        compiled = compile_pattern(pattern, skin.is_slim, skin.version, ALL_TOP_LAYERS)
+        runner.time(f'pattern.{name}.compiled[{fixture.name}]', lambda: compiled.render(skin.pixels))
+
+        runner.time(f'builder.{name}.build[{fixture.name}]',
+                    lambda: TotemBuilder(Skin(BytesIO(fixture.png), slim), pattern).build())
+
+
+def bench_totem(runner: Runner, fixture: Fixture):
+    image = TotemBuilder(Skin(BytesIO(fixture.png))).build().image
+    for factor in SCALE_FACTORS:
+        totem = Totem(image, Wavy, False, ALL_TOP_LAYERS, False)
+        runner.time(f'totem.scale[x{factor}]', lambda: totem.scale(factor=factor))
+
+
+def bench_batch(runner: Runner, fixtures: list[Fixture], count: int):
+    skins = [Skin(BytesIO(fixtures[i % len(fixtures)].png)) for i in range(count)]
+    for name, pattern in PATTERNS.items():
+        builder = BatchBuilder(pattern)
+        runner.time(f'batch.{name}.per_skin[{count}]', lambda: builder.build(skins), per=count)
+
+
+def bench_post(runner: Runner, fixtures: list[Fixture], count: int):
+    # One totem as the builder runs the stages, then a whole batch buffer as `BatchBuilder` does
+    totems = [TotemBuilder(Skin(BytesIO(fixture.png)), round_head=False).build().tobytes() for fixture in fixtures]
+    batch = b''.join(totems[i % len(totems)] for i in range(count))
+    pipelines = {
+        'round_head': Pipeline([RoundHead()]),
+        'outline': Pipeline([Outline()]),
+        'shadow': Pipeline([Shadow()]),
+        'tint': Pipeline([Tint((255, 220, 180), 0.5)]),
+        'chain': Pipeline([RoundHead(), Shadow(), Outline((20, 20, 20)), Tint((255, 220, 180), 0.5),
+                           PaletteSwap({(0, 0, 0): (30, 0, 40)})]),
+    }
+    for name, pipeline in pipelines.items():
+        runner.time(f'post.{name}', lambda: pipeline.apply(totems[0]))
+        runner.time(f'post.{name}.per_totem[{count}]', lambda: pipeline.apply(batch, count=count), per=count)
+
+
+def bench_declarative(runner: Runner):
+    # Loading a spec, compiling it from scratch, and reading its compiled plans back from a plan directory
+    runner.time('declarative.load', lambda: load_pattern(WAVY_SPEC, register=False))
+
+    def compile_all(pattern):
+        _compile.cache_clear()
+        for slim in (False, True):
+            compile_pattern(pattern, slim, 'new', ALL_TOP_LAYERS)
+
+    runner.time('declarative.compile', lambda: compile_all(PATTERNS['wavy_spec']))
+    with tempfile.TemporaryDirectory() as directory:
+        stored = load_pattern(WAVY_SPEC, directory, register=False)
+        compile_all(stored)
+        runner.time('declarative.plan', lambda: compile_all(stored))
+    _compile.cache_clear()
+
+
+def bench_archive(runner: Runner, fixtures: list[Fixture], count: int):
+    # Loading a batch of skins from PNG files against reading it from an archive, then the whole batch job
+    pngs = [fixtures[i % len(fixtures)].png for i in range(count)]
+    runner.time(f'archive.png.per_skin[{count}]', lambda: [Skin(BytesIO(png)) for png in pngs], per=count)
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = Path(directory) / 'skins.wtsa'
+        with ArchiveWriter(path) as writer:
+            for i, png in enumerate(pngs):
+                writer.add(f'skin{i}', Skin(BytesIO(png)))
+
+        with SkinArchive(path) as archive:
+            runner.time(f'archive.read.per_skin[{count}]', lambda: list(archive), per=count)
+
+            builder = BatchBuilder()
+            runner.time(f'archive.png.build.per_skin[{count}]',
+                        lambda: builder.build([Skin(BytesIO(png)) for png in pngs]), per=count)
+            runner.time(f'archive.build.per_skin[{count}]',
+                        lambda: [builder.build(skins) for _, skins in archive.batches(count)], per=count)
+
+
+def bench_async(runner: Runner, fixtures: list[Fixture], count: int, workers: int):
+    async def build_all(executor):
+        builds = (TotemBuilder(Skin(BytesIO(fixtures[i % len(fixtures)].png)), pattern).build_async(executor=executor)
+                  for i in range(count))
+        await asyncio.gather(*builds)
+
+    for name, pattern in PATTERNS.items():
+        label = f'builder.{name}.build_async[{workers} threads]'
+        if not runner.wanted(label):
+            continue
+
+        with ThreadPoolExecutor(workers) as executor:
+            asyncio.run(build_all(executor))  # warm up
+            runs = []
+            for _ in range(runner.repeats):
+                start = time.perf_counter()
+                asyncio.run(build_all(executor))
+                runs.append(count / (time.perf_counter() - start))
+        runner._add(label, 'totems/s', statistics.median(runs), max(runs), count=count)
+
+
+def bench_sources(runner: Runner, fixtures: list[Fixture], count: int, connections: int):
+    # Skins fetched over HTTP from the local stand-in server: on new connections without validators,
+    # then revalidated over the pooled connections of the same source
+    skins = {f'skin{i}': fixtures[i % len(fixtures)].png for i in range(count)}
+    labels = [f'sources.http.{kind}[{connections} connections]' for kind in ('cold', 'revalidate')]
+    if not any(runner.wanted(label) for label in labels):
+        return
+
+    async def fetch_all() -> dict[str, list[float]]:
+        runs: dict[str, list[float]] = {label: [] for label in labels}
+        async with LocalSkinServer(skins) as server:
+            for _ in range(runner.repeats):
+                async with HTTPSource(server.url, max_connections=connections) as source:
+                    for label in labels:
+                        start = time.perf_counter()
+                        await source.fetch_many(skins)
+                        runs[label].append(count / (time.perf_counter() - start))
+        return runs
+
+    for label, runs in asyncio.run(fetch_all()).items():
+        if runner.wanted(label):
+            runner._add(label, 'skins/s', statistics.median(runs), max(runs), count=count)
+
+
+def bench_memory(runner: Runner, fixture: Fixture):
+    # Peak of the Python heap during one build; pixel buffers of Pillow images are allocated outside of it
+    for name, pattern in PATTERNS.items():
+        for compiled in (True, False):
+            label = f'memory.{name}.build[{"compiled" if compiled else "reference"}]'
+            if not runner.wanted(label):
+                continue
+
+            TotemBuilder(Skin(BytesIO(fixture.png)), pattern, compiled=compiled).build()  # warm up
+            tracemalloc.start()
+            try:
+                TotemBuilder(Skin(BytesIO(fixture.png)), pattern, compiled=compiled).build()
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+            runner.value(label, 'bytes', peak)
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[str]:
+    """Prints the ratios to the baseline and returns the names of the benchmarks which got worse."""
+    regressions = []
+    print(f'\n{"benchmark":<52} {"baseline":>12} {"current":>12} {"ratio":>7}')
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+
+        old, new = baseline[name]['median'], result['median']
+        ratio = new / old if old else float('inf')
+        # Throughput is better when higher, everything else when lower
+        worse = ratio < 1 / (1 + threshold) if result['unit'].endswith('/s') else ratio > 1 + threshold
+        if worse:
+            regressions.append(name)
+        print(f'{name:<52} {old:>12.2f} {new:>12.2f} {ratio:>6.2f}x{"  !" if worse else ""}')
+
+    return regressions
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmarks of wavy-totem-lib.')
+    parser.add_argument('-o', '--output', type=Path, help='write the results to this JSON file')
+    parser.add_argument('-b', '--baseline', type=Path, help='compare with the results stored in this JSON file')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative slowdown reported as a regression (default: 0.1)')
+    parser.add_argument('--skins', type=Path, help='directory of real PNG skins used besides the synthetic ones')
+    parser.add_argument('-k', '--keyword', help='run only the benchmarks with this substring in the name')
+    parser.add_argument('--min-time', type=float, default=0.05, help='minimal duration of a repeat in seconds')
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--batch', type=int, default=256, help='skins per batch and per async run')
+    parser.add_argument('--threads', type=int, default=4, help='executor threads of the async benchmark')
+    parser.add_argument('--connections', type=int, default=8, help='connections of the HTTP source benchmark')
+    args = parser.parse_args(argv)
+
+    fixtures = synthetic_fixtures()
+    if args.skins is not None:
+        fixtures += real_fixtures(args.skins)
+
+    runner = Runner(args.min_time, args.repeats, args.keyword)
+    for fixture in fixtures:
+        bench_skin(runner, fixture)
+    for fixture in fixtures:
+        bench_patterns(runner, fixture)
+    bench_totem(runner, fixtures[0])
+    bench_declarative(runner)
+    bench_batch(runner, fixtures, args.batch)
+    bench_post(runner, fixtures, args.batch)
+    bench_archive(runner, fixtures, args.batch)
+    bench_async(runner, fixtures, args.batch, args.threads)
+    bench_sources(runner, fixtures, args.batch, args.connections)
+    bench_memory(runner, fixtures[0])
+
+    report = {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'pillow': PIL.__version__,
+            'platform': platform.platform(),
+            'fixtures': [fixture.name for fixture in fixtures],
+        },
+        'results': runner.results,
+    }
+    if args.output is not None:
+        args.output.write_text(json.dumps(report, indent=2))
+
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text())['results']
+        regressions = compare(runner.results, baseline, args.threshold)
+        if regressions:
+            print(f'\n{len(regressions)} benchmark(s) slower than the baseline by more than {args.threshold:.0%}')
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
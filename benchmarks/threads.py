@@ -0,0 +1,138 @@
+"""
+Throughput of builds run from several threads at once, sharing one builder and one skin.
+
+    python benchmarks/threads.py                              # 1, 2, 4... threads up to the number of CPUs
+    python benchmarks/threads.py -t 1 2 4 8 -o threads.json   # chosen thread counts, saved as JSON
+    python3.13t benchmarks/threads.py -b threads.json         # compare with a stored run
+
+Every case runs `--builds` builds split between the threads, which start together, and reports totems per second
+and the speedup over one thread. Every totem is compared with the one built by a single thread, so a race
+between the builds fails the run. With the GIL the speedup stays around 1; on a free-threaded interpreter
+(CPython 3.13t with the GIL disabled) it should grow with the number of threads up to the number of cores.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import threading
+import time
+from io import BytesIO
+from pathlib import Path
+from typing import Callable, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import PIL
+
+from fixtures import synthetic_fixtures
+from run import compare
+from wavy_totem_lib import TotemBuilder, BatchBuilder, Skin
+
+BATCH = 64
+
+
+def cases(skin: Skin, skins: list[Skin]) -> dict[str, tuple[Callable[[], bytes], int]]:
+    """name -> (function building and returning the pixels, totems built by one call)"""
+    compiled = TotemBuilder(skin, round_head=True)
+    pillow = TotemBuilder(skin, 'stt', round_head=True, compiled=False)
+    batch = BatchBuilder(round_head=True)
+    return {
+        'build.compiled': (lambda: compiled.build().tobytes(), 1),
+        'build.pillow': (lambda: pillow.build().tobytes(), 1),
+        f'batch.build[{BATCH}]': (lambda: b''.join(totem.tobytes() for totem in batch.build(skins)), BATCH),
+    }
+
+
+def run(func: Callable[[], bytes], threads: int, calls: int, expected: bytes) -> float:
+    """Runs the calls split between the threads and returns the calls per second."""
+    barrier = threading.Barrier(threads + 1)
+    errors: list[str] = []
+
+    def worker(count: int):
+        barrier.wait()
+        for _ in range(count):
+            if func() != expected:
+                errors.append('a build returned different pixels')
+                return
+
+    share, rest = divmod(calls, threads)
+    workers = [threading.Thread(target=worker, args=(share + (n < rest),)) for n in range(threads)]
+    for thread in workers:
+        thread.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for thread in workers:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    if errors:
+        raise AssertionError(errors[0])
+    return calls / elapsed
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Thread scaling of wavy-totem-lib builds.')
+    parser.add_argument('-o', '--output', type=Path, help='write the results to this JSON file')
+    parser.add_argument('-b', '--baseline', type=Path, help='compare with the results stored in this JSON file')
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help='relative slowdown reported as a regression (default: 0.1)')
+    parser.add_argument('-t', '--threads', type=int, nargs='+', help='thread counts (default: powers of two up to '
+                                                                     'the number of CPUs)')
+    parser.add_argument('-k', '--keyword', help='run only the cases with this substring in the name')
+    parser.add_argument('--builds', type=int, default=4096, help='totems built per run')
+    parser.add_argument('--repeats', type=int, default=3)
+    args = parser.parse_args(argv)
+
+    cpus = os.cpu_count() or 1
+    counts = args.threads or [1 << n for n in range(cpus.bit_length()) if 1 << n <= cpus]
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print(f'{cpus} CPUs, GIL {"enabled" if gil else "disabled"}')
+
+    fixtures = synthetic_fixtures()
+    skins = [Skin(BytesIO(fixtures[i % len(fixtures)].png)) for i in range(BATCH)]
+    results: dict[str, dict] = {}
+    for name, (func, per) in cases(skins[0], skins).items():
+        if args.keyword is not None and args.keyword not in name:
+            continue
+
+        expected = func()
+        calls = max(1, args.builds // per)
+        single = None
+        for threads in counts:
+            runs = [run(func, threads, calls, expected) * per for _ in range(args.repeats)]
+            median = statistics.median(runs)
+            single = single or median
+            label = f'threads.{name}[{threads} threads]'
+            results[label] = {'unit': 'totems/s', 'median': round(median, 3), 'min': round(max(runs), 3),
+                              'speedup': round(median / single, 3)}
+            print(f'{label:<52} {median:>12.2f} totems/s  x{median / single:.2f}', flush=True)
+
+    report = {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'gil': gil,
+            'cpus': cpus,
+            'pillow': PIL.__version__,
+            'platform': platform.platform(),
+        },
+        'results': results,
+    }
+    if args.output is not None:
+        args.output.write_text(json.dumps(report, indent=2))
+
+    if args.baseline is not None:
+        baseline = json.loads(args.baseline.read_text())['results']
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f'\n{len(regressions)} case(s) slower than the baseline by more than {args.threshold:.0%}')
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
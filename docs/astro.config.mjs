@@ -83,6 +83,13 @@ export default defineConfig({
               },
               slug: "guides/writing-pattern",
             },
+            {
+              label: "Command line",
+              translations: {
+                ru: "Командная строка",
+              },
+              slug: "guides/command-line",
+            },
           ],
         },
         {
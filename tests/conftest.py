@@ -0,0 +1,31 @@
+import random
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from wavy_totem_lib import Skin
+
+
+def skin_png(version: str = 'new', seed: int = 0) -> bytes:
+    """PNG of a skin with random colours and a mix of opaque, clear and translucent pixels."""
+    rng = random.Random(seed)
+    height = 64 if version == 'new' else 32
+    data = bytearray()
+    for _ in range(64 * height):
+        data += bytes(rng.randrange(256) for _ in range(3))
+        data.append(rng.choice((0, 255, rng.randrange(256))))
+    buffer = BytesIO()
+    Image.frombytes('RGBA', (64, height), bytes(data)).save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def make_skin(version: str = 'new', slim: bool = False, seed: int = 0) -> Skin:
+    return Skin(BytesIO(skin_png(version, seed)), slim=slim)
+
+
+@pytest.fixture(params=[('new', False), ('new', True), ('old', False), ('old', True)],
+                ids=['new-wide', 'new-slim', 'old-wide', 'old-slim'])
+def skin(request) -> Skin:
+    version, slim = request.param
+    return make_skin(version, slim)
@@ -0,0 +1,76 @@
+import pytest
+
+from wavy_totem_lib import BatchBuilder
+from wavy_totem_lib.archive import ArchiveWriter, SkinArchive, pack_directory
+
+from conftest import make_skin, skin_png
+
+SKINS = {'new-wide': make_skin('new', False, 1), 'new-slim': make_skin('new', True, 2),
+         'old': make_skin('old', False, 3), 'players/notch': make_skin('new', False, 4)}
+
+
+@pytest.fixture
+def archive_path(tmp_path):
+    path = tmp_path / 'skins.wtsa'
+    with ArchiveWriter(path) as writer:
+        for name, skin in SKINS.items():
+            writer.add(name, skin)
+    return path
+
+
+def test_round_trip(archive_path):
+    with SkinArchive(archive_path) as archive:
+        assert len(archive) == len(SKINS)
+        assert archive.names == list(SKINS)
+        for (name, expected), skin in zip(SKINS.items(), archive):
+            assert archive.get(name).image.tobytes() == expected.image.tobytes()
+            assert (skin.version, skin.is_slim, skin.available_second) == \
+                   (expected.version, expected.is_slim, expected.available_second)
+        assert archive[-1].pixels == SKINS['players/notch'].pixels
+        assert archive.get('nobody') is None
+        with pytest.raises(IndexError):
+            archive[len(SKINS)]
+
+        batches = list(archive.batches(3))
+        assert [names for names, _ in batches] == [list(SKINS)[:3], list(SKINS)[3:]]
+        totems = [totem.tobytes() for _, skins in batches for totem in BatchBuilder().build(skins)]
+    assert totems == [totem.tobytes() for totem in BatchBuilder().build(SKINS.values())]
+
+
+def test_pack_directory(tmp_path):
+    (tmp_path / 'skins' / 'players').mkdir(parents=True)
+    (tmp_path / 'skins' / 'players' / 'jeb_.png').write_bytes(skin_png('old', 5))
+    (tmp_path / 'skins' / 'broken.png').write_bytes(b'not a png')
+
+    written, failures = pack_directory(tmp_path / 'skins', tmp_path / 'skins.wtsa')
+    assert written == 1
+    assert [name for name, _ in failures] == ['broken']
+    with SkinArchive(tmp_path / 'skins.wtsa') as archive:
+        assert archive.names == ['players/jeb_']
+        assert archive[0].version == 'old'
+
+
+@pytest.mark.parametrize('damage', ['empty', 'header', 'magic', 'version', 'records'])
+def test_damaged_files(archive_path, damage):
+    data = bytearray(archive_path.read_bytes())
+    if damage == 'empty':
+        data = bytearray()
+    elif damage == 'header':
+        data = data[:20]
+    elif damage == 'magic':
+        data[:8] = b'NOTSKINS'
+    elif damage == 'version':
+        data[8] = 99
+    else:
+        data = data[:len(data) // 2]
+    archive_path.write_bytes(data)
+
+    with pytest.raises(ValueError):
+        SkinArchive(archive_path)
+
+
+def test_skins_outlive_the_archive(archive_path):
+    archive = SkinArchive(archive_path)
+    skin = archive[0]
+    archive.close()
+    assert skin.image.tobytes() == SKINS['new-wide'].image.tobytes()
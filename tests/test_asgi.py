@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+
+from wavy_totem_lib.asgi import TotemApp
+from wavy_totem_lib.patterns import Wavy
+
+from conftest import skin_png
+
+SKINS = {'alex': skin_png('new', 1), 'steve': skin_png('old', 2), 'broken': b'not a png', 'a%2Fb': skin_png()}
+
+
+async def request(app, path: str, query: bytes = b'', headers: tuple = (), method: str = 'GET'):
+    """Sends one request straight to the ASGI app, as a server would after decoding the path."""
+    messages = []
+
+    async def receive():
+        return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query, 'headers': list(headers)}
+    await app(scope, receive, send)
+    start, body = messages
+    return start['status'], dict(start['headers']), body['body']
+
+
+class Fetcher:
+    def __init__(self, delay: float = 0):
+        self.calls = []
+        self.delay = delay
+
+    async def __call__(self, name: str):
+        self.calls.append(name)
+        await asyncio.sleep(self.delay)
+        return SKINS.get(name)
+
+
+@pytest.fixture
+def app():
+    app = TotemApp(Fetcher(), max_concurrency=2)
+    yield app
+    app.close()
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_renders_png(app):
+    status, headers, body = run(request(app, '/alex', b'scale=4&top_layers=head,torso'))
+    assert status == 200
+    assert headers[b'content-type'] == b'image/png'
+    assert body.startswith(b'\x89PNG')
+    assert int(headers[b'content-length']) == len(body)
+
+
+def test_repeated_request_hits_cache(app):
+    async def twice():
+        first = await request(app, '/steve', b'format=webp')
+        return first, await request(app, '/steve', b'format=webp')
+
+    first, second = run(twice())
+    assert first[2] == second[2]
+    assert first[1][b'etag'] == second[1][b'etag']
+    assert (app.cache.misses, app.cache.hits) == (1, 1)
+
+
+def test_concurrent_requests_share_fetch_and_render():
+    fetch = Fetcher(delay=0.05)
+    app = TotemApp(fetch)
+    try:
+        async def many():
+            return await asyncio.gather(*(request(app, '/alex', b'scale=2') for _ in range(8)))
+
+        responses = run(many())
+    finally:
+        app.close()
+    assert fetch.calls == ['alex']
+    assert app.renders == 1
+    assert len({body for _, _, body in responses}) == 1
+
+
+def test_etag_revalidation(app):
+    async def revalidate():
+        _, headers, _ = await request(app, '/alex')
+        return headers[b'etag'], await request(app, '/alex', headers=((b'if-none-match', b'W/' + headers[b'etag']),))
+
+    etag, (status, headers, body) = run(revalidate())
+    assert status == 304
+    assert body == b''
+    assert headers[b'etag'] == etag
+    assert app.renders == 1
+
+
+def test_bad_skin(app):
+    assert run(request(app, '/broken'))[0] == 422
+
+
+def test_unknown_skin_and_bad_settings(app):
+    assert run(request(app, '/nobody'))[0] == 404
+    assert run(request(app, '/alex', b'scale=1000'))[0] == 400
+    assert run(request(app, '/alex', b'top_layers=tail'))[0] == 400
+    assert run(request(app, '/alex', method='POST'))[0] == 405
+
+
+def test_path_is_not_decoded_twice(app):
+    assert run(request(app, '/a%2Fb'))[0] == 200
+    assert app.fetch.calls == ['a%2Fb']
+
+
+def test_internal_error_is_500(app, monkeypatch, caplog):
+    def fail(*args):
+        raise RuntimeError('bug')
+
+    monkeypatch.setattr(app, '_render', fail)
+    assert run(request(app, '/alex'))[0] == 500
+    assert 'bug' in caplog.text
+
+
+def test_etag_changes_with_pattern_version(app, monkeypatch):
+    _, headers, _ = run(request(app, '/alex'))
+    monkeypatch.setattr(Wavy, 'version', Wavy.version + 1)
+    status, new_headers, _ = run(request(app, '/alex', headers=((b'if-none-match', headers[b'etag']),)))
+    assert status == 200
+    assert new_headers[b'etag'] != headers[b'etag']
@@ -0,0 +1,29 @@
+from wavy_totem_lib import Skin, TotemBuilder
+from wavy_totem_lib.atlas import Atlas
+
+from conftest import make_skin
+
+ITEMS = [make_skin('new', False, 1), make_skin('old', True, 2), make_skin('new', True, 3), make_skin('old', False, 4)]
+
+
+def test_render_places_every_totem():
+    items = ITEMS + [TotemBuilder(make_skin(seed=5)).build()]
+    atlas = Atlas(columns=2, scale=2, padding=1, round_head=True)
+    sheet = atlas.render(items)
+
+    assert sheet.image.size == atlas.size(len(items))
+    for item, box in zip(items, sheet.boxes):
+        totem = TotemBuilder(item, round_head=True).build() if isinstance(item, Skin) else item
+        assert sheet.image.crop(box).tobytes() == totem.scale(factor=2).tobytes()
+
+
+def test_bands_and_buffer_match_render():
+    atlas = Atlas(columns=3, rows_per_band=1)
+    expected = atlas.render(ITEMS).image
+
+    bands = list(atlas.iter_bands(ITEMS))
+    assert [top for top, _ in bands] == [0, 16]
+
+    buffer = bytearray(expected.width * expected.height * 4)
+    assert atlas.render_into(buffer, ITEMS) == atlas.index(len(ITEMS))
+    assert bytes(buffer) == expected.tobytes()
@@ -0,0 +1,37 @@
+import pytest
+
+from wavy_totem_lib import BatchBuilder, TotemBuilder, builder
+from wavy_totem_lib.patterns import STT, Wavy
+
+from conftest import make_skin
+
+
+@pytest.mark.parametrize('pattern', [Wavy, STT])
+def test_variants_match_single_builds(skin, pattern):
+    totems = TotemBuilder(skin, pattern=pattern).build_variants()
+    for (layers, round_head), totem in totems.items():
+        single = TotemBuilder(skin, pattern=pattern, top_layers=list(layers), round_head=round_head,
+                              compiled=False).build()
+        assert totem.image.tobytes() == single.image.tobytes(), (layers, round_head)
+
+
+def test_uncompiled_variants_skip_the_compiler(skin, monkeypatch):
+    expected = TotemBuilder(skin).build_variants()
+
+    def compile_variants(*args, **kwargs):
+        raise AssertionError('compiled although the builder has compiled=False')
+
+    monkeypatch.setattr(builder, 'compile_variants', compile_variants)
+    totems = TotemBuilder(skin, compiled=False).build_variants()
+    assert {variant: totem.image.tobytes() for variant, totem in totems.items()} == \
+           {variant: totem.image.tobytes() for variant, totem in expected.items()}
+
+
+def test_batch_images_match_builds():
+    skins = [make_skin('new', False, 1), make_skin('old', True, 2), make_skin('new', False, 3)]
+    batch = BatchBuilder(round_head=True, post=['outline'])
+    totems = batch.build(skins)
+    images = dict(batch.iter_images(skins))
+    assert sorted(images) == [0, 1, 2]
+    for index, totem in enumerate(totems):
+        assert images[index].tobytes() == totem.tobytes()
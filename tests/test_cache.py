@@ -0,0 +1,117 @@
+import os
+from pathlib import Path
+
+import pytest
+
+from wavy_totem_lib import ALL_TOP_LAYERS, Skin, TotemBuilder, TotemCache
+from wavy_totem_lib.cache import footprint_hash
+from wavy_totem_lib.patterns import STT, Wavy
+
+from conftest import make_skin
+
+
+def _build(skin, cache):
+    return TotemBuilder(skin, top_layers=ALL_TOP_LAYERS, cache=cache).build()
+
+
+def test_memory_hit(skin):
+    cache = TotemCache()
+    first = _build(skin, cache)
+    second = _build(skin, cache)
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert first.image.tobytes() == second.image.tobytes()
+
+
+def test_disk_hit(skin, tmp_path):
+    expected = _build(skin, TotemCache(directory=tmp_path)).image.tobytes()
+    cache = TotemCache(directory=tmp_path)
+    assert _build(skin, cache).image.tobytes() == expected
+    assert cache.disk_hits == 1
+
+
+def test_corrupt_file_is_a_miss(skin, tmp_path, caplog):
+    expected = _build(skin, TotemCache(directory=tmp_path)).image.tobytes()
+    (path,) = tmp_path.glob('*.totem')
+    path.write_bytes(path.read_bytes()[:100])
+
+    cache = TotemCache(directory=tmp_path)
+    assert _build(skin, cache).image.tobytes() == expected
+    assert (cache.misses, cache.disk_hits) == (1, 0)
+    assert 'corrupt' in caplog.text
+    assert len(path.read_bytes()) > 100  # Written again after the miss
+
+
+def test_failed_write_is_skipped(skin, tmp_path, caplog):
+    cache = TotemCache(directory=tmp_path / 'totems')
+    (tmp_path / 'totems').rmdir()  # Removed from under the cache, writes fail like in a read-only directory
+    assert _build(skin, cache).image.tobytes() == _build(skin, None).image.tobytes()
+    assert 'Failed to store' in caplog.text
+    assert not list(tmp_path.iterdir())
+    assert len(cache) == 1
+
+
+def test_existing_directory_is_trimmed(tmp_path):
+    cache = TotemCache(directory=tmp_path)
+    for seed in range(3):
+        _build(make_skin(seed=seed), cache)
+    paths = sorted(tmp_path.glob('*.totem'))
+    for age, path in enumerate(paths):
+        os.utime(path, (age, age))
+
+    cache = TotemCache(directory=tmp_path, max_disk_bytes=2 * paths[0].stat().st_size)
+    assert sorted(tmp_path.glob('*.totem')) == paths[1:]
+    assert len(cache._disk) == 2
+
+
+def test_file_removed_while_indexing(tmp_path, monkeypatch):
+    _build(make_skin(), TotemCache(directory=tmp_path))
+    glob = Path.glob
+
+    def racing_glob(self, pattern):
+        # Another process removes a file between listing the directory and reading its size
+        return [*glob(self, pattern), self / 'removed.totem']
+
+    monkeypatch.setattr(Path, 'glob', racing_glob)
+    cache = TotemCache(directory=tmp_path)
+    assert len(cache._disk) == 1
+
+
+def _with_pixel(skin, index: int):
+    pixels = bytearray(skin.pixels)
+    pixels[index * 4:index * 4 + 4] = bytes(4) if pixels[index * 4 + 3] else b'\1\2\3\xff'
+    return Skin.from_rgba(pixels, slim=skin.is_slim)
+
+
+@pytest.mark.parametrize('pattern', [Wavy, STT])
+def test_footprint_hash(pattern):
+    skin = make_skin(slim=True)
+    footprint = pattern.footprint(skin.is_slim, skin.version, ALL_TOP_LAYERS)
+    assert list(footprint) == sorted(set(footprint))
+    outside = next(index for index in range(64 * 64) if index not in set(footprint))
+
+    expected = footprint_hash(skin, pattern, ALL_TOP_LAYERS)
+    assert footprint_hash(_with_pixel(skin, outside), pattern, ALL_TOP_LAYERS) == expected
+    assert footprint_hash(_with_pixel(skin, footprint[len(footprint) // 2]), pattern, ALL_TOP_LAYERS) != expected
+
+
+def test_cache_key(monkeypatch):
+    skin = make_skin()
+    footprint = Wavy.footprint(skin.is_slim, skin.version, [])
+    outside = next(index for index in range(64 * 64) if index not in set(footprint))
+
+    key = TotemCache.key(skin, Wavy, [], False)
+    assert TotemCache.key(_with_pixel(skin, outside), Wavy, [], False) == key
+    assert TotemCache.key(skin, Wavy, [], True) != key
+    assert TotemCache.key(skin, STT, [], False) != key
+    monkeypatch.setattr(Wavy, 'version', Wavy.version + 1)
+    assert TotemCache.key(skin, Wavy, [], False) != key
+
+
+def test_unknown_footprint_hashes_the_whole_skin():
+    class Dynamic(Wavy):
+        compilable = False
+
+    skin = make_skin()
+    assert Dynamic.footprint(skin.is_slim, skin.version, ALL_TOP_LAYERS) is None
+    expected = footprint_hash(skin, Dynamic, ALL_TOP_LAYERS)
+    assert footprint_hash(_with_pixel(skin, 0), Dynamic, ALL_TOP_LAYERS) != expected
@@ -0,0 +1,108 @@
+import json
+import re
+from io import BytesIO
+from zipfile import ZipFile
+
+import pytest
+from PIL import Image
+
+from wavy_totem_lib.cli import MANIFEST_NAME, main
+
+from conftest import skin_png
+
+SKINS = {
+    'notch.png': skin_png('new', 1), 'players/jeb_.png': skin_png('old', 2), 'players/alex.png': skin_png('new', 3)
+}
+
+
+@pytest.fixture
+def skins(tmp_path):
+    directory = tmp_path / 'skins'
+    for name, data in SKINS.items():
+        (directory / name).parent.mkdir(parents=True, exist_ok=True)
+        (directory / name).write_bytes(data)
+    return directory
+
+
+def convert(capsys, *argv) -> tuple[int, int, int]:
+    """Runs the command in this process, returns its exit code and the numbers of converted and skipped skins."""
+    code = main([*map(str, argv), '--workers', '1'])
+    summary = re.search(r'Converted (\d+) skins .* skipped (\d+) unchanged', capsys.readouterr().err)
+    return code, int(summary[1]), int(summary[2])
+
+
+def test_directory(skins, tmp_path, capsys):
+    output = tmp_path / 'totems'
+    assert convert(capsys, skins, '-o', output, '--scale', '2') == (0, 3, 0)
+    for name in SKINS:
+        with Image.open(output / name) as totem:
+            assert totem.size == (32, 32)
+    manifest = json.loads((output / MANIFEST_NAME).read_text())
+    assert sorted(manifest['files']) == sorted(SKINS)
+
+
+def test_zip(tmp_path, capsys):
+    archive = tmp_path / 'skins.zip'
+    with ZipFile(archive, 'w') as file:
+        for name, data in SKINS.items():
+            file.writestr(name, data)
+        file.writestr('readme.txt', 'not a skin')
+
+    output = tmp_path / 'totems'
+    assert convert(capsys, archive, '-o', output, '--format', 'webp') == (0, 3, 0)
+    assert (output / 'players' / 'jeb_.webp').exists()
+
+
+def test_resume_skips_unchanged(skins, tmp_path, capsys):
+    output = tmp_path / 'totems'
+    convert(capsys, skins, '-o', output)
+    assert convert(capsys, skins, '-o', output) == (0, 0, 3)
+
+    (skins / 'notch.png').write_bytes(skin_png('new', 4))
+    (output / 'players' / 'alex.png').unlink()
+    assert convert(capsys, skins, '-o', output) == (0, 2, 1)
+
+
+def test_force(skins, tmp_path, capsys):
+    output = tmp_path / 'totems'
+    convert(capsys, skins, '-o', output)
+    assert convert(capsys, skins, '-o', output, '--force') == (0, 3, 0)
+
+
+def test_settings_invalidate_manifest(skins, tmp_path, capsys):
+    output = tmp_path / 'totems'
+    convert(capsys, skins, '-o', output)
+    assert convert(capsys, skins, '-o', output, '--round-head') == (0, 3, 0)
+    assert convert(capsys, skins, '-o', output, '--round-head', '--top-layers', 'head') == (0, 3, 0)
+    assert convert(capsys, skins, '-o', output, '--round-head', '--top-layers', 'head') == (0, 0, 3)
+
+
+def test_failures(skins, tmp_path, capsys):
+    (skins / 'broken.png').write_bytes(b'not a png')
+    buffer = BytesIO()
+    Image.new('RGBA', (10, 10)).save(buffer, 'PNG')
+    (skins / 'tiny.png').write_bytes(buffer.getvalue())
+
+    output = tmp_path / 'totems'
+    assert main([str(skins), '-o', str(output), '--workers', '1']) == 1
+    error = capsys.readouterr().err
+    assert 'failed to convert broken.png' in error and 'failed to convert tiny.png' in error
+    assert (output / 'notch.png').exists()
+
+    # Failed skins are not in the manifest, so they are tried again
+    assert main([str(skins), '-o', str(output), '--workers', '1', '--quiet']) == 1
+    assert capsys.readouterr().err == ''
+
+
+def test_bad_input(tmp_path, capsys):
+    (tmp_path / 'file.txt').write_text('neither a directory nor a zip archive')
+    assert main([str(tmp_path / 'file.txt'), '-o', str(tmp_path / 'totems')]) == 2
+
+
+def test_worker_processes(skins, tmp_path, capsys):
+    output = tmp_path / 'totems'
+    assert main([str(skins), '-o', str(output), '--workers', '2', '--chunk-size', '1']) == 0
+    expected = tmp_path / 'expected'
+    convert(capsys, skins, '-o', expected)
+    for name in SKINS:
+        assert (output / name).read_bytes() == (expected / name).read_bytes()
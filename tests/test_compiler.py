@@ -0,0 +1,58 @@
+import itertools
+
+import pytest
+
+from wavy_totem_lib import ALL_TOP_LAYERS, TotemBuilder
+from wavy_totem_lib.compiler import compile_pattern
+from wavy_totem_lib.exceptions import PatternNotCompilable
+from wavy_totem_lib.patterns import STT, Wavy
+
+LAYER_SETS = [list(layers) for count in range(len(ALL_TOP_LAYERS) + 1)
+              for layers in itertools.combinations(ALL_TOP_LAYERS, count)]
+
+
+@pytest.mark.parametrize('pattern', [Wavy, STT])
+def test_compiled_matches_pil(skin, pattern):
+    for layers in LAYER_SETS:
+        expected = pattern(skin, layers).image
+        compiled = compile_pattern(pattern, skin.is_slim, skin.version, layers)
+        assert compiled.render(skin.image.tobytes()).tobytes() == expected.tobytes(), layers
+
+
+@pytest.mark.parametrize('pattern', [Wavy, STT])
+@pytest.mark.parametrize('round_head', [False, True])
+def test_compiled_builder_matches_pil(skin, pattern, round_head):
+    options = dict(pattern=pattern, top_layers=ALL_TOP_LAYERS, round_head=round_head)
+    compiled = TotemBuilder(skin, **options).build()
+    reference = TotemBuilder(skin, compiled=False, **options).build()
+    assert compiled.image.tobytes() == reference.image.tobytes()
+
+
+class Broken(Wavy):
+    @property
+    def image(self):
+        return self.missing_attribute  # A bug of the pattern, not something the tracer lacks
+
+
+class Dynamic(Wavy):
+    @property
+    def image(self):
+        self.skin.image.getpixel((8, 8))  # The tracer has no pixel values to read
+        return super().image
+
+
+def test_untraceable_pattern_falls_back_silently(skin, caplog):
+    with pytest.raises(PatternNotCompilable):
+        compile_pattern(Dynamic, skin.is_slim, skin.version, ALL_TOP_LAYERS)
+    assert not caplog.records
+    assert TotemBuilder(skin, pattern=Dynamic).build().image.tobytes() == Wavy(skin, ALL_TOP_LAYERS).image.tobytes()
+
+
+def test_errors_of_the_pattern_propagate(skin):
+    with pytest.raises(AttributeError, match='missing_attribute'):
+        compile_pattern(Broken, skin.is_slim, skin.version, ALL_TOP_LAYERS)
+
+
+def test_unhashable_options_are_not_compiled(skin):
+    with pytest.raises(PatternNotCompilable):
+        compile_pattern(Wavy, skin.is_slim, skin.version, ALL_TOP_LAYERS, colors=[1, 2])
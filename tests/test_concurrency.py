@@ -0,0 +1,66 @@
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from wavy_totem_lib import ALL_TOP_LAYERS, TotemBuilder
+from wavy_totem_lib.patterns import Abstract, STT, Wavy
+
+from conftest import make_skin
+
+
+@pytest.fixture(autouse=True)
+def frequent_switches():
+    # Makes threads switch inside the drawing code instead of running each build to the end
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    yield
+    sys.setswitchinterval(interval)
+
+
+def _run_threads(function, count: int = 64) -> list:
+    with ThreadPoolExecutor(8) as executor:
+        return list(executor.map(lambda _: function(), range(count)))
+
+
+@pytest.mark.parametrize('compiled', [True, False])
+@pytest.mark.parametrize('pattern', [Wavy, STT])
+def test_shared_builder(pattern, compiled):
+    builder = TotemBuilder(make_skin(slim=True), pattern=pattern, round_head=True, compiled=compiled)
+    expected = builder.build().image.tobytes()
+    assert set(_run_threads(lambda: builder.build().image.tobytes())) == {expected}
+
+
+@pytest.mark.parametrize('pattern', [Wavy, STT])
+def test_shared_pattern(pattern):
+    instance = pattern(make_skin('old'), ALL_TOP_LAYERS)
+    expected = instance.image.tobytes()
+    assert set(_run_threads(lambda: instance.image.tobytes())) == {expected}
+
+
+class Framed(Abstract):
+    """Draws a frame on the canvas in `__init__` and the head in a helper method."""
+    compilable = False
+
+    def __init__(self, skin, top_layers, **kwargs):
+        super().__init__(skin, top_layers, **kwargs)
+        for x in range(16):
+            self._canvas.putpixel((x, 0), (255, 0, 0, 255))
+
+    def _head(self):
+        self._canvas.paste(self.skin.head_front, (4, 1))
+
+    @property
+    def image(self):
+        self._head()
+        self._canvas.putpixel((0, 15), (0, 0, 255, 255))
+        return self._canvas
+
+
+def test_canvas_drawn_in_init_is_kept():
+    pattern = Framed(make_skin(), [])
+    first = pattern.image
+    assert first.getpixel((5, 0)) == (255, 0, 0, 255)
+    assert first.getpixel((0, 15)) == (0, 0, 255, 255)
+    assert pattern._canvas.getpixel((0, 15)) == (0, 0, 0, 0)  # Calls draw on copies
+    assert set(_run_threads(lambda: pattern.image.tobytes())) == {first.tobytes()}
@@ -0,0 +1,34 @@
+import pickle
+from pathlib import Path
+
+import pytest
+
+from wavy_totem_lib import ALL_TOP_LAYERS, TotemBuilder
+from wavy_totem_lib.exceptions import InvalidPattern
+from wavy_totem_lib.patterns import DeclarativePattern, Wavy, load_pattern, pattern_from_spec
+
+WAVY_SPEC = Path(__file__).resolve().parent.parent / 'benchmarks' / 'wavy.json'
+
+
+@pytest.mark.parametrize('compiled', [True, False])
+def test_spec_matches_python_pattern(skin, compiled):
+    pattern = load_pattern(WAVY_SPEC, register=False)
+    for layers in ([], ALL_TOP_LAYERS):
+        expected = TotemBuilder(skin, pattern=Wavy, top_layers=layers).build()
+        totem = TotemBuilder(skin, pattern=pattern, top_layers=layers, compiled=compiled).build()
+        assert totem.image.tobytes() == expected.image.tobytes()
+
+
+def test_generated_classes_own_their_spec(tmp_path):
+    first = load_pattern(WAVY_SPEC, tmp_path, register=False)
+    spec = dict(first.spec, name='other', clear=[[0, 0]])
+    second = pattern_from_spec(spec, register=False)
+
+    assert not hasattr(DeclarativePattern, 'spec')
+    assert first.spec['name'] != second.spec['name']
+    assert pickle.loads(pickle.dumps(second)) is second
+
+
+def test_invalid_spec():
+    with pytest.raises(InvalidPattern):
+        pattern_from_spec({'name': 'empty', 'parts': []}, register=False)
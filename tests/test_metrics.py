@@ -0,0 +1,38 @@
+from wavy_totem_lib import TotemBuilder
+from wavy_totem_lib.metrics import StageStats, set_sink, tags
+
+
+class Recorder:
+    def __init__(self):
+        self.records = []
+
+    def record(self, stage, seconds, blocks, tags):
+        self.records.append((stage, dict(tags)))
+
+
+def test_tags_are_scoped(skin):
+    recorder = Recorder()
+    set_sink(recorder)
+    try:
+        TotemBuilder(skin).build()
+        with tags(skin='first'):
+            with tags(size='64'):
+                TotemBuilder(skin, round_head=True).build()
+        TotemBuilder(skin, compiled=False).build()
+    finally:
+        set_sink(None)
+
+    seen = [record_tags for _, record_tags in recorder.records]
+    assert {'skin': 'first', 'size': '64'} in seen
+    assert seen[0] == {} and seen[-1] == {}
+
+
+def test_stage_stats(skin):
+    stats = StageStats()
+    set_sink(stats)
+    try:
+        TotemBuilder(skin).build()
+    finally:
+        set_sink(None)
+    assert stats.stages['builder.render']['count'] == 1
+    assert stats.stages['builder.render']['slowest'] == {}
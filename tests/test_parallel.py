@@ -0,0 +1,55 @@
+from io import BytesIO
+
+import pytest
+
+from wavy_totem_lib import Skin
+from wavy_totem_lib.builder import BatchBuilder
+from wavy_totem_lib.parallel import ParallelRenderer
+from wavy_totem_lib.patterns import STT, Wavy
+
+from conftest import skin_png
+
+
+@pytest.fixture(scope='module')
+def sources(tmp_path_factory) -> list:
+    blobs = [skin_png('new' if seed % 3 else 'old', seed) for seed in range(7)]
+    # Paths and bytes may be mixed, a chunk made only of paths is read by the worker itself
+    directory = tmp_path_factory.mktemp('skins')
+    for index in (0, 1, 5):
+        path = directory / f'{index}.png'
+        path.write_bytes(blobs[index])
+        blobs[index] = path
+    return blobs
+
+
+def _expected(sources: list, pattern, **kwargs) -> list[bytes]:
+    skins = [Skin(source if not isinstance(source, bytes) else BytesIO(source)) for source in sources]
+    return [totem.image.tobytes() for totem in BatchBuilder(pattern).build(skins, **kwargs)]
+
+
+@pytest.mark.parametrize('pattern', [Wavy, STT])
+def test_ordered_matches_batch_builder(sources, pattern):
+    with ParallelRenderer(pattern, workers=2, chunk_size=2) as renderer:
+        totems = list(renderer.render(sources))
+
+    assert [totem.image.tobytes() for totem in totems] == _expected(sources, pattern)
+    assert all(totem.pattern is pattern for totem in totems)
+
+
+def test_unordered_matches_batch_builder(sources):
+    with ParallelRenderer(Wavy, workers=2, chunk_size=3) as renderer:
+        pairs = list(renderer.render_unordered(sources))
+
+    assert sorted(index for index, _ in pairs) == list(range(len(sources)))
+    expected = _expected(sources, Wavy)
+    for index, totem in pairs:
+        assert totem.image.tobytes() == expected[index]
+
+
+def test_stopping_early(sources):
+    with ParallelRenderer(Wavy, workers=2, chunk_size=1) as renderer:
+        first = next(iter(renderer.render(sources)))
+        # The renderer is still usable after a consumer gave up
+        assert len(list(renderer.render(sources[:2]))) == 2
+
+    assert first.image.tobytes() == _expected(sources[:1], Wavy)[0]
@@ -0,0 +1,131 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from wavy_totem_lib import patterns
+from wavy_totem_lib.exceptions import UnknownPattern
+from wavy_totem_lib.patterns import ENTRY_POINT_GROUP, STT, Wavy, get, names, register, resolve
+
+
+class Flat(Wavy):
+    pass
+
+
+class FakeEntryPoint:
+    def __init__(self, name: str, pattern: type):
+        self.name = name
+        self.pattern = pattern
+        self.loaded = 0
+
+    def load(self) -> type:
+        self.loaded += 1
+        return self.pattern
+
+
+@pytest.fixture(autouse=True)
+def registry(monkeypatch):
+    """Leaves the registry as it was, with the entry points looked up again."""
+    monkeypatch.setattr(patterns, '_registry', dict(patterns._registry))
+    monkeypatch.setattr(patterns, '_entry_points', None)
+
+
+@pytest.fixture
+def entry_points(monkeypatch) -> list[FakeEntryPoint]:
+    points = [FakeEntryPoint('flat', Flat)]
+    groups = []
+
+    def fake(group: str):
+        groups.append(group)
+        return points
+
+    monkeypatch.setattr('importlib.metadata.entry_points', fake)
+    yield points
+    assert set(groups) <= {ENTRY_POINT_GROUP}
+
+
+def test_builtin_patterns():
+    assert get('wavy') is Wavy
+    assert get('stt') is STT
+    assert {'wavy', 'stt'} <= set(names())
+
+
+def test_register():
+    assert register('flat', Flat) is Flat
+    assert get('flat') is Flat
+    assert 'flat' in names()
+    assert names() == sorted(names())
+
+
+def test_register_as_decorator():
+    @register('flat')
+    class Decorated(Wavy):
+        pass
+
+    assert Decorated.__name__ == 'Decorated'
+    assert get('flat') is Decorated
+
+
+def test_registered_pattern_replaces_builtin():
+    register('wavy', Flat)
+    assert get('wavy') is Flat
+
+
+def test_unknown_pattern():
+    with pytest.raises(UnknownPattern, match="'missing'.*stt.*wavy"):
+        get('missing')
+    with pytest.raises(UnknownPattern):
+        resolve('missing')
+
+
+def test_resolve():
+    assert resolve('stt') is STT
+    assert resolve(Flat) is Flat
+
+
+def test_entry_points(entry_points):
+    assert 'flat' in names()
+    assert get('flat') is Flat
+    assert get('flat') is Flat
+    assert entry_points[0].loaded == 1
+
+
+def test_entry_point_loaded_only_when_used(entry_points):
+    get('wavy')
+    names()
+    assert entry_points[0].loaded == 0
+
+
+def test_registered_pattern_takes_precedence_over_entry_point(entry_points):
+    register('flat', STT)
+    assert get('flat') is STT
+    assert entry_points[0].loaded == 0
+
+
+def _imported_after(code: str) -> set[str]:
+    script = f'import sys\n{code}\nprint(" ".join(sorted(sys.modules)))'
+    result = subprocess.run([sys.executable, '-c', script], capture_output=True, text=True, check=True,
+                            cwd=Path(__file__).parents[1])
+    return set(result.stdout.split())
+
+
+def test_package_import_is_lazy():
+    modules = _imported_after('import wavy_totem_lib')
+    assert not {'PIL', 'asyncio', 'concurrent.futures'} & modules
+    assert not {module for module in modules if module.startswith('wavy_totem_lib.patterns')}
+
+
+def test_looking_up_a_pattern_doesnt_import_the_others():
+    modules = _imported_after('from wavy_totem_lib.patterns import get; get("stt")')
+    assert 'wavy_totem_lib.patterns.soul' in modules
+    assert 'wavy_totem_lib.patterns.wavy' not in modules
+
+
+def test_lazy_attributes():
+    import wavy_totem_lib
+
+    assert wavy_totem_lib.Wavy is Wavy
+    assert 'Skin' in dir(wavy_totem_lib)
+    with pytest.raises(AttributeError):
+        wavy_totem_lib.missing
@@ -0,0 +1,215 @@
+import random
+from fractions import Fraction
+
+import pytest
+from PIL import Image
+
+from wavy_totem_lib import BatchBuilder, TotemBuilder, postprocess
+from wavy_totem_lib.exceptions import UnknownStage
+from wavy_totem_lib.postprocess import (Outline, PaletteSwap, Pipeline, RoundHead, Shadow, Stage, Tint, get, names,
+                                        register)
+
+from conftest import make_skin
+
+PALETTE = [(200, 30, 30, 255), (30, 200, 30, 255), (30, 30, 200, 255), (250, 250, 250, 128), (10, 10, 10, 255)]
+
+
+# A plain implementation of the stages, run one after another over the pixels of every totem on its own
+
+
+def _neighbours(x: int, y: int, diagonal: bool) -> list[tuple[int, int]]:
+    offsets = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+    if diagonal:
+        offsets += [(-1, -1), (1, -1), (-1, 1), (1, 1)]
+    return [(x + dx, y + dy) for dx, dy in offsets]
+
+
+def _shape(stage: Stage, opaque: set, width: int, height: int) -> tuple[set, set]:
+    inside = {(x, y) for x in range(width) for y in range(height)}
+    if isinstance(stage, RoundHead):
+        return {(4, 1), (11, 1)} & inside, set()
+    if isinstance(stage, Outline):
+        grown = set(opaque)
+        for _ in range(stage.thickness):
+            grown |= {near for pixel in grown for near in _neighbours(*pixel, stage.diagonal)} & inside
+        return set(), grown - opaque
+    if isinstance(stage, Shadow):
+        dx, dy = stage.offset
+        return set(), {(x + dx, y + dy) for x, y in opaque} & inside - opaque
+    raise AssertionError(stage)
+
+
+def _color(stage: Stage, color: tuple) -> tuple:
+    if isinstance(stage, Tint):
+        amount = Fraction(stage.amount)
+        return tuple(round(value * (1 - amount) + Fraction(value * tint, 255) * amount)
+                     for value, tint in zip(color, stage.tint))
+    if isinstance(stage, PaletteSwap):
+        for key, value in stage.palette.items():
+            if color == key or color[:3] == key:
+                return value if len(value) == 4 else value + color[3:]
+        return color
+    raise AssertionError(stage)
+
+
+def _reference_totem(pixels: dict, stages: list[Stage], width: int, height: int) -> dict:
+    # Colour stages recolour the pixels but leave the silhouette seen by the shape stages alone
+    opaque = {position for position, color in pixels.items() if color[3]}
+    for stage in stages:
+        if isinstance(stage, (Tint, PaletteSwap)):
+            pixels = {position: _color(stage, color) if color[3] else color for position, color in pixels.items()}
+            continue
+        removed, filled = _shape(stage, opaque, width, height)
+        for position in removed:
+            pixels[position] = (0, 0, 0, 0)
+        for position in filled - (opaque - removed):
+            pixels[position] = stage.fill
+        opaque = (opaque - removed) | filled
+    return pixels
+
+
+def reference(data: bytes, stages: list[Stage], width: int = 16, height: int = 16, count: int = 1) -> bytes:
+    output = bytearray()
+    size = width * height * 4
+    for number in range(count):
+        totem = data[number * size:(number + 1) * size]
+        pixels = {(index % width, index // width): tuple(totem[index * 4:index * 4 + 4])
+                  for index in range(width * height)}
+        pixels = _reference_totem(pixels, stages, width, height)
+        for y in range(height):
+            for x in range(width):
+                output += bytes(pixels[x, y])
+    return bytes(output)
+
+
+def _random_totems(count: int, seed: int = 0, width: int = 16, height: int = 16) -> bytes:
+    """Totems of a few colours with holes, so there is room for outlines and shadows."""
+    rng = random.Random(seed)
+    data = bytearray()
+    for _ in range(width * height * count):
+        if rng.random() < 0.6:
+            data += bytes((rng.randrange(256), rng.randrange(256), rng.randrange(256), 0))
+        else:
+            data += bytes(rng.choice(PALETTE) if rng.random() < 0.7 else
+                          (rng.randrange(256), rng.randrange(256), rng.randrange(256), rng.randrange(1, 256)))
+    return bytes(data)
+
+
+STAGES = {
+    'round_head': [RoundHead()],
+    'outline': [Outline()],
+    'outline-thick-diagonal': [Outline((255, 0, 0, 200), thickness=2, diagonal=True)],
+    'shadow': [Shadow()],
+    'shadow-up-left': [Shadow((0, 0, 255), offset=(-2, -1))],
+    'tint': [Tint((255, 220, 180))],
+    'tint-partial': [Tint((40, 90, 255, 128), amount=0.4)],
+    'palette_swap': [PaletteSwap({(200, 30, 30): (0, 0, 0), (30, 200, 30, 255): (1, 2, 3, 4)})],
+    'tint-after-outline': [Outline((100, 100, 100)), Tint((255, 0, 0))],
+    'tint-before-outline': [Tint((255, 0, 0)), Outline((100, 100, 100))],
+    'round_head-after-outline': [Outline(), RoundHead()],
+    'shadow-under-outline': [Outline(), Shadow(offset=(2, 2))],
+    'combined': [RoundHead(), Shadow((0, 0, 0, 96)), Outline((20, 20, 20)), Tint((255, 220, 180)),
+                 PaletteSwap({(20, 20, 20): (60, 0, 0)}), Tint((200, 255, 255), amount=0.6)],
+}
+
+
+@pytest.mark.parametrize('stages', STAGES.values(), ids=STAGES.keys())
+def test_stages_match_reference(stages):
+    data = _random_totems(1)
+    assert Pipeline(stages).apply(data) == reference(data, stages)
+
+
+# 12 totems of 16x16 are past the size written pixel by pixel, and go through masked pastes
+@pytest.mark.parametrize('count', [1, 3, 12])
+@pytest.mark.parametrize('stages', [STAGES['outline-thick-diagonal'], STAGES['shadow-up-left'], STAGES['combined']],
+                         ids=['outline', 'shadow', 'combined'])
+def test_batched_masks_match_reference(stages, count):
+    data = _random_totems(count, seed=count)
+    # Outlines and shadows of a totem must not spill into the totems above and below it
+    assert Pipeline(stages).apply(data, count=count) == reference(data, stages, count=count)
+
+
+def test_other_sizes():
+    stages = STAGES['combined']
+    data = _random_totems(5, seed=3, width=32, height=32)
+    assert Pipeline(stages).apply(data, 32, 32, 5) == reference(data, stages, 32, 32, 5)
+
+
+def test_same_pipeline_for_several_buffers():
+    pipeline = Pipeline(STAGES['combined'])
+    for seed in range(4):
+        data = _random_totems(2, seed=seed)
+        assert pipeline.apply(data, count=2) == reference(data, STAGES['combined'], count=2)
+
+
+def test_builders_match_reference(skin):
+    stages = STAGES['combined'][1:]
+    plain = TotemBuilder(skin, round_head=True).build()
+    totem = TotemBuilder(skin, round_head=True, post=stages).build()
+    assert totem.image.tobytes() == reference(plain.image.tobytes(), stages)
+
+
+def test_batch_builder_matches_reference():
+    skins = [make_skin('new', False, 1), make_skin('old', True, 2), make_skin('new', True, 3)]
+    stages = [Outline(), Shadow(offset=(0, 1))]
+    plain = BatchBuilder().build(skins)
+    totems = BatchBuilder(post=stages).build(skins)
+    for before, after in zip(plain, totems):
+        assert after.image.tobytes() == reference(before.image.tobytes(), stages)
+
+
+def test_apply_image():
+    data = _random_totems(2)
+    image = Image.frombytes('RGBA', (16, 32), data)
+    result = Pipeline(STAGES['combined']).apply_image(image, count=2)
+    assert result.tobytes() == reference(data, STAGES['combined'], count=2)
+    assert image.tobytes() == data
+
+
+def test_empty_pipeline():
+    data = _random_totems(1)
+    assert not Pipeline()
+    assert Pipeline().apply(data) == data
+
+
+def test_wrong_length():
+    with pytest.raises(ValueError):
+        Pipeline([Outline()]).apply(bytes(10))
+
+
+def test_invalid_settings():
+    with pytest.raises(ValueError):
+        Outline(thickness=0)
+    with pytest.raises(ValueError):
+        Tint((0, 0, 0), amount=2)
+    with pytest.raises(ValueError):
+        Shadow((0, 0, 300))
+    with pytest.raises(ValueError):
+        PaletteSwap({(0, 0): (0, 0, 0)})
+
+
+def test_stages_by_name(monkeypatch):
+    monkeypatch.setattr(postprocess, '_registry', dict(postprocess._registry))
+    assert Pipeline(['outline', 'round_head']).stages == (Outline(), RoundHead())
+    assert {'outline', 'shadow', 'tint', 'palette_swap', 'round_head'} <= set(names())
+
+    @register('invert')
+    class Invert(Stage):
+        def color(self, color):
+            return (255 - color[0], 255 - color[1], 255 - color[2], color[3])
+
+    assert get('invert') is Invert
+    data = _random_totems(1)
+    inverted = Pipeline(['invert']).apply(data)
+    assert inverted == bytes(255 - value if index % 4 != 3 and data[index - index % 4 + 3] else value
+                             for index, value in enumerate(data))
+
+    with pytest.raises(UnknownStage):
+        Pipeline(['missing'])
+
+
+def test_stage_identity():
+    assert Outline((0, 0, 0)) == Outline((0, 0, 0, 255))
+    assert Outline() != Outline(thickness=2)
+    assert len({Tint((1, 2, 3)), Tint((1, 2, 3)), Tint((1, 2, 3), amount=0.4)}) == 2
+    assert repr(Pipeline([Shadow()])) == 'Pipeline([Shadow(color=(0, 0, 0, 96), offset=(1, 1))])'
@@ -0,0 +1,39 @@
+import json
+from io import BytesIO
+from zipfile import ZipFile
+
+from wavy_totem_lib import TotemBuilder
+from wavy_totem_lib.resourcepack import ResourcePackWriter
+
+from conftest import make_skin
+
+
+def test_pack_layout():
+    totems = [TotemBuilder(make_skin(seed=seed)).build() for seed in range(2)]
+    buffer = BytesIO()
+    with ResourcePackWriter(buffer) as pack:
+        pack.add_many([('Alice', totems[0]), ('alice', totems[1])])
+
+    with ZipFile(buffer) as archive:
+        names = archive.namelist()
+        items = json.loads(archive.read('assets/minecraft/items/totem_of_undying.json'))
+    assert 'assets/wavy_totem/textures/item/alice.png' in names
+    assert 'assets/wavy_totem/textures/item/alice_2.png' in names
+    assert [case['when'] for case in items['model']['cases']] == ['Alice', 'alice']
+
+
+def test_default_and_icon_are_replaced():
+    first, second = (TotemBuilder(make_skin(seed=seed)).build() for seed in range(2))
+    buffer = BytesIO()
+    with ResourcePackWriter(buffer) as pack:
+        pack.set_default(first)
+        pack.set_icon(first)
+        pack.set_default(second)
+        pack.set_icon(second)
+
+    with ZipFile(buffer) as archive:
+        names = archive.namelist()
+        assert names.count('assets/minecraft/textures/item/totem_of_undying.png') == 1
+        assert names.count('pack.png') == 1
+        assert archive.read('assets/minecraft/textures/item/totem_of_undying.png') == second.encode('png')
+        assert archive.read('pack.png') == second.encode('png', factor=8)
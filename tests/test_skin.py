@@ -0,0 +1,139 @@
+from io import BytesIO
+
+import pytest
+from PIL import Image
+
+from wavy_totem_lib import Skin
+from wavy_totem_lib.skin import FACES, PARTS
+
+from conftest import make_skin, skin_png
+
+
+def test_boxes_follow_the_model():
+    wide, slim = make_skin(slim=False), make_skin(slim=True)
+    assert wide.box('right_hand') == (44, 20, 48, 32)
+    assert slim.box('right_hand') == (44, 20, 47, 32)
+    # Slim arms are 3 pixels wide on the second layer too
+    assert wide.box('right_hand', second=True) == (44, 36, 48, 48)
+    assert slim.box('right_hand', second=True) == (44, 36, 47, 48)
+    assert slim.box('left_hand', 'back', second=True) == (59, 52, 62, 64)
+    # Only the arms depend on the model
+    assert wide.box('head', 'top') == slim.box('head', 'top') == (8, 0, 16, 8)
+    assert wide.box('left_leg') == slim.box('left_leg') == (20, 52, 24, 64)
+
+
+def test_old_skins():
+    skin = make_skin('old')
+    assert skin.box('head', second=True) is None
+    assert skin.region('body', second=True) is None
+    assert skin.faces('body', second=True) is None
+    assert skin.box('left_hand') == skin.box('right_hand')
+    assert skin.box('left_leg', 'back') == skin.box('right_leg', 'back')
+
+
+@pytest.mark.parametrize('slim', [False, True])
+def test_regions_are_cached_crops(slim):
+    skin = make_skin(slim=slim)
+    for part in PARTS:
+        for second in (False, True):
+            faces = skin.faces(part, second)
+            assert list(faces) == list(FACES)
+            for face in FACES:
+                region = skin.region(part, face, second)
+                assert region.tobytes() == skin.image.crop(skin.box(part, face, second)).tobytes()
+                assert faces[face] is region
+
+
+def test_properties_match_regions():
+    skin = make_skin(slim=True)
+    assert skin.right_hand_second_front is skin.region('right_hand', second=True)
+    assert skin.right_hand_second_front.size == (3, 12)
+    assert skin.head_front is skin.region('head')
+    assert skin.left_leg_second['top'] is skin.region('left_leg', 'top', True)
+
+
+def test_unknown_face():
+    with pytest.raises(KeyError):
+        make_skin().faces('head')['side']
+
+
+def _rgba(skin: Skin) -> bytearray:
+    return bytearray(skin.image.tobytes())
+
+
+def test_from_rgba_shares_the_buffer():
+    buffer = _rgba(make_skin())
+    skin = Skin.from_rgba(buffer, slim=False)
+    assert skin.image.tobytes() == bytes(buffer)
+    assert skin.pixels.obj is buffer
+    buffer[:4] = b'\1\2\3\4'
+    assert skin.image.getpixel((0, 0)) == (1, 2, 3, 4)
+
+
+def test_from_rgba_detects_model_and_version():
+    buffer = _rgba(make_skin())
+    buffer[(52 * 64 + 46) * 4 + 3] = 255
+    assert not Skin.from_rgba(buffer).is_slim
+    buffer[(52 * 64 + 46) * 4 + 3] = 0
+    assert Skin.from_rgba(buffer).is_slim
+
+    old = Image.open(BytesIO(skin_png('old'))).convert('RGBA')
+    skin = Skin.from_rgba(old.tobytes(), 64, 32)
+    assert (skin.version, skin.available_second, skin.is_slim) == ('old', False, False)
+
+
+def test_from_rgba_wrong_length():
+    with pytest.raises(ValueError, match='16384'):
+        Skin.from_rgba(bytes(64 * 64 * 4 - 1))
+    with pytest.raises(ValueError):
+        Skin.from_rgba(bytes(64 * 32 * 4), 64, 64)
+
+
+def _png(image: Image.Image) -> BytesIO:
+    buffer = BytesIO()
+    image.save(buffer, 'PNG')
+    buffer.seek(0)
+    return buffer
+
+
+@pytest.mark.parametrize('resample', [Image.Resampling.BOX, Image.Resampling.NEAREST])
+@pytest.mark.parametrize('scale', [2, 4])
+def test_hd_skins_are_downsampled(resample, scale):
+    # Opaque, so averaging blocks of equal pixels gives them back exactly with both filters
+    original = Image.open(BytesIO(skin_png(seed=7))).convert('RGB').convert('RGBA')
+    hd = original.resize((64 * scale, 64 * scale), Image.Resampling.NEAREST)
+    skin = Skin(_png(hd), resample=resample)
+    assert skin.image.size == (64, 64)
+    assert skin.image.tobytes() == original.tobytes()
+
+
+def test_box_downsampling_doesnt_bleed_transparent_pixels():
+    hd = Image.new('RGBA', (128, 128))
+    for y in range(0, 128, 2):
+        for x in range(0, 128, 2):
+            hd.putpixel((x, y), (255, 0, 0, 255))
+
+    red, green, blue, alpha = Skin(_png(hd)).image.getpixel((10, 10))
+    assert (red, green, blue) == (255, 0, 0) and 60 <= alpha <= 66
+    assert Skin(_png(hd), resample=Image.Resampling.NEAREST).image.getpixel((10, 10))[3] in (0, 255)
+
+
+def test_old_skins_are_extended():
+    original = Image.open(BytesIO(skin_png('old', 5))).convert('RGB').convert('RGBA')
+    for image in (original, original.resize((128, 64), Image.Resampling.NEAREST)):
+        skin = Skin(_png(image))
+        assert skin.image.size == (64, 64)
+        assert (skin.version, skin.available_second) == ('old', False)
+        assert skin.image.crop((0, 0, 64, 32)).tobytes() == original.tobytes()
+        # The right leg and arm take the places of the left ones
+        assert skin.image.crop((16, 48, 32, 64)).tobytes() == original.crop((0, 16, 16, 32)).tobytes()
+        assert skin.image.crop((32, 48, 48, 64)).tobytes() == original.crop((40, 16, 56, 32)).tobytes()
+        assert skin.image.crop((0, 32, 64, 48)).getextrema()[3] == (0, 0)
+
+
+@pytest.mark.parametrize('size', [(100, 100), (64, 48), (192, 192), (128, 32), (32, 32), (96, 48)])
+def test_unsupported_sizes(size):
+    with pytest.raises(ValueError, match='Unsupported skin size'):
+        Skin(_png(Image.new('RGBA', size)))
+    with pytest.raises(ValueError):
+        Skin.from_rgba(bytes(size[0] * size[1] * 4), *size)
@@ -0,0 +1,131 @@
+import asyncio
+
+import pytest
+
+from wavy_totem_lib.exceptions import FetchFailed
+from wavy_totem_lib.sources import FileSource, HTTPSource, LocalSkinServer, MemorySource
+
+from conftest import skin_png
+
+SKINS = {'notch': skin_png('new', 1), 'jeb_': skin_png('old', 2), 'dinnerbone': skin_png('new', 3)}
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+class ModifiedOnlyServer(LocalSkinServer):
+    """Answers without an ETag, so clients revalidate with If-Modified-Since."""
+
+    def _respond(self, method, path, headers):
+        status, response_headers, body = super()._respond(method, path, headers)
+        response_headers.pop('ETag', None)
+        return status, response_headers, body
+
+
+def test_fetch_and_keep_alive():
+    async def fetch():
+        async with LocalSkinServer(SKINS) as server, HTTPSource(server.url) as source:
+            files = [await source.fetch(name) for name in SKINS]
+            return files, server.connections, source.connections
+
+    files, server_connections, source_connections = run(fetch())
+    assert files == list(SKINS.values())
+    assert server_connections == source_connections == 1
+
+
+@pytest.mark.parametrize('server_class', [LocalSkinServer, ModifiedOnlyServer])
+def test_revalidation(server_class):
+    async def fetch():
+        async with server_class(SKINS) as server, HTTPSource(server.url) as source:
+            first = await source.fetch('notch')
+            second = await source.fetch('notch')
+            revalidated = source.revalidated
+            server.set('notch', SKINS['jeb_'])
+            if server_class is ModifiedOnlyServer:
+                await asyncio.sleep(1.1)  # Last-Modified has a resolution of a second
+                server.set('notch', SKINS['jeb_'])
+            third = await source.fetch('notch')
+            return first, second, revalidated, third, source.revalidated
+
+    first, second, revalidated, third, total = run(fetch())
+    assert first == second == SKINS['notch']
+    assert revalidated == 1
+    assert third == SKINS['jeb_']
+    assert total == 1
+
+
+def test_missing_skin_is_none():
+    async def fetch():
+        async with LocalSkinServer(SKINS) as server, HTTPSource(server.url) as source:
+            return await source.fetch('nobody'), await source.fetch_many(['notch', 'nobody'])
+
+    missing, many = run(fetch())
+    assert missing is None
+    assert many == {'notch': SKINS['notch'], 'nobody': None}
+
+
+def test_max_size():
+    async def fetch():
+        async with LocalSkinServer(SKINS) as server, HTTPSource(server.url, max_size=100) as source:
+            await source.fetch('notch')
+
+    with pytest.raises(FetchFailed, match='larger'):
+        run(fetch())
+
+
+def test_server_down():
+    async def fetch():
+        server = LocalSkinServer(SKINS)
+        await server.start()
+        await server.close()
+        async with HTTPSource(server.url) as source:
+            await source.fetch('notch')
+
+    with pytest.raises(FetchFailed):
+        run(fetch())
+
+
+def test_timeout():
+    async def fetch():
+        async with LocalSkinServer(SKINS, delay=1) as server, HTTPSource(server.url, timeout=0.1) as source:
+            await source.fetch('notch')
+
+    with pytest.raises(FetchFailed, match='No answer'):
+        run(fetch())
+
+
+def test_interim_responses_are_skipped():
+    data = SKINS['notch']
+
+    async def serve(reader, writer):
+        while (await reader.readline()) not in (b'\r\n', b''):
+            pass
+        writer.write(b'HTTP/1.1 103 Early Hints\r\nLink: </style.css>; rel=preload\r\n\r\n'
+                     b'HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n' % len(data) + data)
+        await writer.drain()
+        writer.close()
+
+    async def fetch():
+        server = await asyncio.start_server(serve, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            async with HTTPSource(f'http://127.0.0.1:{port}/{{name}}.png') as source:
+                return await source.fetch('notch')
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    assert run(fetch()) == data
+
+
+def test_memory_and_file_sources(tmp_path):
+    (tmp_path / 'notch.png').write_bytes(SKINS['notch'])
+
+    async def fetch():
+        files = FileSource(tmp_path)
+        memory = MemorySource(SKINS)
+        return (await files.fetch('notch'), await files.fetch('../notch'), await files.fetch('nobody'),
+                await memory.fetch('jeb_'), (await memory.skin('jeb_')).version)
+
+    assert run(fetch()) == (SKINS['notch'], None, None, SKINS['jeb_'], 'old')
@@ -0,0 +1,42 @@
+import asyncio
+from io import BytesIO
+
+from wavy_totem_lib import Skin, TotemBuilder
+from wavy_totem_lib.stream import render_stream
+
+from conftest import skin_png
+
+
+def test_order_and_backpressure():
+    async def run():
+        read = yielded = peak = 0
+
+        def source():
+            nonlocal read, peak
+            for seed in range(12):
+                read += 1
+                peak = max(peak, read - yielded)
+                yield skin_png('new', seed)
+
+        totems = []
+        async for totem in render_stream(source(), max_pending=3):
+            yielded += 1
+            totems.append(totem)
+            await asyncio.sleep(0.01)
+        return totems, peak
+
+    totems, peak = asyncio.run(run())
+    expected = [TotemBuilder(Skin(BytesIO(skin_png('new', seed)))).build().image.tobytes() for seed in range(12)]
+    assert [totem.image.tobytes() for totem in totems] == expected
+    assert peak <= 3
+
+
+def test_closing_cancels_pending():
+    async def run():
+        stream = render_stream((skin_png('new', seed) for seed in range(12)), max_pending=4)
+        await stream.__anext__()
+        await stream.aclose()
+        await asyncio.sleep(0.1)
+        return [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+    assert asyncio.run(run()) == []
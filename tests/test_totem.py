@@ -0,0 +1,23 @@
+from wavy_totem_lib import TotemBuilder
+
+
+def test_encode_sees_changes_to_image(skin):
+    totem = TotemBuilder(skin).build()
+    before = totem.encode('raw')
+    assert totem.encode('raw') is before
+
+    totem.image.putpixel((0, 0), (1, 2, 3, 4))
+    after = totem.encode('raw')
+    assert after[:4] == bytes((1, 2, 3, 4))
+    assert after[4:] == before[4:]
+
+
+def test_scales_see_changes_to_image(skin):
+    totem = TotemBuilder(skin).build()
+    before = totem.scales([1, 2, 4])
+    assert totem.scales([4])[4] is before[4]
+
+    totem.image.putpixel((0, 0), (1, 2, 3, 4))
+    after = totem.scales([4])[4]
+    assert after.getpixel((3, 3)) == (1, 2, 3, 4)
+    assert after.tobytes() == totem.scale(factor=4).tobytes()
@@ -3,7 +3,39 @@ __author__ = "WavyCat"
 __license__ = "BSL-1.0"
 __version__ = ""
 
-from .builder import TotemBuilder
-from .totem import Totem
-from .skin import Skin
+from importlib import import_module
+
 from .layers import TopLayer, ALL_TOP_LAYERS
+
+# Not imported from typing, which alone takes longer to import than the rest of the package
+TYPE_CHECKING = False
+if TYPE_CHECKING:
+    from .builder import TotemBuilder, BatchBuilder
+    from .totem import Totem
+    from .skin import Skin
+    from .cache import TotemCache
+    from .patterns import Wavy, STT, Abstract
+
+# Loaded on first access, so importing the package doesn't import Pillow or the patterns
+_LAZY = {
+    'TotemBuilder': '.builder', 'BatchBuilder': '.builder', 'Totem': '.totem', 'Skin': '.skin',
+    'TotemCache': '.cache', 'Wavy': '.patterns', 'STT': '.patterns', 'Abstract': '.patterns',
+}
+
+
+def __getattr__(name: str):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *_LAZY})
+
+
+__all__ = ['TotemBuilder', 'BatchBuilder', 'Totem', 'Skin', 'TotemCache', 'TopLayer', 'ALL_TOP_LAYERS',
+           'Wavy', 'STT', 'Abstract']
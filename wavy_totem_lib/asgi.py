@@ -0,0 +1,221 @@
+"""
+An ASGI application serving totems over HTTP, runnable by any ASGI server (uvicorn, hypercorn, ...).
+
+    async def fetch(name: str) -> bytes | None:
+        ...  # PNG of the skin, or None if there is no such skin
+
+    app = TotemApp(fetch)
+
+    GET /{name}?pattern=stt&top_layers=head,torso&round_head=1&scale=8&format=webp
+
+Concurrent requests for the same skin share one fetch, and requests for the same totem share one render.
+Renders run in a thread pool limited to `max_concurrency` at once. Responses carry an ETag made from the skin and
+the settings, so clients revalidating with If-None-Match get a 304 without a render.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from typing import Callable, Awaitable, Optional, Any
+from urllib.parse import parse_qs
+
+from PIL import Image
+
+from .builder import TotemBuilder
+from .cache import TotemCache
+from .layers import TopLayer, ALL_TOP_LAYERS
+from .exceptions import UnknownPattern
+from .patterns import get as get_pattern
+from .skin import Skin
+
+_CONTENT_TYPES = {'png': b'image/png', 'webp': b'image/webp'}
+
+# What Pillow and `Skin` raise for a file that isn't a valid skin
+_SKIN_ERRORS = (OSError, SyntaxError, ValueError, Image.DecompressionBombError)
+
+logger = logging.getLogger(__name__)
+
+
+class _BadRequest(Exception):
+    pass
+
+
+class _InvalidSkin(Exception):
+    pass
+
+
+def _settings(query: bytes, max_scale: int) -> tuple:
+    """Parses the query string into (pattern name, top layer names, round head, scale, format)."""
+    params = {key: values[-1] for key, values in parse_qs(query.decode('latin-1')).items()}
+
+    pattern = params.get('pattern', 'wavy')
+    try:
+        get_pattern(pattern)
+    except UnknownPattern as error:
+        raise _BadRequest(error.message)
+
+    value = params.get('top_layers', 'all')
+    if value == 'all':
+        layers = tuple(layer.name for layer in ALL_TOP_LAYERS)
+    elif value == 'none':
+        layers = ()
+    else:
+        layers = tuple(sorted({name.strip().upper() for name in value.split(',') if name.strip()}))
+        if any(name not in TopLayer.__members__ for name in layers):
+            raise _BadRequest('Unknown top layer, use head, torso, hands, legs, all or none')
+
+    round_head = params.get('round_head', '0').lower() in ('1', 'true', 'yes')
+
+    try:
+        scale = int(params.get('scale', '1'))
+    except ValueError:
+        scale = 0
+    if not 1 <= scale <= max_scale:
+        raise _BadRequest(f'The scale must be from 1 to {max_scale}')
+
+    format = params.get('format', 'png')
+    if format not in _CONTENT_TYPES:
+        raise _BadRequest('The format must be png or webp')
+
+    return pattern, layers, round_head, scale, format
+
+
+def _matches(header: Optional[bytes], etag: bytes) -> bool:
+    """Checks an If-None-Match header against an ETag, using the weak comparison."""
+    if header is None:
+        return False
+    for tag in header.split(b','):
+        tag = tag.strip()
+        if tag == b'*' or tag.removeprefix(b'W/') == etag:
+            return True
+    return False
+
+
+class TotemApp:
+    """
+    ASGI application rendering totems of skins provided by a fetch function.
+
+    :param fetch: Coroutine function returning the skin file of a name, or None if there is no such skin.
+    :param max_concurrency: Maximum number of renders running at once. Defaults to the number of CPUs.
+    :param cache: A cache of built totems. Defaults to an in-memory TotemCache.
+    :param max_scale: Maximum allowed scale factor. Defaults to 32.
+    :param max_age: `max-age` of the Cache-Control header in seconds. Defaults to 3600.
+    """
+    def __init__(self, fetch: Callable[[str], Awaitable[Optional[bytes]]], max_concurrency: Optional[int] = None,
+                 cache: Optional[TotemCache] = None, max_scale: int = 32, max_age: int = 3600):
+        self.fetch = fetch
+        self.cache = cache if cache is not None else TotemCache()
+        self.max_scale = max_scale
+        self.max_age = max_age
+        self.renders = 0
+
+        self._concurrency = max_concurrency or os.cpu_count() or 1
+        self._executor = ThreadPoolExecutor(self._concurrency, thread_name_prefix='totem-render')
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._flights: dict[Any, asyncio.Future] = {}
+
+    async def _coalesce(self, key, factory: Callable[[], Awaitable]) -> Any:
+        """Runs the coroutine made by `factory` once for all concurrent callers with the same key."""
+        future = self._flights.get(key)
+        if future is None:
+            future = asyncio.ensure_future(factory())
+            self._flights[key] = future
+
+            def done(_):
+                self._flights.pop(key, None)
+                if not future.cancelled():
+                    future.exception()  # Retrieved, even if every caller went away
+
+            future.add_done_callback(done)
+
+        # A caller going away must not cancel the work shared with the others
+        return await asyncio.shield(future)
+
+    def _render(self, data: bytes, settings: tuple) -> bytes:
+        pattern, layers, round_head, scale, format = settings
+        try:
+            skin = Skin(BytesIO(data))
+        except _SKIN_ERRORS as error:
+            raise _InvalidSkin() from error
+        builder = TotemBuilder(skin, pattern, [TopLayer[name] for name in layers],
+                               round_head, cache=self.cache)
+        return builder.build().encode(format, factor=scale)
+
+    async def _render_limited(self, data: bytes, settings: tuple) -> bytes:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._concurrency)
+        async with self._semaphore:
+            self.renders += 1
+            return await asyncio.get_running_loop().run_in_executor(self._executor, self._render, data, settings)
+
+    async def _handle(self, scope: dict) -> tuple[int, list[tuple[bytes, bytes]], bytes]:
+        if scope['method'] not in ('GET', 'HEAD'):
+            return 405, [(b'allow', b'GET, HEAD')], b'Method not allowed'
+
+        # The server has already percent-decoded the path
+        name = scope['path'].strip('/')
+        if not name:
+            return 404, [], b'Not found'
+
+        try:
+            settings = _settings(scope.get('query_string', b''), self.max_scale)
+        except _BadRequest as error:
+            return 400, [], str(error).encode()
+
+        try:
+            data = await self._coalesce(('fetch', name), lambda: self.fetch(name))
+        except Exception:
+            return 502, [], b'Failed to fetch the skin'
+        if data is None:
+            return 404, [], b'No such skin'
+
+        # The version of the pattern is part of the tag, so totems drawn by an older pattern aren't revalidated
+        version = getattr(get_pattern(settings[0]), 'version', None)
+        digest = hashlib.sha256(bytes(data) + repr((settings, version)).encode())
+        etag = b'"' + digest.hexdigest()[:32].encode() + b'"'
+        headers = [(b'etag', etag), (b'cache-control', f'public, max-age={self.max_age}'.encode())]
+
+        request_headers = dict(scope.get('headers', []))
+        if _matches(request_headers.get(b'if-none-match'), etag):
+            return 304, headers, b''
+
+        try:
+            body = await self._coalesce(('render', etag), lambda: self._render_limited(data, settings))
+        except _InvalidSkin:
+            return 422, [], b'Invalid skin'
+        except Exception:
+            logger.exception('Failed to render the totem of %r', name)
+            return 500, [], b'Internal server error'
+
+        return 200, headers + [(b'content-type', _CONTENT_TYPES[settings[4]])], body
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                self.close()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def close(self):
+        """Stops the render threads."""
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    async def __call__(self, scope: dict, receive, send):
+        if scope['type'] == 'lifespan':
+            await self._lifespan(receive, send)
+            return
+        if scope['type'] != 'http':
+            raise ValueError(f'Unsupported ASGI scope type {scope["type"]!r}')
+
+        status, headers, body = await self._handle(scope)
+        if status >= 400:
+            headers.append((b'content-type', b'text/plain; charset=utf-8'))
+        if status != 304:
+            headers.append((b'content-length', str(len(body)).encode()))
+        await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': b'' if scope['method'] == 'HEAD' else body})
@@ -0,0 +1,192 @@
+from math import ceil
+from typing import Type, Union, Iterable, Iterator, NamedTuple, Optional
+
+from PIL import Image
+
+from .builder import BatchBuilder
+from .exceptions import SmallScale
+from .layers import TopLayer, ALL_TOP_LAYERS
+from .metrics import stage
+from .patterns.abstract import Abstract
+from .skin import Skin, Box
+from .totem import Totem
+
+
+class Sheet(NamedTuple):
+    image: Image.Image
+    boxes: list[Box]  # Box of every totem on the sheet, in the order of the items
+
+
+class Atlas:
+    """
+    A class designed to draw many totems on one sprite sheet.
+
+    Totems are placed row by row, `columns` per row. The sheet is drawn in horizontal bands of whole rows:
+    a band is assembled from unscaled totems and then scaled with a single resize, so no scaled image of a single
+    totem is ever made, and only one band has to be in memory when the sheet is written piece by piece.
+
+    :param columns: Number of totems in a row of the sheet.
+    :param scale: Scale factor of the totems, see `Totem.scale`. Defaults to 1.
+    :param padding: Transparent space between the totems and around them, in pixels of an unscaled totem
+                    (so it is scaled as well). Defaults to 0.
+    :param cell_size: Size of an unscaled totem drawn by the pattern. Defaults to (16, 16).
+    :param pattern: The pattern class or the registered name of the pattern to use for skins.
+                    Defaults to 'wavy'.
+    :param top_layers: A list of top layers to apply to skins. Defaults to ALL_TOP_LAYERS.
+    :param round_head: Determines whether to round the head of skins or not. Defaults to False.
+    :param rows_per_band: Number of rows drawn at once. Defaults to about 256 totems per band.
+
+    :raises SmallScale: If the scale factor is less than or equal to 0.
+    """
+    def __init__(self, columns: int, scale: int = 1, padding: int = 0, cell_size: tuple[int, int] = (16, 16),
+                 pattern: Union[str, Type[Abstract]] = 'wavy',
+                 top_layers: list[TopLayer] | None = ALL_TOP_LAYERS, round_head: bool = False,
+                 rows_per_band: Optional[int] = None):
+        if scale <= 0:
+            raise SmallScale()
+        if columns <= 0 or padding < 0:
+            raise ValueError('The number of columns must be positive and the padding must not be negative')
+
+        self.columns = columns
+        self.scale = scale
+        self.padding = padding
+        self.cell_size = cell_size
+        self.builder = BatchBuilder(pattern, top_layers, round_head)
+        self.rows_per_band = rows_per_band or max(1, 256 // columns)
+
+    @property
+    def _pitch(self) -> tuple[int, int]:
+        """Unscaled distance between the origins of neighbouring cells."""
+        return self.cell_size[0] + self.padding, self.cell_size[1] + self.padding
+
+    @property
+    def width(self) -> int:
+        """Width of the sheet, it doesn't depend on the number of totems."""
+        return (self.columns * self._pitch[0] + self.padding) * self.scale
+
+    def size(self, count: int) -> tuple[int, int]:
+        """
+        Returns the size of the sheet for the given number of totems.
+
+        :param count: Number of totems.
+        :return: Size as (width, height).
+        """
+        return self.width, (ceil(count / self.columns) * self._pitch[1] + self.padding) * self.scale
+
+    def box(self, index: int) -> Box:
+        """
+        Returns the box of a totem on the sheet.
+
+        :param index: Position of the totem among the items.
+        :return: The box as (left, top, right, bottom).
+        """
+        row, column = divmod(index, self.columns)
+        left = (column * self._pitch[0] + self.padding) * self.scale
+        top = (row * self._pitch[1] + self.padding) * self.scale
+        return left, top, left + self.cell_size[0] * self.scale, top + self.cell_size[1] * self.scale
+
+    def index(self, count: int) -> list[Box]:
+        """Returns the boxes of the given number of totems, in order."""
+        return [self.box(index) for index in range(count)]
+
+    def _images(self, items: list[Union[Skin, Totem]], **kwargs) -> list[Image.Image]:
+        """Unscaled totem images of the items; skins are rendered together through the batch builder."""
+        images: list[Optional[Image.Image]] = [None] * len(items)
+        skins = []
+        for position, item in enumerate(items):
+            if isinstance(item, Totem):
+                images[position] = item._source()  # Not kept on the totem
+            else:
+                skins.append(position)
+
+        for index, image in self.builder.iter_images([items[position] for position in skins], **kwargs):
+            images[skins[index]] = image
+
+        for image in images:
+            if image.size != self.cell_size:
+                raise ValueError(f'Totem of size {image.size} does not fit into a cell of size {self.cell_size}')
+        return images
+
+    def _band(self, items: list[Union[Skin, Totem]], last: bool, **kwargs) -> Image.Image:
+        """Draws the rows of the given items and scales them at once."""
+        pitch_x, pitch_y = self._pitch
+        rows = ceil(len(items) / self.columns)
+        band = Image.new('RGBA', (self.width // self.scale, rows * pitch_y + (self.padding if last else 0)))
+
+        for n, image in enumerate(self._images(items, **kwargs)):
+            row, column = divmod(n, self.columns)
+            band.paste(image, (column * pitch_x + self.padding, row * pitch_y + self.padding))
+
+        if self.scale == 1:
+            return band
+        with stage('atlas.scale'):
+            return band.resize((band.width * self.scale, band.height * self.scale), Image.Resampling.NEAREST)
+
+    def iter_bands(self, items: Iterable[Union[Skin, Totem]], **kwargs) -> Iterator[tuple[int, Image.Image]]:
+        """
+        Draws the sheet band by band, keeping only one band in memory.
+        Bands span the whole width of the sheet; the last one also contains the bottom padding.
+
+        :param items: Skins to build the totems for, or already built totems (unscaled), in any mix.
+        :param kwargs: Additional keyword arguments passed to the pattern.
+        :return: An iterator of (top, band image) pairs, `top` being the position of the band on the sheet.
+        """
+        chunk_size = self.columns * self.rows_per_band
+        top = 0
+        chunk = []
+        for item in items:
+            if len(chunk) == chunk_size:
+                band = self._band(chunk, False, **kwargs)
+                yield top, band
+                top += band.height
+                chunk = []
+            chunk.append(item)
+
+        if chunk:
+            yield top, self._band(chunk, True, **kwargs)
+
+    def render(self, items: Iterable[Union[Skin, Totem]], **kwargs) -> Sheet:
+        """
+        Draws the whole sheet.
+
+        :param items: Skins to build the totems for, or already built totems (unscaled), in any mix.
+        :param kwargs: Additional keyword arguments passed to the pattern.
+        :return: The sheet image and the boxes of the totems on it.
+        :rtype: Sheet
+        """
+        items = list(items)
+        sheet = Image.new('RGBA', self.size(len(items)))
+        for top, band in self.iter_bands(items, **kwargs):
+            sheet.paste(band, (0, top))
+
+        return Sheet(sheet, self.index(len(items)))
+
+    def render_into(self, buffer: Union[bytearray, memoryview], items: Iterable[Union[Skin, Totem]],
+                    **kwargs) -> list[Box]:
+        """
+        Writes the sheet as raw RGBA pixels into a preallocated buffer, band by band.
+        Rows below the last totem are left untouched.
+
+        :param buffer: A writable buffer such as bytearray, memoryview or mmap, at least `size(count)` pixels large.
+        :param items: Skins to build the totems for, or already built totems (unscaled), in any mix.
+        :param kwargs: Additional keyword arguments passed to the pattern.
+        :return: The boxes of the totems on the sheet.
+
+        :raises ValueError: If the buffer is too small.
+        """
+        view = memoryview(buffer).cast('B')
+        stride = self.width * 4
+        counter = [0]
+
+        def counted():
+            for item in items:
+                counter[0] += 1
+                yield item
+
+        for top, band in self.iter_bands(counted(), **kwargs):
+            end = (top + band.height) * stride
+            if end > len(view):
+                raise ValueError(f'Buffer too small: {end} bytes needed, {len(view)} available')
+            view[top * stride:end] = band.tobytes()
+
+        return self.index(counter[0])
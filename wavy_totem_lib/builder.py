@@ -1,30 +1,206 @@
-from asyncio import get_event_loop
-from asyncio.events import AbstractEventLoop
-from concurrent.futures import ThreadPoolExecutor, Executor
-from typing import Type, Optional
+from itertools import combinations
+from threading import Lock
+from typing import TYPE_CHECKING, Type, Optional, Iterable, Iterator, Union
 
+from PIL import Image
+
+from .cache import TotemCache
+from .compiler import compile_pattern, compile_variants, CompiledPattern
+from .exceptions import PatternNotCompilable
 from .layers import TopLayer, ALL_TOP_LAYERS
+from .metrics import stage
 from .skin import Skin
+from .patterns import resolve
 from .patterns.abstract import Abstract
-from .patterns.wavy import Wavy
+from .postprocess import Pipeline, Stage, RoundHead, ROUNDED_HEAD
 from .totem import Totem
 
+if TYPE_CHECKING:
+    from asyncio import AbstractEventLoop
+    from concurrent.futures import Executor
+
+# Shared by the builds run asynchronously without an executor of their own, created on the first of them
+_executor: Optional['Executor'] = None
+_executor_owned = False
+_executor_lock = Lock()
+
+
+def _default_executor() -> 'Executor':
+    global _executor, _executor_owned
+    executor = _executor
+    if executor is None:
+        with _executor_lock:
+            if _executor is None:
+                from concurrent.futures import ThreadPoolExecutor
+                from os import cpu_count
+                # Rendering is CPU-bound, more threads than cores only add contention
+                _executor = ThreadPoolExecutor(cpu_count() or 1, thread_name_prefix='wavy-totem')
+                _executor_owned = True
+            executor = _executor
+    return executor
+
+
+def set_default_executor(executor: Optional['Executor']) -> Optional['Executor']:
+    """
+    Replaces the executor of asynchronous builds that have no executor of their own.
+    The previous executor is shut down if the library created it, without waiting for its running builds.
+
+    :param executor: The executor, or None to create a thread pool of one thread per CPU on the next build.
+    :return: The previous executor, None if there was none.
+    """
+    global _executor, _executor_owned
+    with _executor_lock:
+        previous, owned = _executor, _executor_owned
+        _executor, _executor_owned = executor, False
+    if owned:
+        previous.shutdown(wait=False)
+    return previous
+
+
+def shutdown_default_executor(wait: bool = True):
+    """
+    Shuts down the executor created by the library for asynchronous builds. The next build creates a new one.
+
+    :param wait: Wait for the running builds to finish.
+    """
+    global _executor, _executor_owned
+    with _executor_lock:
+        previous, owned = _executor, _executor_owned
+        if owned:
+            _executor, _executor_owned = None, False
+    if owned:
+        previous.shutdown(wait=wait)
+
+
+def _compiled(pattern: Type[Abstract], skin: Skin, top_layers: list[TopLayer], **kwargs) -> Optional[CompiledPattern]:
+    """Returns the compiled pattern able to render the skin, or None if the pattern has to run through PIL."""
+    try:
+        compiled = compile_pattern(pattern, skin.is_slim, skin.version, top_layers, **kwargs)
+    except PatternNotCompilable:
+        return None
+
+    return compiled if compiled.source_size == skin.image.size else None
+
+
+# A combination of top layers and head rounding
+Variant = tuple[frozenset[TopLayer], bool]
+
+
+_ROUND_HEAD = Pipeline([RoundHead()])
+
+
+def _pipeline(round_head: bool, post: Pipeline) -> Pipeline:
+    """The post-processing of a builder: head rounding first, then the stages given by the user."""
+    return _ROUND_HEAD + post if round_head else post
+
+
+def all_variants(top_layers: list[TopLayer] = ALL_TOP_LAYERS) -> list[Variant]:
+    """
+    Returns every combination of the given top layers, each with and without head rounding.
+
+    :param top_layers: Top layers to combine. Defaults to ALL_TOP_LAYERS.
+    :return: The variants, 32 for all top layers.
+    """
+    return [(frozenset(layers), round_head)
+            for count in range(len(top_layers) + 1) for layers in combinations(top_layers, count)
+            for round_head in (False, True)]
+
 
 class TotemBuilder:
     """
     A class designed to obtain the Totem class from Skin using the passed pattern.
 
+    The configuration is read-only and every build keeps its state to itself, so one builder can build from several
+    threads at once, see "Thread Safety" in the documentation.
+
     :param skin: The skin object to use for building the totem.
-    :param pattern: The pattern class to use for building the totem. Defaults to Wavy.
+    :param pattern: The pattern class or the registered name of the pattern to use for building the totem.
+                    Defaults to 'wavy'.
     :param top_layers: A list of top layers to apply to the totem. Defaults to ALL_TOP_LAYERS.
     :param round_head: Determines whether to round the head or not. Defaults to False.
+    :param compiled: Render through the compiled gather tables of the pattern when it can be compiled.
+                     Defaults to True. False always runs the PIL code of the pattern.
+    :param cache: A cache checked before rendering, built totems are stored in it. Defaults to None (no cache).
+    :param executor: The executor `build_async` runs the build in. Defaults to None (a thread pool shared by
+                     builders, see `set_default_executor`).
+    :param post: Post-processing stages applied to the totem after head rounding, or their registered names,
+                 see `wavy_totem_lib.postprocess`. Defaults to none.
     """
-    def __init__(self, skin: Skin, pattern: Type[Abstract] = Wavy,
-                 top_layers: list[TopLayer] | None = ALL_TOP_LAYERS, round_head: bool = False):
-        self.skin = skin
-        self.pattern = pattern
-        self.top_layers = top_layers if top_layers is not None else []
-        self.round_head = round_head
+    def __init__(self, skin: Skin, pattern: Union[str, Type[Abstract]] = 'wavy',
+                 top_layers: list[TopLayer] | None = ALL_TOP_LAYERS, round_head: bool = False,
+                 compiled: bool = True, cache: Optional[TotemCache] = None, executor: Optional['Executor'] = None,
+                 post: Iterable[Union[Stage, str]] = ()):
+        self._skin = skin
+        self._pattern = resolve(pattern)
+        self._top_layers = tuple(top_layers) if top_layers is not None else ()
+        self._round_head = bool(round_head)
+        self._compiled = compiled
+        self._cache = cache
+        self._executor = executor
+        self._post = post if isinstance(post, Pipeline) else Pipeline(post)
+        self._pipeline = _pipeline(self._round_head, self._post)
+
+    @property
+    def skin(self) -> Skin:
+        return self._skin
+
+    @property
+    def pattern(self) -> Type[Abstract]:
+        return self._pattern
+
+    @property
+    def top_layers(self) -> tuple[TopLayer, ...]:
+        return self._top_layers
+
+    @property
+    def round_head(self) -> bool:
+        return self._round_head
+
+    @property
+    def compiled(self) -> bool:
+        return self._compiled
+
+    @property
+    def cache(self) -> Optional[TotemCache]:
+        return self._cache
+
+    @property
+    def executor(self) -> Optional['Executor']:
+        return self._executor
+
+    @property
+    def post(self) -> Pipeline:
+        """The whole post-processing of the totems, including head rounding."""
+        return self._pipeline
+
+    @classmethod
+    def from_rgba(cls, buffer: Union[bytes, bytearray, memoryview], width: int = 64, height: int = 64,
+                  slim: bool = ..., **kwargs) -> 'TotemBuilder':
+        """
+        Creates a builder for a skin given as already decoded RGBA pixels, see `Skin.from_rgba`.
+
+        :param buffer: Raw RGBA pixels of the skin.
+        :param width: Width of the skin image. Defaults to 64.
+        :param height: Height of the skin image. Defaults to 64.
+        :param slim: Determines whether the skin is slim or not. `Ellipsis` is used for auto-detection.
+        :param kwargs: Other arguments of the builder.
+        :return: The builder.
+        """
+        return cls(Skin.from_rgba(buffer, width, height, slim), **kwargs)
+
+    def _render(self, **kwargs) -> Image.Image:
+        """Draws the totem image, through the compiled pattern when possible."""
+        compiled = None
+        if self.compiled:
+            with stage('builder.compile'):
+                compiled = _compiled(self.pattern, self.skin, self.top_layers, **kwargs)
+
+        if compiled is not None:
+            with stage('builder.render'):
+                return compiled.render(self.skin.pixels)
+
+        with stage('builder.pattern'):
+            return self.pattern(self.skin, list(self.top_layers), **kwargs).image
 
     def build(self, **kwargs) -> Totem:
         """
@@ -34,30 +210,280 @@ class TotemBuilder:
         :return: The built Totem object.
         :rtype: Totem
         """
-        totem_image = self.pattern(self.skin, self.top_layers, **kwargs).image
+        key = None
+        if self.cache is not None:
+            with stage('builder.cache_get'):
+                key = self.cache.key(self.skin, self.pattern, self.top_layers, self.round_head, kwargs,
+                                     repr(self._post) if self._post else None)
+                totem_image = self.cache.get(key)
+            if totem_image is not None:
+                return Totem(totem_image, self.pattern, self.skin.is_slim, self.top_layers, self.round_head)
+
+        totem_image = self._render(**kwargs)
+
+        if self._pipeline:
+            with stage('builder.post'):
+                data = self._pipeline.apply(totem_image.tobytes(), *totem_image.size)
+            totem = Totem.from_rgba(data, self.pattern, self.skin.is_slim, self.top_layers, self.round_head,
+                                    *totem_image.size)
+        else:
+            totem = Totem(totem_image, self.pattern, self.skin.is_slim, self.top_layers, self.round_head)
+
+        if key is not None:
+            with stage('builder.cache_put'):
+                self.cache.put(key, totem._source())
+
+        return totem
+
+    def _render_variants(self, variants: list[Variant], **kwargs) -> Image.Image:
+        """Draws the totems of the variants stacked vertically."""
+        compiled = None
+        if self.compiled:
+            try:
+                with stage('builder.compile'):
+                    compiled = compile_variants(
+                        self.pattern, self.skin.is_slim, self.skin.version,
+                        [(list(layers), ROUNDED_HEAD if round_head else ()) for layers, round_head in variants],
+                        **kwargs
+                    )
+            except PatternNotCompilable:
+                pass
+
+        if compiled is not None and compiled.source_size == self.skin.image.size:
+            with stage('builder.render'):
+                image = compiled.render(self.skin.pixels)
+            if self._post:
+                with stage('builder.post'):
+                    image = self._post.apply_image(image, len(variants))
+            return image
+
+        images = []
+        for layers, round_head in variants:
+            with stage('builder.pattern'):
+                image = self.pattern(self.skin, [layer for layer in TopLayer if layer in layers], **kwargs).image
+            post = _pipeline(round_head, self._post)
+            if post:
+                with stage('builder.post'):
+                    image = post.apply_image(image)
+            images.append(image)
+
+        stacked = Image.new('RGBA', (images[0].width, sum(image.height for image in images)))
+        top = 0
+        for image in images:
+            if image.size != images[0].size:
+                raise ValueError('The pattern drew totems of different sizes')
+            stacked.paste(image, (0, top))
+            top += image.height
+        return stacked
+
+    def build_variants(self, variants: Optional[Iterable[tuple[Iterable[TopLayer], bool]]] = None,
+                       **kwargs) -> dict[Variant, Totem]:
+        """
+        Builds the totem of the skin for several combinations of top layers and head rounding at once.
+        The `top_layers` and `round_head` of the builder are not used, its other post-processing stages are.
 
-        if self.round_head:
-            # Round the head (if necessary)
-            totem_image.putpixel((4, 1), (0, 0, 0, 0))
-            totem_image.putpixel((11, 1), (0, 0, 0, 0))
+        Every variant is drawn by one plan: each part of the skin is cropped and resized once, and the variants only
+        differ in which layers are composited. Patterns that can't be compiled are drawn once per variant.
 
-        return Totem(totem_image, self.pattern, self.skin.is_slim, self.top_layers, self.round_head)
+        :param variants: Pairs of top layers and whether to round the head. Defaults to `all_variants()`.
+        :param kwargs: Additional keyword arguments passed to the pattern.
+        :return: The totems by (frozenset of top layers, round head).
+        """
+        variants = all_variants() if variants is None else [(frozenset(layers), bool(round_head))
+                                                             for layers, round_head in variants]
+        if not variants:
+            return {}
 
-    async def build_async(self, loop: Optional[Type[AbstractEventLoop]] = None,
-                          executor: Executor = ThreadPoolExecutor(), **kwargs) -> Totem:
+        image = self._render_variants(variants, **kwargs)
+        width, height = image.width, image.height // len(variants)
+        data = image.tobytes()
+        length = width * height * 4
+        return {
+            (layers, round_head): Totem.from_rgba(data[n * length:(n + 1) * length], self.pattern, self.skin.is_slim,
+                                                  layers, round_head, width, height)
+            for n, (layers, round_head) in enumerate(variants)
+        }
+
+    def render_variants(self, variants: Optional[Iterable[tuple[Iterable[TopLayer], bool]]] = None,
+                        **kwargs) -> bytes:
+        """
+        Renders the variants of `build_variants` into one buffer of raw RGBA pixels
+        with the (N, height, width, 4) layout, in the order of the variants.
+
+        :param variants: Pairs of top layers and whether to round the head. Defaults to `all_variants()`.
+        :param kwargs: Additional keyword arguments passed to the pattern.
+        :return: The pixels of the totems.
+        """
+        variants = all_variants() if variants is None else [(frozenset(layers), bool(round_head))
+                                                             for layers, round_head in variants]
+        if not variants:
+            return b''
+        return self._render_variants(variants, **kwargs).tobytes()
+
+    async def build_async(self, loop: Optional[Type['AbstractEventLoop']] = None,
+                          executor: Optional['Executor'] = None, **kwargs) -> Totem:
         """
         Asynchronously builds the Totem object.
 
-        :param loop: An optional event loop to be used. If not provided, the default event loop will be used.
+        :param loop: An optional event loop to be used. If not provided, the running event loop will be used.
         :type loop: Optional[Type[AbstractEventLoop]]
-        :param executor: An executor used to run the build method. Default is ThreadPoolExecutor.
-        :type executor: Executor
+        :param executor: An executor used to run the build method. Defaults to the executor of the builder, or a
+                         ThreadPoolExecutor shared by builders if it has none.
+        :type executor: Optional[Executor]
         :param kwargs: Additional keyword arguments.
 
         :return: The built Totem object.
         :rtype: Totem
         """
         if not loop:
-            loop = get_event_loop()
+            from asyncio import get_running_loop
+            loop = get_running_loop()
+        if executor is None:
+            executor = self.executor if self.executor is not None else _default_executor()
 
         return await loop.run_in_executor(executor, lambda: self.build(**kwargs))
+
+
+class BatchBuilder:
+    """
+    A class designed to build totems for many skins with the same settings at once.
+
+    Skins sharing a model and version are rendered together: the compiled pattern gathers the pixels of the whole
+    batch in one pass and runs every resize and compositing step once for all of them.
+    Skins the pattern can't be compiled for are built one by one through the pattern's own code.
+    Like `TotemBuilder`, the configuration is read-only and one builder can build from several threads at once.
+
+    :param pattern: The pattern class or the registered name of the pattern to use for building the totems.
+                    Defaults to 'wavy'.
+    :param top_layers: A list of top layers to apply to the totems. Defaults to ALL_TOP_LAYERS.
+    :param round_head: Determines whether to round the head or not. Defaults to False.
+    :param chunk_size: Maximum number of skins rendered in one pass, bounds the memory used. Defaults to 256.
+    :param post: Post-processing stages applied to the totems after head rounding, or their registered names.
+                 They run over all totems of a pass at once. Defaults to none.
+    """
+    def __init__(self, pattern: Union[str, Type[Abstract]] = 'wavy',
+                 top_layers: list[TopLayer] | None = ALL_TOP_LAYERS, round_head: bool = False, chunk_size: int = 256,
+                 post: Iterable[Union[Stage, str]] = ()):
+        self._pattern = resolve(pattern)
+        self._top_layers = tuple(top_layers) if top_layers is not None else ()
+        self._round_head = bool(round_head)
+        self._chunk_size = chunk_size
+        self._pipeline = _pipeline(self._round_head, post if isinstance(post, Pipeline) else Pipeline(post))
+
+    @property
+    def pattern(self) -> Type[Abstract]:
+        return self._pattern
+
+    @property
+    def top_layers(self) -> tuple[TopLayer, ...]:
+        return self._top_layers
+
+    @property
+    def round_head(self) -> bool:
+        return self._round_head
+
+    @property
+    def chunk_size(self) -> int:
+        return self._chunk_size
+
+    @property
+    def post(self) -> Pipeline:
+        """The whole post-processing of the totems, including head rounding."""
+        return self._pipeline
+
+    def _finish(self, indexes: list[int], image: Image.Image) -> tuple[list[int], tuple[int, int], bytes]:
+        """Post-processes the totems stacked in the image, returns their positions, size and pixels."""
+        size = image.width, image.height // len(indexes)
+        if not self._pipeline:
+            return indexes, size, image.tobytes()
+        with stage('batch.post'):
+            return indexes, size, self._pipeline.apply(image.tobytes(), *size, len(indexes))
+
+    def _render(self, skins: list[Skin], **kwargs) -> Iterable[tuple[list[int], tuple[int, int], bytes]]:
+        """
+        Renders the skins in groups.
+        Yields the positions of the skins of a group, the size of a totem and the pixels of their totems
+        stacked vertically.
+        """
+        groups: dict[tuple, list[int]] = {}
+        for index, skin in enumerate(skins):
+            groups.setdefault((skin.is_slim, skin.version, skin.image.size), []).append(index)
+
+        for indexes in groups.values():
+            with stage('batch.compile'):
+                compiled = _compiled(self.pattern, skins[indexes[0]], self.top_layers, **kwargs)
+
+            if compiled is None:
+                for index in indexes:
+                    with stage('batch.pattern'):
+                        image = self.pattern(skins[index], list(self.top_layers), **kwargs).image
+                    yield self._finish([index], image)
+                continue
+
+            for start in range(0, len(indexes), self.chunk_size):
+                chunk = indexes[start:start + self.chunk_size]
+                with stage('batch.render'):
+                    image = compiled.render_many([skins[index].pixels for index in chunk])
+                yield self._finish(chunk, image)
+
+    def build(self, skins: Iterable[Skin], **kwargs) -> list[Totem]:
+        """
+        Builds a totem for every skin.
+
+        :param skins: The skins to build the totems for.
+        :param kwargs: Additional keyword arguments passed to the pattern.
+        :return: The built Totem objects, in the order of the skins.
+        :rtype: list[Totem]
+        """
+        skins = list(skins)
+        totems: list[Optional[Totem]] = [None] * len(skins)
+
+        for indexes, (width, height), data in self._render(skins, **kwargs):
+            length = width * height * 4
+            for n, index in enumerate(indexes):
+                # Sliced from the pixels of the whole group, no image is made per totem
+                totems[index] = Totem.from_rgba(data[n * length:(n + 1) * length], self.pattern,
+                                                skins[index].is_slim, self.top_layers, self.round_head, width, height)
+
+        return totems
+
+    def iter_images(self, skins: Iterable[Skin], **kwargs) -> Iterator[tuple[int, Image.Image]]:
+        """
+        Renders the totem images of the skins without making Totem objects.
+        Skins are rendered in groups, so the images come grouped by model and version rather than in order.
+
+        :param skins: The skins to build the totems for.
+        :param kwargs: Additional keyword arguments passed to the pattern.
+        :return: Iterator over pairs of the position of a skin and the image of its totem.
+        """
+        for indexes, size, data in self._render(list(skins), **kwargs):
+            length = size[0] * size[1] * 4
+            for n, index in enumerate(indexes):
+                yield index, Image.frombytes('RGBA', size, data[n * length:(n + 1) * length])
+
+    def render(self, skins: Iterable[Skin], **kwargs) -> bytes:
+        """
+        Renders the totems of all skins into one buffer of raw RGBA pixels.
+        The buffer has the (N, height, width, 4) layout, so it can be wrapped with e.g. `numpy.frombuffer`.
+
+        :param skins: The skins to build the totems for.
+        :param kwargs: Additional keyword arguments passed to the pattern.
+        :return: The pixels of the totems, in the order of the skins.
+        :rtype: bytes
+
+        :raises ValueError: If the pattern draws totems of different sizes.
+        """
+        skins = list(skins)
+        output, step = None, 0
+
+        for indexes, _, data in self._render(skins, **kwargs):
+            if output is None:
+                step = len(data) // len(indexes)
+                output = bytearray(step * len(skins))
+            elif len(data) != step * len(indexes):
+                raise ValueError('The pattern drew totems of different sizes')
+
+            for n, index in enumerate(indexes):
+                output[index * step:(index + 1) * step] = data[n * step:(n + 1) * step]
+
+        return bytes(output or b'')
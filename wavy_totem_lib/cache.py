@@ -0,0 +1,249 @@
+import hashlib
+import logging
+import os
+import struct
+from collections import OrderedDict
+from functools import lru_cache
+from pathlib import Path
+from threading import Lock, get_ident
+from typing import Type, Optional, Union, Any
+
+from PIL import Image
+
+from .layers import TopLayer
+from .patterns.abstract import Abstract
+from .skin import Skin
+
+_HEADER = struct.Struct('<II')
+
+logger = logging.getLogger(__name__)
+
+
+@lru_cache(maxsize=64)
+def _footprint_runs(footprint: tuple[int, ...]) -> list[tuple[int, int]]:
+    """Byte ranges of the footprint in an RGBA buffer, neighbouring pixels merged into one range."""
+    runs = []
+    for index in footprint:
+        if runs and runs[-1][1] == index * 4:
+            runs[-1] = (runs[-1][0], index * 4 + 4)
+        else:
+            runs.append((index * 4, index * 4 + 4))
+    return runs
+
+
+def footprint_hash(skin: Skin, pattern: Type[Abstract], top_layers: list[TopLayer], **kwargs) -> str:
+    """
+    Hashes only the skin pixels the pattern reads (see `Abstract.footprint`),
+    so skins differing in regions the pattern ignores get the same hash.
+    Patterns with an unknown footprint hash the whole skin.
+
+    :param skin: The skin.
+    :param pattern: The pattern class.
+    :param top_layers: List of top layers to apply.
+    :param kwargs: Extra options of the pattern.
+    :return: Hex digest of the pixels, the size of the skin and its model.
+    """
+    footprint = pattern.footprint(skin.is_slim, skin.version, top_layers, **kwargs)
+
+    digest = hashlib.sha256(repr((skin.image.size, skin.is_slim, skin.version)).encode())
+    if footprint is None or (footprint and footprint[-1] >= skin.image.width * skin.image.height):
+        digest.update(skin.pixels)
+    elif footprint:
+        pixels = memoryview(skin.pixels)
+        digest.update(b''.join([pixels[start:end] for start, end in _footprint_runs(footprint)]))
+    return digest.hexdigest()
+
+
+class TotemCache:
+    """
+    A content-addressed cache of built totems.
+
+    Entries are keyed by a hash of the skin pixels read by the pattern (see `footprint_hash`) and every setting
+    that affects the result (pattern class and its `version`, top layers, head rounding, pattern options),
+    so bumping the version of a pattern invalidates everything built with the previous one.
+    There is a bounded in-memory LRU tier and an optional on-disk tier evicting the least recently used files.
+    The disk tier is best effort: corrupt files are treated as misses and removed, failed writes are logged and skipped.
+
+    :param max_items: Maximum number of totems kept in memory. Defaults to 1024.
+    :param directory: Directory of the on-disk tier. Defaults to None (no disk tier).
+    :param max_disk_bytes: Maximum total size of the on-disk tier in bytes. Defaults to 64 MiB.
+    """
+    def __init__(self, max_items: int = 1024, directory: Union[str, Path, None] = None,
+                 max_disk_bytes: int = 64 * 1024 * 1024):
+        self.max_items = max_items
+        self.directory = Path(directory) if directory is not None else None
+        self.max_disk_bytes = max_disk_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+        self._memory: OrderedDict[str, tuple[tuple[int, int], bytes]] = OrderedDict()
+        self._disk: OrderedDict[str, int] = OrderedDict()
+        self._disk_bytes = 0
+        self._lock = Lock()
+
+        if self.directory is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._load_disk_index()
+
+    def _load_disk_index(self):
+        """Indexes the files already in the directory, least recently used first, and trims it to the limit."""
+        entries = []
+        for path in self.directory.glob('*.totem'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue  # Removed by somebody else sharing the directory
+            entries.append((stat.st_mtime, path.stem, stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self._disk[key] = size
+            self._disk_bytes += size
+
+        while self._disk_bytes > self.max_disk_bytes and self._disk:
+            key, size = self._disk.popitem(last=False)
+            self._disk_bytes -= size
+            self._path(key).unlink(missing_ok=True)
+
+    @staticmethod
+    def key(skin: Skin, pattern: Type[Abstract], top_layers: list[TopLayer], round_head: bool,
+            kwargs: Optional[dict[str, Any]] = None, post: Optional[str] = None) -> str:
+        """
+        Computes the cache key of a totem.
+        Pattern options are hashed by their `repr`, so they must have a stable one.
+        `post` identifies the post-processing stages besides head rounding, e.g. the `repr` of their pipeline.
+
+        :return: Hex digest identifying the totem.
+        """
+        digest = hashlib.sha256(footprint_hash(skin, pattern, top_layers, **(kwargs or {})).encode())
+        settings = (
+            pattern.__module__, pattern.__qualname__, getattr(pattern, 'version', None),
+            sorted(layer.value for layer in top_layers), round_head,
+            sorted((kwargs or {}).items())
+        )
+        if post:
+            settings += (post,)
+        digest.update(repr(settings).encode())
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f'{key}.totem'
+
+    def get(self, key: str) -> Optional[Image.Image]:
+        """
+        Looks the totem image up, first in memory and then on disk.
+
+        :param key: The key from `TotemCache.key`.
+        :return: A new image with the cached totem, or None on a miss.
+        """
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+            elif key not in self._disk:
+                self.misses += 1
+                return None
+
+        if entry is None:
+            # Disk I/O happens outside the lock, so a slow disk doesn't hold up hits in memory
+            entry = self._read(key)
+            with self._lock:
+                if entry is None:
+                    self.misses += 1
+                    return None
+                if key in self._disk:
+                    self._disk.move_to_end(key)
+                self._remember(key, entry)
+                self.hits += 1
+                self.disk_hits += 1
+
+        size, data = entry
+        return Image.frombytes('RGBA', size, data)
+
+    def _read(self, key: str) -> Optional[tuple[tuple[int, int], bytes]]:
+        path = self._path(key)
+        try:
+            raw = path.read_bytes()
+        except OSError:
+            # Removed by somebody else sharing the directory
+            self._forget(key)
+            return None
+
+        if len(raw) >= _HEADER.size:
+            size = _HEADER.unpack_from(raw)
+            if len(raw) == _HEADER.size + size[0] * size[1] * 4:
+                try:
+                    os.utime(path)
+                except OSError:
+                    pass
+                return size, raw[_HEADER.size:]
+
+        logger.warning('Removing corrupt cache entry %s', path)
+        self._forget(key)
+        path.unlink(missing_ok=True)
+        return None
+
+    def _forget(self, key: str):
+        with self._lock:
+            size = self._disk.pop(key, None)
+            if size is not None:
+                self._disk_bytes -= size
+
+    def _remember(self, key: str, entry: tuple[tuple[int, int], bytes]):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_items:
+            self._memory.popitem(last=False)
+
+    def put(self, key: str, image: Image.Image):
+        """
+        Stores a totem image.
+
+        :param key: The key from `TotemCache.key`.
+        :param image: The RGBA totem image.
+        """
+        entry = image.size, image.tobytes()
+
+        with self._lock:
+            self._remember(key, entry)
+            if self.directory is None or key in self._disk:
+                return
+
+        raw = _HEADER.pack(*entry[0]) + entry[1]
+        path = self._path(key)
+        temporary = path.with_suffix(f'.{os.getpid()}-{get_ident()}.tmp')
+        try:
+            temporary.write_bytes(raw)
+            os.replace(temporary, path)
+        except OSError:
+            logger.warning('Failed to store %s in the cache directory', key, exc_info=True)
+            temporary.unlink(missing_ok=True)
+            return
+
+        evicted = []
+        with self._lock:
+            if key not in self._disk:
+                self._disk[key] = len(raw)
+                self._disk_bytes += len(raw)
+            while self._disk_bytes > self.max_disk_bytes and self._disk:
+                old_key, old_size = self._disk.popitem(last=False)
+                self._disk_bytes -= old_size
+                evicted.append(old_key)
+
+        for old_key in evicted:
+            self._path(old_key).unlink(missing_ok=True)
+
+    def clear(self):
+        """Removes every entry from both tiers and resets the counters."""
+        with self._lock:
+            self._memory.clear()
+            for key in self._disk:
+                self._path(key).unlink(missing_ok=True)
+            self._disk.clear()
+            self._disk_bytes = 0
+            self.hits = self.misses = self.disk_hits = 0
+
+    def __len__(self) -> int:
+        return len(self._memory)
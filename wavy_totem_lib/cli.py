@@ -0,0 +1,237 @@
+"""
+The `wavy-totem` command: converts a directory or a zip archive of skins into totems.
+
+    wavy-totem skins/ -o totems/ --pattern stt --round-head --scale 8
+    wavy-totem skins.zip -o totems/ --format webp --top-layers head,torso
+    wavy-totem skins/ -o totems/ --pattern-file styles/flat.toml
+
+The output mirrors the layout of the input. A manifest in the output directory maps every skin to the hash of its
+file and the totem written for it, so an interrupted run resumes where it stopped and unchanged skins are skipped.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+from io import BytesIO
+from pathlib import Path
+from typing import Iterator, Optional, Callable
+from zipfile import ZipFile, is_zipfile
+
+from .builder import BatchBuilder
+from .exceptions import InvalidPattern
+from .layers import TopLayer, ALL_TOP_LAYERS
+from .patterns import get as get_pattern, names as pattern_names, load_pattern
+from .skin import Skin
+from .totem import ENCODE_FORMATS
+
+MANIFEST_NAME = 'manifest.json'
+
+# (name, contents) of a skin file -> (name, encoded totem or None, error or None)
+Result = tuple[str, Optional[bytes], Optional[str]]
+
+
+def _convert(settings: dict, items: list[tuple[str, bytes]]) -> list[Result]:
+    """Worker side: decodes a chunk of skins, builds their totems together and encodes them."""
+    results: list[Result] = []
+    names, skins = [], []
+    for name, data in items:
+        try:
+            skins.append(Skin(BytesIO(data)))
+            names.append(name)
+        except Exception as error:
+            results.append((name, None, f'{type(error).__name__}: {error}'))
+
+    if 'pattern_file' in settings:
+        pattern = load_pattern(settings['pattern_file'], register=False)
+    else:
+        pattern = get_pattern(settings['pattern'])
+    top_layers = [TopLayer[name] for name in settings['top_layers']]
+    totems = BatchBuilder(pattern, top_layers, settings['round_head']).build(skins)
+    for name, totem in zip(names, totems):
+        results.append((name, totem.encode(settings['format'], factor=settings['scale']), None))
+
+    return results
+
+
+def _sources(path: Path) -> Iterator[tuple[str, Callable[[], bytes]]]:
+    """Yields the relative name and a reader of every PNG skin of a directory or a zip archive, sorted by name."""
+    if path.is_dir():
+        for file in sorted(path.rglob('*.png')):
+            yield file.relative_to(path).as_posix(), file.read_bytes
+        return
+
+    with ZipFile(path) as archive:
+        for name in sorted(archive.namelist()):
+            if name.lower().endswith('.png') and not name.endswith('/'):
+                yield name, lambda name=name: archive.read(name)
+
+
+class Manifest:
+    """Maps skins to the hashes of their files and their totems, written atomically after every chunk."""
+
+    def __init__(self, path: Path, settings: dict, reset: bool = False):
+        self.path = path
+        self.settings = settings
+        self.files: dict[str, dict] = {}
+
+        if not reset and path.exists():
+            data = json.loads(path.read_text())
+            # Totems made with other settings are outdated
+            if data.get('settings') == settings:
+                self.files = data.get('files', {})
+
+    def done(self, name: str, digest: str, output: Path) -> bool:
+        entry = self.files.get(name)
+        return entry is not None and entry['hash'] == digest and output.exists()
+
+    def add(self, name: str, digest: str, output: str):
+        self.files[name] = {'hash': digest, 'output': output}
+
+    def save(self):
+        temporary = self.path.with_name(self.path.name + '.tmp')
+        temporary.write_text(json.dumps({'settings': self.settings, 'files': self.files}, indent=1))
+        os.replace(temporary, self.path)
+
+
+def _parse_top_layers(value: str) -> list[TopLayer]:
+    if value == 'all':
+        return list(ALL_TOP_LAYERS)
+    if value == 'none':
+        return []
+    try:
+        return [TopLayer[name.strip().upper()] for name in value.split(',') if name.strip()]
+    except KeyError as error:
+        names = ', '.join(layer.name.lower() for layer in TopLayer)
+        raise argparse.ArgumentTypeError(f'unknown top layer {error}, use {names}')
+
+
+def _positive(value: str) -> int:
+    number = int(value)
+    if number <= 0:
+        raise argparse.ArgumentTypeError('must be greater than 0')
+    return number
+
+
+def _parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='wavy-totem', description='Converts Minecraft skins into totems of undying.')
+    parser.add_argument('input', type=Path, help='directory of PNG skins (searched recursively) or a zip archive')
+    parser.add_argument('-o', '--output', type=Path, required=True, help='directory for the totems')
+    parser.add_argument('-p', '--pattern', choices=pattern_names(), default='wavy',
+                        help='registered name of the pattern (default: wavy)')
+    parser.add_argument('--pattern-file', type=Path,
+                        help='TOML or JSON file of a declarative pattern, used instead of --pattern')
+    parser.add_argument('-t', '--top-layers', type=_parse_top_layers, default='all',
+                        help='comma-separated head, torso, hands, legs; or all, none (default: all)')
+    parser.add_argument('-r', '--round-head', action='store_true', help='round the corners of the head')
+    parser.add_argument('-s', '--scale', type=_positive, default=1, help='scale factor of the totems (default: 1)')
+    parser.add_argument('-f', '--format', choices=[f for f in ENCODE_FORMATS if f != 'raw'], default='png')
+    parser.add_argument('-j', '--workers', type=_positive, default=os.cpu_count() or 1,
+                        help='worker processes (default: number of CPUs)')
+    parser.add_argument('--chunk-size', type=_positive, default=64, help='skins sent to a worker at once')
+    parser.add_argument('--force', action='store_true', help='ignore the manifest and convert every skin')
+    parser.add_argument('-q', '--quiet', action='store_true', help="don't print failures and the summary")
+    return parser
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    args = _parser().parse_args(argv)
+    if not args.input.is_dir() and not is_zipfile(args.input):
+        print(f'wavy-totem: {args.input} is neither a directory nor a zip archive', file=sys.stderr)
+        return 2
+
+    pattern = get_pattern(args.pattern)
+    if args.pattern_file is not None:
+        try:
+            pattern = load_pattern(args.pattern_file, register=False)
+        except (InvalidPattern, OSError) as error:
+            print(f'wavy-totem: {error}', file=sys.stderr)
+            return 2
+
+    # The version of a declarative pattern is the hash of its spec, so editing the file converts the skins again
+    settings = {
+        'pattern': pattern.name if args.pattern_file is not None else args.pattern,
+        'pattern_version': getattr(pattern, 'version', None),
+        'top_layers': [layer.name for layer in args.top_layers], 'round_head': args.round_head,
+        'scale': args.scale, 'format': args.format,
+    }
+    if args.pattern_file is not None:
+        settings['pattern_file'] = str(args.pattern_file.resolve())
+    args.output.mkdir(parents=True, exist_ok=True)
+    manifest = Manifest(args.output / MANIFEST_NAME, settings, reset=args.force)
+    suffix = '.' + args.format
+
+    converted = skipped = 0
+    failures: list[tuple[str, str]] = []
+    digests: dict[str, str] = {}
+    start = time.perf_counter()
+
+    def collect(results: list[Result]):
+        nonlocal converted
+        for name, data, error in results:
+            if data is None:
+                failures.append((name, error))
+                continue
+            output = Path(name).with_suffix(suffix).as_posix()
+            path = args.output / output
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+            manifest.add(name, digests.pop(name), output)
+            converted += 1
+        manifest.save()
+
+    executor = ProcessPoolExecutor(args.workers) if args.workers > 1 else None
+    pending: deque[Future] = deque()
+    chunk: list[tuple[str, bytes]] = []
+
+    def submit():
+        if executor is None:
+            collect(_convert(settings, chunk))
+            return
+        pending.append(executor.submit(_convert, settings, list(chunk)))
+        # Keep the workers busy while bounding the skins held in memory
+        while len(pending) >= args.workers * 2:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                pending.remove(future)
+                collect(future.result())
+
+    try:
+        for name, read in _sources(args.input):
+            if Path(name).is_absolute() or '..' in Path(name).parts:
+                failures.append((name, 'the path leaves the output directory'))
+                continue
+
+            data = read()
+            digest = hashlib.sha256(data).hexdigest()
+            if manifest.done(name, digest, args.output / Path(name).with_suffix(suffix)):
+                skipped += 1
+                continue
+
+            digests[name] = digest
+            chunk.append((name, data))
+            if len(chunk) == args.chunk_size:
+                submit()
+                chunk = []
+
+        if chunk:
+            submit()
+        while pending:
+            collect(pending.popleft().result())
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+        manifest.save()
+
+    elapsed = time.perf_counter() - start
+    if not args.quiet:
+        for name, error in failures:
+            print(f'wavy-totem: failed to convert {name}: {error}', file=sys.stderr)
+        rate = converted / elapsed if elapsed > 0 else 0.0
+        print(f'Converted {converted} skins in {elapsed:.2f}s ({rate:.0f} totems/s), '
+              f'skipped {skipped} unchanged, {len(failures)} failed', file=sys.stderr)
+
+    return 1 if failures else 0
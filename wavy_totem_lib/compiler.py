@@ -0,0 +1,740 @@
+"""
+Pattern compiler.
+
+Patterns draw a totem with a handful of PIL operations (crop, resize, rotate, paste, alpha_composite, ...),
+but which skin pixel ends up where only depends on the skin layout, not on its colours.
+The compiler runs a pattern once against a symbolic skin, records what every canvas pixel is made of
+and turns that into a `CompiledPattern`: index tables for a gather over the skin buffer plus a few
+compositing layers. Rendering a compiled pattern takes a handful of Pillow calls instead of dozens.
+
+The PIL drawing code of the pattern stays the reference implementation, compiled output is pixel-exact with it.
+
+Compiled patterns are kept in memory. A pattern with a `plan_digest` (a hash of everything its drawing depends on)
+and a `plan_directory` also gets its plans stored in that directory and read back by later processes instead of
+tracing it again, as declarative patterns do (see `wavy_totem_lib.patterns.declarative`).
+"""
+import json
+import os
+import sys
+from array import array
+from functools import cache, lru_cache, cached_property
+from operator import itemgetter
+from pathlib import Path
+from typing import Type, Optional, Sequence, Union, Any
+
+from PIL import Image
+
+from .exceptions import PatternNotCompilable
+from .layers import TopLayer
+from .patterns.abstract import Abstract
+from .skin import Skin
+
+# Symbolic pixel expressions:
+#   ('c', (r, g, b, a))            constant colour
+#   ('s', index)                   pixel of the skin buffer
+#   ('r', job, index)              pixel of a resized skin region, job is (in_size, out_size, resample, inputs)
+#   ('o', dst, src)                alpha_composite of src over dst
+#   ('m', dst, src)                paste of src using its own alpha as a mask
+_CLEAR = ('c', (0, 0, 0, 0))
+_LEAVES = ('c', 's')
+
+# Version of the stored plans, bumped whenever the compiled form changes
+PLAN_FORMAT = 1
+
+
+class _Untraceable(Exception):
+    """Raised while tracing when the pattern does something that can't be expressed as a gather table."""
+
+
+def _color(value) -> tuple:
+    if isinstance(value, (tuple, list)) and len(value) in (3, 4) and all(isinstance(c, int) for c in value):
+        return tuple(value) if len(value) == 4 else tuple(value) + (255,)
+    raise _Untraceable(f'unsupported colour {value!r}')
+
+
+class _TraceImage:
+    """A stand-in for a RGBA `PIL.Image.Image` that holds symbolic pixel expressions instead of colours."""
+
+    mode = 'RGBA'
+
+    def __init__(self, size: tuple[int, int], pixels: list):
+        self.size = size
+        self.pixels = pixels
+
+    @classmethod
+    def new(cls, size: tuple[int, int]) -> '_TraceImage':
+        return cls(tuple(size), [_CLEAR] * (size[0] * size[1]))
+
+    def __getattr__(self, name: str):
+        # Only reached for what the stand-in doesn't implement, e.g. reading pixel values
+        if name.startswith('__'):
+            raise AttributeError(name)
+        raise _Untraceable(f'Image.{name}')
+
+    @property
+    def width(self) -> int:
+        return self.size[0]
+
+    @property
+    def height(self) -> int:
+        return self.size[1]
+
+    def _at(self, x: int, y: int):
+        if 0 <= x < self.size[0] and 0 <= y < self.size[1]:
+            return self.pixels[y * self.size[0] + x]
+        return _CLEAR
+
+    def copy(self) -> '_TraceImage':
+        return _TraceImage(self.size, list(self.pixels))
+
+    def crop(self, box=None) -> '_TraceImage':
+        if box is None:
+            return self.copy()
+
+        x0, y0, x1, y1 = map(int, map(round, box))
+        return _TraceImage((x1 - x0, y1 - y0), [self._at(x, y) for y in range(y0, y1) for x in range(x0, x1)])
+
+    def transpose(self, method) -> '_TraceImage':
+        w, h = self.size
+        method = Image.Transpose(method)
+        mapping = {
+            Image.Transpose.FLIP_LEFT_RIGHT: ((w, h), lambda x, y: (w - 1 - x, y)),
+            Image.Transpose.FLIP_TOP_BOTTOM: ((w, h), lambda x, y: (x, h - 1 - y)),
+            Image.Transpose.ROTATE_90: ((h, w), lambda x, y: (w - 1 - y, x)),
+            Image.Transpose.ROTATE_180: ((w, h), lambda x, y: (w - 1 - x, h - 1 - y)),
+            Image.Transpose.ROTATE_270: ((h, w), lambda x, y: (y, h - 1 - x)),
+            Image.Transpose.TRANSPOSE: ((h, w), lambda x, y: (y, x)),
+            Image.Transpose.TRANSVERSE: ((h, w), lambda x, y: (w - 1 - y, h - 1 - x)),
+        }
+        size, source = mapping[method]
+        return _TraceImage(size, [self._at(*source(x, y)) for y in range(size[1]) for x in range(size[0])])
+
+    def rotate(self, angle, resample=Image.Resampling.NEAREST, expand=0, center=None, translate=None,
+               fillcolor=None) -> '_TraceImage':
+        # Only the lossless fast paths of Image.rotate are supported
+        angle = angle % 360.0
+        if center or translate:
+            raise _Untraceable('rotation around a custom center')
+        if angle == 0:
+            return self.copy()
+        if angle == 180:
+            return self.transpose(Image.Transpose.ROTATE_180)
+        if angle in (90, 270) and (expand or self.width == self.height):
+            return self.transpose(Image.Transpose.ROTATE_90 if angle == 90 else Image.Transpose.ROTATE_270)
+        raise _Untraceable(f'rotation by {angle} degrees')
+
+    def resize(self, size, resample=None, box=None, reducing_gap=None) -> '_TraceImage':
+        size = tuple(size)
+        if box is not None and tuple(box) != (0, 0) + self.size:
+            raise _Untraceable('resize with a box')
+        if size == self.size:
+            return self.copy()
+
+        resample = Image.Resampling.BICUBIC if resample is None else Image.Resampling(resample)
+        out_w, out_h = size
+
+        if resample == Image.Resampling.NEAREST:
+            # Same coordinate mapping as Pillow's affine nearest-neighbour transform
+            sx, sy = self.width / out_w, self.height / out_h
+            return _TraceImage(size, [self._at(int((x + 0.5) * sx), int((y + 0.5) * sy))
+                                      for y in range(out_h) for x in range(out_w)])
+
+        if reducing_gap is not None:
+            raise _Untraceable('resize with reducing_gap')
+        if any(pixel[0] not in _LEAVES for pixel in self.pixels):
+            raise _Untraceable('resize of an already composited image')
+
+        job = (self.size, size, resample, tuple(self.pixels))
+        return _TraceImage(size, [('r', job, i) for i in range(out_w * out_h)])
+
+    def _region(self, box, size) -> tuple[int, int]:
+        if box is None:
+            box = (0, 0)
+        if len(box) == 4 and (box[2] - box[0], box[3] - box[1]) != size:
+            raise ValueError('images do not match')
+        return box[0], box[1]
+
+    def paste(self, im, box=None, mask=None):
+        if isinstance(im, _TraceImage):
+            left, top = self._region(box, im.size)
+            source = im
+        else:
+            if box is None or len(box) != 4:
+                raise _Untraceable('colour paste without a 4-item box')
+            left, top = box[0], box[1]
+            color = ('c', _color(im))
+            source = _TraceImage((box[2] - box[0], box[3] - box[1]), [color] * ((box[2] - box[0]) * (box[3] - box[1])))
+
+        if mask is not None and mask is not im:
+            raise _Untraceable('paste with a separate mask')
+
+        for y in range(source.height):
+            for x in range(source.width):
+                cx, cy = left + x, top + y
+                if 0 <= cx < self.width and 0 <= cy < self.height:
+                    value = source.pixels[y * source.width + x]
+                    if mask is not None:
+                        value = ('m', self.pixels[cy * self.width + cx], value)
+                    self.pixels[cy * self.width + cx] = value
+
+    def alpha_composite(self, im, dest=(0, 0), source=(0, 0)):
+        if len(source) == 4:
+            overlay = im.crop(source)
+        else:
+            overlay = im.crop(tuple(source) + im.size)
+
+        for y in range(overlay.height):
+            for x in range(overlay.width):
+                cx, cy = dest[0] + x, dest[1] + y
+                if 0 <= cx < self.width and 0 <= cy < self.height:
+                    index = cy * self.width + cx
+                    self.pixels[index] = ('o', self.pixels[index], overlay.pixels[y * overlay.width + x])
+
+    def putpixel(self, xy, value):
+        x, y = xy
+        x, y = x + self.width if x < 0 else x, y + self.height if y < 0 else y
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            raise IndexError('image index out of range')
+        self.pixels[y * self.width + x] = ('c', _color(value))
+
+
+class _TraceSkin(Skin):
+    """A skin whose image is symbolic: every pixel refers to its own index in the skin buffer."""
+
+    def __init__(self, slim: bool, version: str):
+        width, height = 64, 64  # Old skins are extended to 64x64 too
+        self.image = _TraceImage((width, height), [('s', i) for i in range(width * height)])
+        self.version = version
+        self.available_second = version == 'new'
+        self.is_slim = slim
+
+
+@cache
+def _traceable(pattern: Type[Abstract]) -> Type[Abstract]:
+    """Subclass of the pattern whose intermediate images are symbolic."""
+    return type(pattern.__name__, (pattern,), {'_new_image': lambda self, size: _TraceImage.new(size)})
+
+
+def _program(expr) -> list:
+    """Flattens a pixel expression into a base value followed by compositing steps."""
+    kind = expr[0]
+    if kind in ('o', 'm'):
+        steps = _program(expr[1])
+        operand = expr[2]
+        if operand[0] not in ('c', 's', 'r'):
+            raise _Untraceable('compositing of an already composited image')
+        if operand[0] == 'c' and operand[1][3] == 0:
+            # A fully transparent source leaves the destination untouched for both operations
+            return steps
+        return steps + [(kind, operand)]
+    return [('set', expr)]
+
+
+def _pack(color: tuple) -> int:
+    """Packs an RGBA colour the way memoryview(...).cast('I') reads it from a buffer."""
+    return int.from_bytes(bytes(color), sys.byteorder)
+
+
+def _getter(indexes: Sequence[int]):
+    """`operator.itemgetter` that always returns a tuple."""
+    if len(indexes) == 1:
+        index = indexes[0]
+        return lambda pool: (pool[index],)
+    return itemgetter(*indexes)
+
+
+class _ResampleGroup:
+    """
+    A set of equal-geometry resizes run as one Pillow call.
+
+    Resizes that only change the width work row by row, so their inputs can be stacked vertically ('rows');
+    the ones that only change the height are stacked horizontally ('columns'). Anything else runs alone ('single').
+    Stacking also extends across the skins of a batch.
+    """
+
+    def __init__(self, kind: str, in_size: tuple[int, int], out_size: tuple[int, int], resample,
+                 jobs: list[list[int]]):
+        self.kind = kind
+        self.in_size = in_size
+        self.out_size = out_size
+        self.resample = resample
+        self.jobs = len(jobs)
+        self.inputs = [tuple(job) for job in jobs]
+
+        if kind == 'columns':
+            # Row r of the strip is made of row r of every job, side by side
+            width = in_size[0]
+            self.indexes = [[i for job in jobs for i in job[row * width:(row + 1) * width]]
+                            for row in range(in_size[1])]
+            self._getters = [_getter(line) for line in self.indexes]
+            self._flat = _getter([i for line in self.indexes for i in line])
+        else:
+            self.indexes = [i for job in jobs for i in job]
+            self._getters = [_getter(self.indexes)]
+
+    @property
+    def output_count(self) -> int:
+        return self.jobs * self.out_size[0] * self.out_size[1]
+
+    def position(self, job: int, pos: int) -> int:
+        """Position of the pos-th output pixel of the job among the group outputs of one skin."""
+        out_w, out_h = self.out_size
+        if self.kind == 'columns':
+            y, x = divmod(pos, out_w)
+            return y * out_w * self.jobs + job * out_w + x
+        return job * out_w * out_h + pos
+
+    def run(self, pools: list[array]):
+        """Resizes the regions of every skin and appends the results to their pools."""
+        (in_w, in_h), (out_w, out_h) = self.in_size, self.out_size
+        strip = array('I')
+
+        if self.kind == 'single':
+            for pool in pools:
+                strip = array('I', self._getters[0](pool))
+                pool.frombytes(_resize(strip, self.in_size, self.out_size, self.resample))
+            return
+
+        if self.kind == 'rows':
+            for pool in pools:
+                strip.extend(self._getters[0](pool))
+            height = in_h * self.jobs * len(pools)
+            out = _resize(strip, (in_w, height), (out_w, height), self.resample)
+            step = self.output_count * 4
+            for n, pool in enumerate(pools):
+                pool.frombytes(out[n * step:(n + 1) * step])
+            return
+
+        if len(pools) == 1:
+            strip.extend(self._flat(pools[0]))
+        else:
+            for getter in self._getters:
+                for pool in pools:
+                    strip.extend(getter(pool))
+        row = in_w * self.jobs
+        out = _resize(strip, (row * len(pools), in_h), (row * len(pools), out_h), self.resample)
+        for n, pool in enumerate(pools):
+            for y in range(out_h):
+                start = (y * len(pools) + n) * row * 4
+                pool.frombytes(out[start:start + row * 4])
+
+
+def _resize(values: array, size: tuple[int, int], out_size: tuple[int, int], resample) -> bytes:
+    return Image.frombytes('RGBA', size, values.tobytes()).resize(out_size, resample).tobytes()
+
+
+class CompiledPattern:
+    """
+    A pattern turned into gather tables for one (slim, version, top_layers) configuration.
+
+    :param size: Size of the rendered image.
+    :param source_size: Size of the skin image the tables index into.
+    :param constants: Packed constant colours appended after the skin pixels.
+    :param groups: Resizes of skin regions, their outputs are appended after the constants.
+    :param layers: List of (operation, indexes); the first layer sets the canvas, the others are
+                   alpha-composited ('over') or pasted with their own alpha as mask ('mask') on top of it.
+    :param output: Position of every pixel of the image among the composited pixels, when the layers composite
+                   each distinct pixel only once. Defaults to None (the layers cover the image).
+    """
+
+    def __init__(self, size: tuple[int, int], source_size: tuple[int, int], constants: list[int],
+                 groups: list[_ResampleGroup], layers: list[tuple[str, array]], output: Optional[array] = None):
+        self.size = size
+        self.source_size = source_size
+        self.constants = array('I', constants)
+        self.groups = groups
+        self.layers = layers
+        self.output = output
+        self._getters = [_getter(indexes) for _, indexes in layers]
+        self._output = _getter(output) if output is not None else None
+        self._layer_size = size if output is None else (len(layers[0][1]), 1)
+
+    @cached_property
+    def footprint(self) -> tuple[int, ...]:
+        """Indexes of the skin pixels the pattern reads (`y * width + x`), in ascending order."""
+        used = set()
+        for _, indexes in self.layers:
+            used.update(indexes)
+        for group in self.groups:
+            for item in group.indexes:
+                if isinstance(item, list):
+                    used.update(item)
+                else:
+                    used.add(item)
+
+        sources = self.source_size[0] * self.source_size[1]
+        return tuple(sorted(index for index in used if index < sources))
+
+    def _gather(self, pools: list[array], getter) -> Image.Image:
+        data = array('I')
+        for pool in pools:
+            data.extend(getter(pool))
+        width, height = self._layer_size
+        return Image.frombytes('RGBA', (width, height * len(pools)), data.tobytes())
+
+    def render_many(self, buffers: Sequence[Union[bytes, bytearray, memoryview]]) -> Image.Image:
+        """
+        Renders several skins at once.
+
+        :param buffers: Raw RGBA pixels of skins of `source_size`.
+        :return: The rendered totems stacked vertically in one image.
+        """
+        pools = []
+        for buffer in buffers:
+            pool = array('I')
+            pool.frombytes(buffer)
+            pool.extend(self.constants)
+            pools.append(pool)
+
+        for group in self.groups:
+            group.run(pools)
+
+        canvas = self._gather(pools, self._getters[0])
+        for (operation, _), getter in zip(self.layers[1:], self._getters[1:]):
+            layer = self._gather(pools, getter)
+            if operation == 'over':
+                canvas = Image.alpha_composite(canvas, layer)
+            else:
+                canvas.paste(layer, (0, 0), layer)
+
+        if self._output is None:
+            return canvas
+
+        pixels = array('I')
+        pixels.frombytes(canvas.tobytes())
+        count, data = self._layer_size[0], array('I')
+        for n in range(len(pools)):
+            data.extend(self._output(pixels[n * count:(n + 1) * count]))
+        return Image.frombytes('RGBA', (self.size[0], self.size[1] * len(pools)), data.tobytes())
+
+    def render(self, buffer: Union[bytes, bytearray, memoryview]) -> Image.Image:
+        """
+        Renders a totem.
+
+        :param buffer: Raw RGBA pixels of a skin of `source_size`.
+        :return: PIL.Image.Image
+        """
+        return self.render_many([buffer])
+
+    def dumps(self) -> bytes:
+        """Serializes the plan, see `loads`."""
+        return json.dumps({
+            'format': PLAN_FORMAT, 'size': self.size, 'source_size': self.source_size,
+            'constants': self.constants.tolist(),
+            'groups': [[group.kind, group.in_size, group.out_size, int(group.resample), group.inputs]
+                       for group in self.groups],
+            'layers': [[operation, indexes.tolist()] for operation, indexes in self.layers],
+            'output': self.output.tolist() if self.output is not None else None,
+        }, separators=(',', ':')).encode()
+
+    @classmethod
+    def loads(cls, data: bytes) -> 'CompiledPattern':
+        """
+        Restores a plan serialized by `dumps`.
+
+        :raises ValueError: If the data is not a plan of the current format.
+        """
+        plan = json.loads(data)
+        if not isinstance(plan, dict) or plan.get('format') != PLAN_FORMAT:
+            raise ValueError('Not a compiled pattern of the current format')
+
+        groups = [_ResampleGroup(kind, tuple(in_size), tuple(out_size), Image.Resampling(resample), jobs)
+                  for kind, in_size, out_size, resample, jobs in plan['groups']]
+        return cls(
+            tuple(plan['size']), tuple(plan['source_size']), plan['constants'], groups,
+            [(operation, array('I', indexes)) for operation, indexes in plan['layers']],
+            array('I', plan['output']) if plan['output'] is not None else None
+        )
+
+
+def _trace(pattern: Type[Abstract], slim: bool, version: str, top_layers: list[TopLayer], kwargs: dict) -> _TraceImage:
+    skin = _TraceSkin(slim, version)
+    image = _traceable(pattern)(skin, top_layers, **kwargs).image
+    if not isinstance(image, _TraceImage):
+        raise _Untraceable('the pattern did not draw on images created by the pattern')
+    return image
+
+
+def _build(image: _TraceImage, source_size: tuple[int, int]) -> CompiledPattern:
+    programs = [_program(pixel) for pixel in image.pixels]
+
+    # Spread compositing steps over as few layers as possible while keeping their order for every pixel
+    layers = [('set', [program[0][1] for program in programs])]
+    for p, program in enumerate(programs):
+        last = 0
+        for operation, operand in program[1:]:
+            operation = 'over' if operation == 'o' else 'mask'
+            for index in range(last + 1, len(layers)):
+                if layers[index][0] == operation and layers[index][1][p] is None:
+                    break
+            else:
+                layers.append((operation, [None] * len(programs)))
+                index = len(layers) - 1
+            layers[index][1][p] = operand
+            last = index
+
+    operands = [operand for _, values in layers for operand in values if operand is not None]
+
+    # Constants live right after the skin pixels
+    sources = source_size[0] * source_size[1]
+    constants = {_CLEAR[1]: sources}
+    for operand in operands:
+        if operand[0] == 'r':
+            leaves = operand[1][3]
+        else:
+            leaves = (operand,)
+        for leaf in leaves:
+            if leaf[0] == 'c' and leaf[1] not in constants:
+                constants[leaf[1]] = sources + len(constants)
+
+    def leaf_index(leaf) -> int:
+        return leaf[1] if leaf[0] == 's' else constants[leaf[1]]
+
+    # Resizes are grouped by geometry, the outputs of the groups follow the constants
+    jobs: dict[tuple, list] = {}
+    for operand in operands:
+        if operand[0] == 'r':
+            job = operand[1]
+            in_size, out_size, resample, _ = job
+            if in_size[1] == out_size[1]:
+                key = ('rows', in_size, out_size, resample)
+            elif in_size[0] == out_size[0]:
+                key = ('columns', in_size, out_size, resample)
+            else:
+                key = ('single', job)
+            members = jobs.setdefault(key, [])
+            if job not in members:
+                members.append(job)
+
+    groups, positions, offset = [], {}, sources + len(constants)
+    for (kind, *_), members in jobs.items():
+        in_size, out_size, resample, _ = members[0]
+        group = _ResampleGroup(kind, in_size, out_size, resample,
+                               [[leaf_index(leaf) for leaf in job[3]] for job in members])
+        for number, job in enumerate(members):
+            positions[job] = (group, number, offset)
+        offset += group.output_count
+        groups.append(group)
+
+    def operand_index(operand) -> int:
+        if operand is None:
+            return constants[_CLEAR[1]]
+        if operand[0] == 'r':
+            group, number, start = positions[operand[1]]
+            return start + group.position(number, operand[2])
+        return leaf_index(operand)
+
+    return CompiledPattern(
+        image.size, source_size,
+        [_pack(color) for color in constants],
+        groups,
+        [(operation, array('I', [operand_index(operand) for operand in values])) for operation, values in layers]
+    )
+
+
+def _common_sequence(sequences: list[list[str]]) -> list[str]:
+    """A short sequence containing every given sequence as a subsequence, picking the most wanted item each step."""
+    positions = [0] * len(sequences)
+    merged = []
+    while True:
+        wanted = [sequence[position] for sequence, position in zip(sequences, positions) if position < len(sequence)]
+        if not wanted:
+            return merged
+
+        item = max(sorted(set(wanted)), key=wanted.count)
+        merged.append(item)
+        for n, sequence in enumerate(sequences):
+            if positions[n] < len(sequence) and sequence[positions[n]] == item:
+                positions[n] += 1
+
+
+def _merge(plans: Sequence[CompiledPattern], cleared: Sequence[Sequence[tuple[int, int]]]) -> CompiledPattern:
+    """
+    Joins plans for the same skin layout into one drawing all their images stacked vertically.
+    Constants and resize jobs shared by the plans are computed once; `cleared` lists pixels made transparent
+    in the image of each plan.
+    """
+    size, source_size = plans[0].size, plans[0].source_size
+    sources = source_size[0] * source_size[1]
+
+    constants = {_pack(_CLEAR[1]): sources}
+    remaps = []
+    for plan in plans:
+        remap = {}
+        for n, value in enumerate(plan.constants):
+            remap[sources + n] = constants.setdefault(value, sources + len(constants))
+        remaps.append(remap)
+
+    # Resize jobs of all plans, deduplicated and regrouped by geometry
+    jobs: dict[tuple, dict[tuple, int]] = {}
+    placements = []
+    for plan, remap in zip(plans, remaps):
+        offset = sources + len(plan.constants)
+        for group in plan.groups:
+            key = (group.kind, group.in_size, group.out_size, group.resample)
+            numbers = []
+            for job in group.inputs:
+                job = tuple(remap.get(index, index) for index in job)
+                members = jobs.setdefault(key + ((job,) if group.kind == 'single' else ()), {})
+                numbers.append((members, members.setdefault(job, len(members))))
+            placements.append((remap, group, offset, numbers))
+            offset += group.output_count
+
+    groups, starts, offset = [], {}, sources + len(constants)
+    for (kind, in_size, out_size, resample, *_), members in jobs.items():
+        group = _ResampleGroup(kind, in_size, out_size, resample, [list(job) for job in members])
+        starts[id(members)] = (group, offset)
+        offset += group.output_count
+        groups.append(group)
+
+    for remap, group, start, numbers in placements:
+        for n, (members, number) in enumerate(numbers):
+            merged, merged_start = starts[id(members)]
+            for pos in range(group.out_size[0] * group.out_size[1]):
+                remap[start + group.position(n, pos)] = merged_start + merged.position(number, pos)
+
+    # Layers follow a common order of the compositing operations, plans skip the ones they don't have
+    clear = constants[_pack(_CLEAR[1])]
+    operations = _common_sequence([[operation for operation, _ in plan.layers[1:]] for plan in plans])
+    layers = [('set', array('I'))] + [(operation, array('I')) for operation in operations]
+    for plan, remap, pixels in zip(plans, remaps, cleared):
+        cleared_positions = {y * size[0] + x for x, y in pixels}
+        own = iter(plan.layers)
+        pending = next(own)
+        for operation, indexes in layers:
+            if pending is not None and pending[0] == operation:
+                values = [remap.get(index, index) for index in pending[1]]
+                pending = next(own, None)
+            else:
+                values = [clear] * (size[0] * size[1])
+            for position in cleared_positions:
+                values[position] = clear
+            indexes.extend(values)
+
+    # Variants mostly repeat each other's pixels, so every distinct pixel is composited once and then spread out
+    programs: dict[tuple, int] = {}
+    output = array('I', [programs.setdefault(program, len(programs))
+                         for program in zip(*(indexes for _, indexes in layers))])
+    layers = [(operation, array('I', column)) for (operation, _), column in zip(layers, zip(*programs))]
+
+    return CompiledPattern((size[0], size[1] * len(plans)), source_size, list(constants), groups, layers, output)
+
+
+def _plan_path(pattern: Type[Abstract], slim: bool, version: str, top_layers: int,
+               kwargs: tuple[tuple[str, Any], ...]) -> Optional[Path]:
+    """Path of the stored plan of a configuration, or None if the pattern doesn't store its plans."""
+    directory, digest = getattr(pattern, 'plan_directory', None), getattr(pattern, 'plan_digest', None)
+    if directory is None or digest is None or kwargs:
+        return None
+    return Path(directory) / f'{digest}-{"slim" if slim else "wide"}-{version}-{top_layers}.plan'
+
+
+def _store(plan: CompiledPattern, path: Path):
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        temporary = path.with_suffix(f'.{os.getpid()}.tmp')
+        temporary.write_bytes(plan.dumps())
+        os.replace(temporary, path)
+    except OSError:
+        pass  # A read-only directory only costs tracing the pattern again next time
+
+
+@lru_cache(maxsize=256)
+def _compile(pattern: Type[Abstract], slim: bool, version: str, top_layers: int,
+             kwargs: tuple[tuple[str, Any], ...]) -> Optional[CompiledPattern]:
+    if not getattr(pattern, 'compilable', False):
+        return None
+
+    path = _plan_path(pattern, slim, version, top_layers, kwargs)
+    if path is not None:
+        try:
+            return CompiledPattern.loads(path.read_bytes())
+        except (OSError, ValueError, KeyError, TypeError):
+            pass  # Not stored yet, or stored by another version of the library
+
+    try:
+        layers = [layer for layer in TopLayer if layer.value & top_layers]
+        image = _trace(pattern, slim, version, layers, dict(kwargs))
+        plan = _build(image, (64, 64))
+    except _Untraceable:
+        # Anything the tracer doesn't understand means the pattern has to run through PIL
+        return None
+
+    if path is not None:
+        _store(plan, path)
+    return plan
+
+
+def _options(kwargs: dict[str, Any]) -> Optional[tuple[tuple[str, Any], ...]]:
+    """Pattern options as a cache key, None if they are unhashable."""
+    options = tuple(sorted(kwargs.items())) if kwargs else ()
+    try:
+        hash(options)
+    except TypeError:
+        return None
+    return options
+
+
+def compile_pattern(pattern: Type[Abstract], slim: bool, version: str, top_layers: list[TopLayer],
+                    **kwargs) -> CompiledPattern:
+    """
+    Compiles a pattern for the given skin configuration. Results are cached.
+
+    :param pattern: The pattern class.
+    :param slim: Whether the skin is slim.
+    :param version: Skin version, 'new' or 'old'.
+    :param top_layers: List of top layers to apply.
+    :param kwargs: Extra options of the pattern. They must be hashable.
+    :return: The compiled pattern.
+
+    :raises PatternNotCompilable: If the pattern cannot be expressed as a gather table.
+    """
+    # Top layers are keyed by their bits, hashing enum members is comparatively slow
+    layers = 0
+    for layer in top_layers:
+        layers |= layer.value
+    options = _options(kwargs)
+    compiled = _compile(pattern, bool(slim), version, layers, options) if options is not None else None
+    if compiled is None:
+        raise PatternNotCompilable()
+    return compiled
+
+
+@lru_cache(maxsize=64)
+def _compile_variants(pattern: Type[Abstract], slim: bool, version: str,
+                      variants: tuple[tuple[int, tuple[tuple[int, int], ...]], ...],
+                      kwargs: tuple[tuple[str, Any], ...]) -> Optional[CompiledPattern]:
+    plans = [_compile(pattern, slim, version, layers, kwargs) for layers, _ in variants]
+    if any(plan is None for plan in plans) or len({(plan.size, plan.source_size) for plan in plans}) != 1:
+        return None
+    return _merge(plans, [cleared for _, cleared in variants])
+
+
+def compile_variants(pattern: Type[Abstract], slim: bool, version: str,
+                     variants: Sequence[tuple[list[TopLayer], Sequence[tuple[int, int]]]],
+                     **kwargs) -> CompiledPattern:
+    """
+    Compiles several variants of a pattern into one plan rendering all of them at once, stacked vertically.
+    Skin pixels, constants and resizes shared by the variants are handled once. Results are cached.
+
+    :param pattern: The pattern class.
+    :param slim: Whether the skin is slim.
+    :param version: Skin version, 'new' or 'old'.
+    :param variants: For every variant, its top layers and the (x, y) pixels made transparent afterwards.
+    :param kwargs: Extra options of the pattern. They must be hashable.
+    :return: The compiled plan of all variants.
+
+    :raises PatternNotCompilable: If the pattern cannot be expressed as a gather table.
+    """
+    keys = []
+    for top_layers, cleared in variants:
+        layers = 0
+        for layer in top_layers:
+            layers |= layer.value
+        keys.append((layers, tuple(cleared)))
+
+    options = _options(kwargs)
+    compiled = _compile_variants(pattern, bool(slim), version, tuple(keys), options) if options is not None else None
+    if compiled is None:
+        raise PatternNotCompilable()
+    return compiled
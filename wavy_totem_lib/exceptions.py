@@ -2,3 +2,33 @@ class SmallScale(Exception):
     def __init__(self, message: str = 'Cannot increase size to 0x or less'):
         self.message = message
         super().__init__(self.message)
+
+
+class PatternNotCompilable(Exception):
+    def __init__(self, message: str = 'The pattern cannot be compiled into a gather table'):
+        self.message = message
+        super().__init__(self.message)
+
+
+class UnknownPattern(Exception):
+    def __init__(self, message: str = 'No pattern is registered under this name'):
+        self.message = message
+        super().__init__(self.message)
+
+
+class FetchFailed(Exception):
+    def __init__(self, message: str = 'Failed to fetch the skin'):
+        self.message = message
+        super().__init__(self.message)
+
+
+class UnknownStage(Exception):
+    def __init__(self, message: str = 'No post-processing stage is registered under this name'):
+        self.message = message
+        super().__init__(self.message)
+
+
+class InvalidPattern(Exception):
+    def __init__(self, message: str = 'The declarative pattern is not valid'):
+        self.message = message
+        super().__init__(self.message)
@@ -0,0 +1,137 @@
+"""
+Opt-in instrumentation of the stages of a build.
+
+Install a sink with `set_sink` to receive the duration and the number of allocated memory blocks of every named stage:
+opening and converting the skin, each step of a pattern, compiling and rendering in the builder, scaling and encoding
+the totem. Without a sink a stage is a shared no-op context manager, so the instrumentation costs a function call.
+
+    class Sink:
+        def record(self, stage, seconds, blocks, tags):
+            statsd.timing(f'totem.{stage}', seconds * 1000, tags=tags)
+
+    set_sink(Sink())
+    with tags(skin='notch'):
+        TotemBuilder(Skin('notch.png')).build()
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sys import getallocatedblocks
+from threading import Lock
+from time import perf_counter
+from typing import Protocol, Optional, Mapping, Iterator
+
+
+class MetricsSink(Protocol):
+    def record(self, stage: str, seconds: float, blocks: int, tags: Mapping[str, object]) -> None:
+        """
+        Receives the metrics of a finished stage. Called from the thread that ran the stage.
+
+        :param stage: Name of the stage, e.g. `skin.open` or `wavy.hands`.
+        :param seconds: Duration of the stage.
+        :param blocks: Change of the number of memory blocks allocated by the interpreter during the stage.
+        :param tags: Tags set with `tags()` around the stage.
+        """
+
+
+_sink: Optional[MetricsSink] = None
+_tags: ContextVar[Mapping[str, object]] = ContextVar('wavy_totem_lib_tags', default={})
+
+
+class _NullStage:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return None
+
+
+class _Stage:
+    __slots__ = ('sink', 'name', 'start', 'blocks')
+
+    def __init__(self, sink: MetricsSink, name: str):
+        self.sink = sink
+        self.name = name
+
+    def __enter__(self):
+        self.blocks = getallocatedblocks()
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        seconds = perf_counter() - self.start
+        self.sink.record(self.name, seconds, getallocatedblocks() - self.blocks, _tags.get())
+        return None
+
+
+_NULL_STAGE = _NullStage()
+
+
+def stage(name: str):
+    """
+    Context manager measuring a named stage, a no-op when no sink is installed.
+
+    :param name: Name of the stage.
+    """
+    sink = _sink
+    if sink is None:
+        return _NULL_STAGE
+    return _Stage(sink, name)
+
+
+def set_sink(sink: Optional[MetricsSink]) -> Optional[MetricsSink]:
+    """
+    Installs the sink receiving the metrics of all stages, process-wide.
+
+    :param sink: The sink, or None to disable the instrumentation.
+    :return: The previously installed sink.
+    """
+    global _sink
+    previous, _sink = _sink, sink
+    return previous
+
+
+def get_sink() -> Optional[MetricsSink]:
+    """Returns the installed sink or None."""
+    return _sink
+
+
+@contextmanager
+def tags(**values) -> Iterator[None]:
+    """
+    Adds tags to the stages recorded in the current thread or task, e.g. the name of the skin being built.
+    Nested calls are merged.
+    """
+    token = _tags.set({**_tags.get(), **values})
+    try:
+        yield
+    finally:
+        _tags.reset(token)
+
+
+class StageStats:
+    """
+    A sink aggregating the count, total and maximal duration and the allocated blocks of every stage.
+    The tags of the slowest call are kept to find the skins that take the longest.
+    """
+
+    def __init__(self):
+        self.stages: dict[str, dict] = {}
+        self._lock = Lock()
+
+    def record(self, stage: str, seconds: float, blocks: int, tags: Mapping[str, object]) -> None:
+        with self._lock:
+            stats = self.stages.get(stage)
+            if stats is None:
+                stats = self.stages[stage] = {'count': 0, 'total': 0.0, 'max': 0.0, 'blocks': 0, 'slowest': {}}
+            stats['count'] += 1
+            stats['total'] += seconds
+            stats['blocks'] += blocks
+            if seconds >= stats['max']:
+                stats['max'] = seconds
+                stats['slowest'] = dict(tags)
+
+    def clear(self):
+        with self._lock:
+            self.stages.clear()
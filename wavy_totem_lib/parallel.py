@@ -0,0 +1,199 @@
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, Future, wait, FIRST_COMPLETED
+from io import BytesIO
+from multiprocessing.shared_memory import SharedMemory
+from pathlib import Path
+from typing import Type, Union, Iterable, Iterator, Optional, Any
+
+from .builder import BatchBuilder
+from .layers import TopLayer, ALL_TOP_LAYERS
+from .patterns import resolve
+from .patterns.abstract import Abstract
+from .skin import Skin
+from .totem import Totem
+
+SkinSource = Union[bytes, bytearray, memoryview, str, Path]
+
+
+def _render_chunk(settings: tuple, blobs: Optional[tuple[str, list[int]]], paths: list[str]) -> tuple:
+    """
+    Worker side: decodes a chunk of skins, renders it and writes the totem pixels into a new shared memory block.
+    Encoded skins arrive either as paths or as a shared memory block with their offsets.
+    """
+    pattern, top_layers, round_head, kwargs = settings
+
+    if blobs is not None:
+        name, offsets = blobs
+        block = SharedMemory(name=name)
+        try:
+            skins = [Skin(BytesIO(bytes(block.buf[start:end]))) for start, end in zip(offsets, offsets[1:])]
+        finally:
+            block.close()
+    else:
+        skins = [Skin(path) for path in paths]
+
+    totems = BatchBuilder(pattern, top_layers, round_head).build(skins, **kwargs)
+    data = [totem.tobytes() for totem in totems]
+
+    output = SharedMemory(create=True, size=max(sum(map(len, data)), 1))
+    try:
+        position = 0
+        for chunk in data:
+            output.buf[position:position + len(chunk)] = chunk
+            position += len(chunk)
+        return output.name, [totem.size for totem in totems], [skin.is_slim for skin in skins]
+    finally:
+        output.close()
+
+
+class ParallelRenderer:
+    """
+    A class designed to render large batches of skins on several processes.
+
+    Skins are split into chunks; each worker process decodes its chunk and renders it with `BatchBuilder`.
+    Encoded skins given as bytes and the rendered pixels travel through shared memory, not through pickling.
+    The pattern class must be importable by the worker processes, a name is looked up in the parent process.
+    Declarative patterns are sent to the workers as their spec.
+
+    Use it as a context manager or call `close()` to stop the workers.
+
+    :param pattern: The pattern class or the registered name of the pattern to use for building the totems.
+                    Defaults to 'wavy'.
+    :param top_layers: A list of top layers to apply to the totems. Defaults to ALL_TOP_LAYERS.
+    :param round_head: Determines whether to round the head or not. Defaults to False.
+    :param workers: Number of worker processes. Defaults to the number of CPUs.
+    :param chunk_size: Number of skins sent to a worker at once. Defaults to 64.
+    """
+    def __init__(self, pattern: Union[str, Type[Abstract]] = 'wavy',
+                 top_layers: list[TopLayer] | None = ALL_TOP_LAYERS, round_head: bool = False,
+                 workers: Optional[int] = None, chunk_size: int = 64):
+        self.pattern = resolve(pattern)
+        self.top_layers = top_layers if top_layers is not None else []
+        self.round_head = round_head
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    def __enter__(self) -> 'ParallelRenderer':
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Stops the worker processes."""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def _chunks(self, sources: Iterable[SkinSource]) -> Iterator[list[SkinSource]]:
+        chunk = []
+        for source in sources:
+            chunk.append(source)
+            if len(chunk) == self.chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+    def _submit(self, chunk: list[SkinSource], kwargs: dict[str, Any]) -> tuple[Future, Optional[SharedMemory]]:
+        settings = (self.pattern, self.top_layers, self.round_head, kwargs)
+
+        if all(isinstance(source, (str, Path)) for source in chunk):
+            return self._executor.submit(_render_chunk, settings, None, [str(source) for source in chunk]), None
+
+        blobs = [Path(source).read_bytes() if isinstance(source, (str, Path)) else source for source in chunk]
+        offsets = [0]
+        for blob in blobs:
+            offsets.append(offsets[-1] + len(blob))
+
+        block = SharedMemory(create=True, size=max(offsets[-1], 1))
+        for blob, start, end in zip(blobs, offsets, offsets[1:]):
+            block.buf[start:end] = blob
+        return self._executor.submit(_render_chunk, settings, (block.name, offsets), []), block
+
+    def _collect(self, future: Future, block: Optional[SharedMemory]) -> list[Totem]:
+        if block is not None:
+            block.close()
+            block.unlink()
+
+        name, sizes, slims = future.result()
+        output = SharedMemory(name=name)
+        try:
+            totems, position = [], 0
+            for size, slim in zip(sizes, slims):
+                length = size[0] * size[1] * 4
+                totems.append(Totem.from_rgba(output.buf[position:position + length], self.pattern, slim,
+                                              self.top_layers, self.round_head, *size))
+                position += length
+            return totems
+        finally:
+            output.close()
+            output.unlink()
+
+    def _run(self, sources: Iterable[SkinSource], ordered: bool, kwargs: dict[str, Any]) -> Iterator[tuple[int, Totem]]:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+
+        chunks = enumerate(self._chunks(sources))
+        pending: dict[Future, tuple[int, Optional[SharedMemory]]] = {}
+        order: deque[Future] = deque()
+        try:
+            while True:
+                # Keep every worker busy plus one chunk in reserve, never load the whole input
+                while len(pending) < self.workers * 2:
+                    number, chunk = next(chunks, (None, None))
+                    if chunk is None:
+                        break
+                    future, block = self._submit(chunk, kwargs)
+                    pending[future] = (number * self.chunk_size, block)
+                    order.append(future)
+
+                if not pending:
+                    return
+
+                if ordered:
+                    done = [order.popleft()]
+                    wait(done)
+                else:
+                    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    start, block = pending.pop(future)
+                    if not ordered:
+                        order.remove(future)
+                    for offset, totem in enumerate(self._collect(future, block)):
+                        yield start + offset, totem
+        finally:
+            # The consumer stopped early: drop what is still in flight
+            for future, (_, block) in pending.items():
+                if not future.cancel():
+                    try:
+                        self._collect(future, block)
+                    except Exception:
+                        pass
+                elif block is not None:
+                    block.close()
+                    block.unlink()
+
+    def render(self, sources: Iterable[SkinSource], **kwargs) -> Iterator[Totem]:
+        """
+        Renders the skins, yielding totems in the order of the sources.
+
+        :param sources: Skin files as paths or encoded bytes.
+        :param kwargs: Additional keyword arguments passed to the pattern.
+        :return: Iterator over the built Totem objects.
+        """
+        for _, totem in self._run(sources, True, kwargs):
+            yield totem
+
+    def render_unordered(self, sources: Iterable[SkinSource], **kwargs) -> Iterator[tuple[int, Totem]]:
+        """
+        Renders the skins, yielding totems as soon as their chunk is done.
+
+        :param sources: Skin files as paths or encoded bytes.
+        :param kwargs: Additional keyword arguments passed to the pattern.
+        :return: Iterator over (index of the source, Totem) pairs.
+        """
+        return self._run(sources, False, kwargs)
@@ -1,3 +1,119 @@
-from .wavy import Wavy
-from .soul import STT
-from .abstract import Abstract
+"""
+Patterns and the registry looking them up by name.
+
+The built-in patterns are registered as 'wavy' and 'stt'. Third-party packages add their patterns with `register`
+or through an entry point in the `wavy_totem_lib.patterns` group:
+
+    [project.entry-points."wavy_totem_lib.patterns"]
+    flat = "my_package.patterns:Flat"
+
+Pattern modules are imported on first use, so looking up one pattern doesn't load the others.
+
+Patterns can also be described in TOML or JSON files and loaded with `load_pattern`, which registers them under
+the name given in the file, see `wavy_totem_lib.patterns.declarative`.
+"""
+from importlib import import_module
+from typing import TYPE_CHECKING, Type, Union, Optional, Callable
+
+from ..exceptions import UnknownPattern
+
+if TYPE_CHECKING:
+    from .abstract import Abstract
+    from .soul import STT
+    from .wavy import Wavy
+    from .declarative import DeclarativePattern, load_pattern, pattern_from_spec
+
+ENTRY_POINT_GROUP = 'wavy_totem_lib.patterns'
+
+# name -> (module, class) of the built-in patterns
+_BUILTIN = {'wavy': ('.wavy', 'Wavy'), 'stt': ('.soul', 'STT')}
+# Attributes of this package loaded on first access
+_LAZY = {
+    'Wavy': '.wavy', 'STT': '.soul', 'Abstract': '.abstract',
+    'DeclarativePattern': '.declarative', 'load_pattern': '.declarative', 'pattern_from_spec': '.declarative',
+}
+
+_registry: dict[str, Type['Abstract']] = {}
+_entry_points: Optional[dict] = None
+
+
+def _load_entry_points() -> dict:
+    global _entry_points
+    if _entry_points is None:
+        from importlib.metadata import entry_points
+        _entry_points = {entry.name: entry for entry in entry_points(group=ENTRY_POINT_GROUP)}
+    return _entry_points
+
+
+def register(name: str, pattern: Optional[Type['Abstract']] = None) -> Union[Type['Abstract'], Callable]:
+    """
+    Registers a pattern under a name, replacing the pattern registered under it before.
+    Can be used as a class decorator:
+
+        @register('flat')
+        class Flat(Abstract):
+            ...
+
+    :param name: The name of the pattern.
+    :param pattern: The pattern class. If omitted, returns a decorator registering the decorated class.
+    :return: The pattern class, or the decorator.
+    """
+    if pattern is None:
+        return lambda cls: register(name, cls)
+
+    _registry[name] = pattern
+    return pattern
+
+
+def get(name: str) -> Type['Abstract']:
+    """
+    Returns the pattern registered under a name, importing its module if needed.
+    Patterns registered with `register` take precedence over the built-in ones and the entry points.
+
+    :param name: The name of the pattern, e.g. 'wavy' or 'stt'.
+    :return: The pattern class.
+
+    :raises UnknownPattern: If there is no pattern with this name.
+    """
+    pattern = _registry.get(name)
+    if pattern is not None:
+        return pattern
+
+    if name in _BUILTIN:
+        module, attribute = _BUILTIN[name]
+        pattern = getattr(import_module(module, __name__), attribute)
+    elif name in _load_entry_points():
+        pattern = _entry_points[name].load()
+    else:
+        raise UnknownPattern(f'Unknown pattern {name!r}, available: {", ".join(names())}')
+
+    _registry[name] = pattern
+    return pattern
+
+
+def names() -> list[str]:
+    """Returns the names of all available patterns, sorted."""
+    return sorted({*_BUILTIN, *_load_entry_points(), *_registry})
+
+
+def resolve(pattern: Union[str, Type['Abstract']]) -> Type['Abstract']:
+    """Returns the pattern class, looking it up in the registry if the pattern is given by name."""
+    return get(pattern) if isinstance(pattern, str) else pattern
+
+
+def __getattr__(name: str):
+    module = _LAZY.get(name)
+    if module is None:
+        raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
+
+    value = getattr(import_module(module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *_LAZY})
+
+
+__all__ = ['Wavy', 'STT', 'Abstract', 'DeclarativePattern', 'ENTRY_POINT_GROUP', 'register', 'get', 'names',
+           'resolve', 'load_pattern', 'pattern_from_spec']
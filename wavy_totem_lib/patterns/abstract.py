@@ -1,4 +1,6 @@
 from abc import ABC, abstractmethod
+from functools import wraps
+from typing import Optional
 
 from PIL import Image
 
@@ -6,12 +8,55 @@ from ..layers import TopLayer
 from ..skin import Skin
 
 
+def _per_call(draw):
+    """
+    Wraps the getter of `image` to draw on a shallow copy of the pattern with a copy of its canvas, so the instance
+    keeps only its configuration and every access (from any thread) gets its own scratch state.
+    """
+    @wraps(draw)
+    def image(self):
+        if self._drawing:
+            # `super().image` of a subclass, already drawing on the copy
+            return draw(self)
+
+        call = object.__new__(type(self))
+        call.__dict__.update(self.__dict__)
+        call._drawing = True
+        canvas = self.__dict__.get('_canvas')
+        # Keeps whatever `__init__` drew on the canvas, but never the drawing of an earlier call
+        call._canvas = canvas.copy() if canvas is not None else call._new_image((16, 16))
+        return draw(call)
+
+    image.per_call = True
+    return image
+
+
 class Abstract(ABC):
     """
     Abstract pattern class.
     Use to create other patterns.
+
+    Patterns are compiled into pixel-gather tables by tracing their drawing code (see `wavy_totem_lib.compiler`).
+    Set `compilable` to False if the output depends on pixel values or anything besides the skin layout.
+    The skin pixels the pattern reads (its footprint) are derived from the compiled form, see `footprint`.
+
+    Bump `version` whenever the pattern starts drawing differently, so that cached totems are invalidated.
+
+    Every access to `image` draws on its own copy of the pattern with a copy of the `_canvas` made by `__init__`,
+    so attributes set while drawing never leak into the next call and one instance can be drawn from several threads
+    at once.
     """
 
+    compilable: bool = True
+    version: int = 1
+    _drawing: bool = False
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        image = cls.__dict__.get('image')
+        if isinstance(image, property) and not getattr(image.fget, 'per_call', False):
+            cls.image = property(_per_call(image.fget), doc=image.__doc__)
+
     @abstractmethod
     def __init__(self, skin: Skin, top_layers: list[TopLayer], **kwargs):
         """
@@ -27,7 +72,38 @@ class Abstract(ABC):
         self.skin = skin
         self.top_layers = top_layers
         self.kwargs = kwargs
-        self._canvas = Image.new("RGBA", (16, 16))
+        self._canvas = self._new_image((16, 16))
+
+    @classmethod
+    def footprint(cls, slim: bool, version: str, top_layers: list[TopLayer], **kwargs) -> Optional[tuple[int, ...]]:
+        """
+        Returns the skin pixels the pattern reads for the given configuration.
+        Derived from the compiled pattern; override it to declare the footprint of a pattern that can't be compiled.
+
+        :param slim: Whether the skin is slim.
+        :param version: Skin version, 'new' or 'old'.
+        :param top_layers: List of top layers to apply.
+        :param kwargs: Extra options of the pattern.
+        :return: Indexes of the pixels in the skin image (`y * width + x`) in ascending order,
+                 or None if unknown (the whole skin may be read).
+        """
+        from ..compiler import compile_pattern
+        from ..exceptions import PatternNotCompilable
+
+        try:
+            return compile_pattern(cls, slim, version, top_layers, **kwargs).footprint
+        except PatternNotCompilable:
+            return None
+
+    def _new_image(self, size: tuple[int, int]) -> Image.Image:
+        """
+        Creates an empty transparent RGBA image.
+        Use it instead of `Image.new` for intermediate images so that the pattern stays compilable.
+
+        :param size: Image size as (width, height).
+        :return: PIL.Image.Image
+        """
+        return Image.new("RGBA", size)
 
     @property
     @abstractmethod
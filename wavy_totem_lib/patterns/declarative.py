@@ -0,0 +1,357 @@
+"""
+Declarative patterns: totem styles described in a TOML or JSON file instead of Python code.
+
+    name = "flat"
+    clear = [[4, 15], [11, 15]]
+
+    [[parts]]                                   # drawn in order
+    source = { part = "head" }                  # the front of the head, wherever the skin keeps it
+    to = [4, 1]
+
+    [[parts]]
+    source = { part = "head" }
+    layer = "head"                              # an overlay: the second layer, drawn when the top layer is on
+    to = [4, 1]
+    blend = "over"
+
+    [[parts]]
+    source = { box = [44, 20, 48, 21] }         # any box of the skin
+    resize = [3, 1]
+    rotate = 90
+    to = [12, 8]
+
+A spec is validated when it is loaded and turned into a subclass of `Abstract` running its parts in order.
+That code only crops, resizes, rotates, mirrors and pastes, so the compiler turns it into gather tables like
+the built-in patterns. Given a `plan_directory`, the compiled plans are stored there under the hash of the spec
+and later processes read them instead of compiling the pattern again.
+"""
+import copyreg
+import hashlib
+import json
+import re
+from abc import ABCMeta
+from copy import deepcopy
+from pathlib import Path
+from typing import Any, ClassVar, NamedTuple, Optional, Type, Union
+
+from PIL import Image
+
+from . import register as register_pattern
+from .abstract import Abstract
+from ..exceptions import InvalidPattern
+from ..layers import TopLayer
+from ..metrics import stage
+from ..skin import Skin, PARTS, FACES
+
+try:
+    import tomllib
+except ImportError:  # Python 3.10, only JSON specs
+    tomllib = None
+
+# Version of the spec format, part of the hash of every spec
+SPEC_FORMAT = 1
+
+CANVAS_SIZE = (16, 16)
+SKIN_SIZE = (64, 64)
+
+_NAME = re.compile(r'[a-z][a-z0-9_-]*')
+_RESAMPLE = {resample.name.lower(): resample for resample in Image.Resampling}
+_MIRROR = {'horizontal': Image.Transpose.FLIP_LEFT_RIGHT, 'vertical': Image.Transpose.FLIP_TOP_BOTTOM}
+_BLEND = ('paste', 'over', 'mask')
+_LAYERS = {layer.name.lower(): layer for layer in TopLayer}
+_SOURCES = ('part', 'box', 'canvas')
+_PART_KEYS = {'source', 'crop', 'resize', 'resample', 'rotate', 'mirror', 'to', 'blend', 'layer', 'when'}
+
+
+class Part(NamedTuple):
+    """A validated part of a spec, see the documentation of the format for the meaning of the fields."""
+    source: str
+    region: Union[str, tuple[int, int, int, int]]
+    face: Optional[str]
+    crop: Optional[tuple[int, int, int, int]]
+    resize: Optional[tuple[int, int]]
+    resample: str
+    rotate: int
+    mirror: Optional[str]
+    to: tuple[int, int]
+    blend: str
+    layer: Optional[str]
+    slim: Optional[bool]
+    version: Optional[str]
+
+
+class _Errors(list):
+    def check(self, condition: bool, where: str, message: str) -> bool:
+        if not condition:
+            self.append(f'{where}: {message}')
+        return condition
+
+
+def _is_int(value: Any) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _box(errors: _Errors, value: Any, where: str, size: Optional[tuple[int, int]] = None):
+    """Validates a (left, upper, right, lower) box, within the size if given."""
+    if not errors.check(isinstance(value, list) and len(value) == 4 and all(map(_is_int, value)),
+                        where, 'expected [left, upper, right, lower]'):
+        return None
+    left, upper, right, lower = value
+    if not errors.check(0 <= left < right and 0 <= upper < lower, where, 'expected a non-empty box'):
+        return None
+    if size is not None and not errors.check(right <= size[0] and lower <= size[1], where,
+                                             f'expected a box within {size[0]}x{size[1]}'):
+        return None
+    return left, upper, right, lower
+
+
+def _pair(errors: _Errors, value: Any, where: str, low: int, high: int):
+    """Validates a pair of integers in [low, high]."""
+    if isinstance(value, list) and len(value) == 2 and all(_is_int(item) and low <= item <= high for item in value):
+        return tuple(value)
+    errors.append(f'{where}: expected two integers from {low} to {high}')
+    return None
+
+
+def _choice(errors: _Errors, value: Any, where: str, choices) -> Optional[str]:
+    if not isinstance(value, bool) and value in choices:
+        return value
+    errors.append(f'{where}: expected one of {", ".join(map(str, choices))}, got {value!r}')
+    return None
+
+
+def _part(errors: _Errors, value: Any, where: str) -> Optional[Part]:
+    if not errors.check(isinstance(value, dict), where, 'expected a table'):
+        return None
+    for key in sorted(value.keys() - _PART_KEYS):
+        errors.append(f'{where}: unknown key {key!r}')
+    count = len(errors)
+
+    source, region, face = None, None, None
+    spec = value.get('source')
+    if errors.check(isinstance(spec, dict), f'{where}.source', 'expected a table with one of part, box, canvas'):
+        kinds = [kind for kind in _SOURCES if kind in spec]
+        for key in sorted(spec.keys() - {*_SOURCES, 'face'}):
+            errors.append(f'{where}.source: unknown key {key!r}')
+        if errors.check(len(kinds) == 1, f'{where}.source', 'expected exactly one of part, box, canvas'):
+            source = kinds[0]
+            if source == 'part':
+                region = _choice(errors, spec['part'], f'{where}.source.part', PARTS)
+                face = _choice(errors, spec.get('face', 'front'), f'{where}.source.face', FACES)
+            else:
+                errors.check('face' not in spec, f'{where}.source.face', 'only allowed with part')
+                region = _box(errors, spec[source], f'{where}.source.{source}',
+                              SKIN_SIZE if source == 'box' else CANVAS_SIZE)
+
+    crop = _box(errors, value['crop'], f'{where}.crop') if 'crop' in value else None
+    resize = _pair(errors, value['resize'], f'{where}.resize', 1, 64) if 'resize' in value else None
+    resample = _choice(errors, value.get('resample', 'bicubic'), f'{where}.resample', tuple(_RESAMPLE))
+    errors.check(resize is not None or 'resample' not in value, f'{where}.resample', 'only allowed with resize')
+    rotate = _choice(errors, value.get('rotate', 0), f'{where}.rotate', (0, 90, 180, 270))
+    mirror = _choice(errors, value['mirror'], f'{where}.mirror', tuple(_MIRROR)) if 'mirror' in value else None
+    to = _pair(errors, value.get('to'), f'{where}.to', 0, CANVAS_SIZE[0] - 1)
+    blend = _choice(errors, value.get('blend', 'paste'), f'{where}.blend', _BLEND)
+    layer = _choice(errors, value['layer'], f'{where}.layer', tuple(_LAYERS)) if 'layer' in value else None
+
+    slim, version = None, None
+    when = value.get('when', {})
+    if errors.check(isinstance(when, dict), f'{where}.when', 'expected a table with slim and/or version'):
+        for key in sorted(when.keys() - {'slim', 'version'}):
+            errors.append(f'{where}.when: unknown key {key!r}')
+        if 'slim' in when:
+            slim = when['slim'] if errors.check(isinstance(when['slim'], bool), f'{where}.when.slim',
+                                                'expected true or false') else None
+        if 'version' in when:
+            version = _choice(errors, when['version'], f'{where}.when.version', ('new', 'old'))
+
+    if len(errors) > count:
+        return None
+    return Part(source, region, face, crop, resize, resample, rotate, mirror, to, blend, layer, slim, version)
+
+
+def validate(spec: Any, origin: str = 'spec') -> dict:
+    """
+    Checks a spec and returns it normalized: every optional key filled in with its default.
+
+    :param spec: The parsed TOML or JSON document.
+    :param origin: What the spec was loaded from, used in the error message.
+    :return: {'name', 'description', 'parts': list[Part], 'clear': list[tuple[int, int]]}.
+
+    :raises InvalidPattern: Listing every problem of the spec.
+    """
+    errors = _Errors()
+    if not isinstance(spec, dict):
+        raise InvalidPattern(f'Invalid pattern {origin}: expected a table at the top level')
+
+    for key in sorted(spec.keys() - {'name', 'description', 'parts', 'clear'}):
+        errors.append(f'unknown key {key!r}')
+    name = spec.get('name')
+    errors.check(isinstance(name, str) and _NAME.fullmatch(name) is not None, 'name',
+                 'expected lowercase letters, digits, "_" and "-", starting with a letter')
+    description = spec.get('description', '')
+    errors.check(isinstance(description, str), 'description', 'expected a string')
+
+    parts = spec.get('parts')
+    if errors.check(isinstance(parts, list) and len(parts) > 0, 'parts', 'expected a non-empty array of tables'):
+        parts = [_part(errors, part, f'parts[{n}]') for n, part in enumerate(parts)]
+
+    clear = spec.get('clear', [])
+    if errors.check(isinstance(clear, list), 'clear', 'expected an array of [x, y]'):
+        clear = [_pair(errors, pixel, f'clear[{n}]', 0, CANVAS_SIZE[0] - 1) for n, pixel in enumerate(clear)]
+
+    if errors:
+        raise InvalidPattern(f'Invalid pattern {origin}:\n' + '\n'.join(f'  {error}' for error in errors))
+    return {'name': name, 'description': description, 'parts': parts, 'clear': clear}
+
+
+def digest(spec: dict) -> str:
+    """Returns the content hash of a normalized spec, which identifies its drawing and its stored plans."""
+    content = [SPEC_FORMAT, spec['name'], [list(part) for part in spec['parts']], spec['clear']]
+    return hashlib.sha256(json.dumps(content, separators=(',', ':')).encode()).hexdigest()
+
+
+# (hash of the spec, plan directory) -> the pattern class
+_patterns: dict[tuple[str, Optional[str]], Type['DeclarativePattern']] = {}
+
+
+class _DeclarativeMeta(ABCMeta):
+    """Metaclass of the generated patterns, which are pickled as their spec (they can't be imported by name)."""
+
+
+class DeclarativePattern(Abstract, metaclass=_DeclarativeMeta):
+    """
+    Base class of the patterns generated from specs, see `pattern_from_spec`.
+    The generated classes set `name`, `parts`, `clear` and the normalized `spec`; their `version` is the hash of
+    the spec.
+    """
+
+    name: str = ''
+    parts: tuple[Part, ...] = ()
+    clear: tuple[tuple[int, int], ...] = ()
+    spec: ClassVar[dict]  # Only set on the generated classes, so it is never shared between them
+    plan_digest: Optional[str] = None
+    plan_directory: Optional[str] = None
+
+    def __init__(self, skin: Skin, top_layers: list[TopLayer], **kwargs):
+        super().__init__(skin, top_layers, **kwargs)
+
+    def _source(self, part: Part) -> Optional[Image.Image]:
+        """The image the part starts from, None if the skin has no such region."""
+        if part.source == 'part':
+            box = self.skin.box(part.region, part.face, part.layer is not None)
+            return self.skin.image.crop(box) if box is not None else None
+        if part.source == 'box':
+            return self.skin.image.crop(part.region)
+        return self._canvas.crop(part.region)
+
+    def _draw(self, part: Part):
+        skin = self.skin
+        if part.layer is not None and not (skin.available_second and _LAYERS[part.layer] in self.top_layers):
+            return
+        if (part.slim is not None and part.slim != skin.is_slim) or (part.version not in (None, skin.version)):
+            return
+
+        image = self._source(part)
+        if image is None:
+            return
+        if part.crop is not None:
+            image = image.crop(part.crop)
+        if part.resize is not None:
+            image = image.resize(part.resize, _RESAMPLE[part.resample])
+        if part.rotate:
+            image = image.rotate(part.rotate, expand=True)
+        if part.mirror is not None:
+            image = image.transpose(_MIRROR[part.mirror])
+
+        if part.blend == 'over':
+            self._canvas.alpha_composite(image, part.to)
+        elif part.blend == 'mask':
+            self._canvas.paste(image, part.to, image)
+        else:
+            self._canvas.paste(image, part.to)
+
+    @property
+    def image(self) -> Image.Image:
+        """Draws the parts in order, then clears the pixels of `clear`."""
+        with stage(f'{self.name}.parts'):
+            for part in self.parts:
+                self._draw(part)
+            for pixel in self.clear:
+                self._canvas.putpixel(pixel, (0, 0, 0, 0))
+
+        return self._canvas
+
+
+def pattern_from_spec(spec: dict, plan_directory: Union[str, Path, None] = None, register: bool = True,
+                      origin: str = 'spec') -> Type[DeclarativePattern]:
+    """
+    Creates the pattern described by a spec.
+    The same spec gives the same class, so the pattern is compiled only once per process.
+
+    :param spec: The parsed TOML or JSON document.
+    :param plan_directory: Directory where the compiled plans are stored and read from. Defaults to None
+                           (compiled in every process).
+    :param register: Register the pattern under its name, see `wavy_totem_lib.patterns.register`. Defaults to True.
+    :param origin: What the spec was loaded from, used in error messages.
+    :return: The pattern class.
+
+    :raises InvalidPattern: If the spec is not valid.
+    """
+    normalized = validate(spec, origin)
+    directory = str(plan_directory) if plan_directory is not None else None
+    key = digest(normalized), directory
+
+    pattern = _patterns.get(key)
+    if pattern is None:
+        name = normalized['name']
+        class_name = ''.join(word.capitalize() for word in re.split(r'[_-]', name))
+        pattern = _patterns.setdefault(key, _DeclarativeMeta(class_name, (DeclarativePattern,), {
+            '__module__': __name__, '__qualname__': class_name,
+            '__doc__': normalized['description'] or f'Declarative pattern {name!r}.',
+            'name': name, 'parts': tuple(normalized['parts']), 'clear': tuple(normalized['clear']),
+            'spec': deepcopy(spec), 'version': key[0], 'plan_digest': key[0], 'plan_directory': directory,
+        }))
+
+    if register:
+        register_pattern(pattern.name, pattern)
+    return pattern
+
+
+def load_pattern(path: Union[str, Path], plan_directory: Union[str, Path, None] = None,
+                 register: bool = True) -> Type[DeclarativePattern]:
+    """
+    Loads a pattern from a TOML (Python 3.11+) or JSON file.
+
+    :param path: Path of the file, `.toml` or `.json`.
+    :param plan_directory: Directory where the compiled plans are stored and read from. Defaults to None
+                           (compiled in every process).
+    :param register: Register the pattern under its name, see `wavy_totem_lib.patterns.register`. Defaults to True.
+    :return: The pattern class.
+
+    :raises InvalidPattern: If the file can't be parsed or the spec is not valid.
+    """
+    path = Path(path)
+    data = path.read_bytes()
+    try:
+        if path.suffix == '.toml':
+            if tomllib is None:
+                raise InvalidPattern(f'Invalid pattern {path}: TOML needs Python 3.11 or newer, use JSON')
+            spec = tomllib.loads(data.decode())
+        elif path.suffix == '.json':
+            spec = json.loads(data)
+        else:
+            raise InvalidPattern(f'Invalid pattern {path}: expected a .toml or .json file')
+    except (ValueError, UnicodeDecodeError) as error:
+        # tomllib.TOMLDecodeError and json.JSONDecodeError are both ValueErrors
+        raise InvalidPattern(f'Invalid pattern {path}: {error}') from None
+
+    return pattern_from_spec(spec, plan_directory, register, str(path))
+
+
+def _reduce(pattern: Type[DeclarativePattern]):
+    if pattern is DeclarativePattern:
+        return 'DeclarativePattern'
+    return pattern_from_spec, (pattern.spec, pattern.plan_directory, False)
+
+
+copyreg.pickle(_DeclarativeMeta, _reduce)
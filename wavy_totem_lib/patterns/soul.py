@@ -1,6 +1,7 @@
 from PIL import Image, ImageOps
 
 from .abstract import Abstract
+from ..metrics import stage
 from ..skin import Skin
 from ..layers import TopLayer
 
@@ -21,9 +22,8 @@ class STT(Abstract):
         if self.skin.available_second and TopLayer.HEAD in self.top_layers:
             self._canvas.alpha_composite(self.skin.head_second_front, (4, 1))
 
-    @staticmethod
-    def _body(skin, uol):
-        body = Image.new("RGBA", (8, 4))
+    def _body(self, skin, uol):
+        body = self._new_image((8, 4))
 
         body.paste(skin.crop((20, 21, 28, 22)), (0, 0))
         body.paste(skin.crop((20, 23, 28, 24)), (0, 1))
@@ -40,9 +40,8 @@ class STT(Abstract):
             body.paste(l24, (0, 3), l24)
         return body
 
-    @staticmethod
-    def _legs(skin, uol):
-        legs = Image.new("RGBA", (6, 3))
+    def _legs(self, skin, uol):
+        legs = self._new_image((6, 3))
 
         legs.paste(skin.crop((4, 20, 5, 22)), (0, 0))
         legs.paste(skin.crop((6, 20, 8, 22)), (1, 0))
@@ -73,9 +72,8 @@ class STT(Abstract):
             legs.paste(l28, (4, 2), l28)
         return legs
 
-    @staticmethod
-    def _arms(skin, uol, slim):
-        arms = Image.new("RGBA", (14, 3))
+    def _arms(self, skin, uol, slim):
+        arms = self._new_image((14, 3))
 
         arms.paste(skin.crop((37, 52, 39, 54) if slim else (37, 52, 40, 54)).rotate(90, expand=True), (11, 0))
         arms.paste(skin.crop((44, 20, 46, 22) if slim else (44, 20, 47, 22)).rotate(-90, expand=True), (1, 0))
@@ -103,17 +101,22 @@ class STT(Abstract):
 
     @property
     def image(self) -> Image.Image:
-        torso = self._body(self.skin.image, TopLayer.TORSO in self.top_layers)
-        legs = self._legs(self.skin.image, TopLayer.LEGS in self.top_layers)
-        arms = self._arms(self.skin.image, TopLayer.HANDS in self.top_layers, self.skin.is_slim)
-
-        self._canvas.paste(arms, (1, 8))
-        self._canvas.paste(legs, (5, 13))
-
-        if self.skin.version == 'old':
-            self._canvas.paste(ImageOps.mirror(self._canvas.crop((0, 0, 8, 16))), (8, 0))
-
-        self._canvas.paste(torso, (4, 9))
-        self._add_head()
+        with stage('stt.torso'):
+            torso = self._body(self.skin.image, TopLayer.TORSO in self.top_layers)
+        with stage('stt.legs'):
+            legs = self._legs(self.skin.image, TopLayer.LEGS in self.top_layers)
+        with stage('stt.arms'):
+            arms = self._arms(self.skin.image, TopLayer.HANDS in self.top_layers, self.skin.is_slim)
+
+        with stage('stt.compose'):
+            self._canvas.paste(arms, (1, 8))
+            self._canvas.paste(legs, (5, 13))
+
+            if self.skin.version == 'old':
+                self._canvas.paste(ImageOps.mirror(self._canvas.crop((0, 0, 8, 16))), (8, 0))
+
+            self._canvas.paste(torso, (4, 9))
+        with stage('stt.head'):
+            self._add_head()
 
         return self._canvas
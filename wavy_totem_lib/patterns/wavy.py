@@ -1,6 +1,7 @@
 from PIL import Image
 
 from .abstract import Abstract
+from ..metrics import stage
 from ..layers import TopLayer
 from ..skin import Skin
 
@@ -74,9 +75,13 @@ class Wavy(Abstract):
     @property
     def image(self) -> Image.Image:
         """Method that generates a totem image"""
-        self._add_head()
-        self._add_hands()
-        self._add_torso()
-        self._add_legs()
+        with stage('wavy.head'):
+            self._add_head()
+        with stage('wavy.hands'):
+            self._add_hands()
+        with stage('wavy.torso'):
+            self._add_torso()
+        with stage('wavy.legs'):
+            self._add_legs()
 
         return self._canvas
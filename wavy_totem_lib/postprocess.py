@@ -0,0 +1,434 @@
+"""
+Post-processing of rendered totems: stages applied to the pixels after the pattern has drawn them.
+
+    from wavy_totem_lib.postprocess import Outline, Shadow, Tint
+
+    TotemBuilder(skin, round_head=True, post=[Shadow(), Outline((20, 20, 20)), Tint((255, 220, 180))])
+
+Stages change the shape of the totem (`RoundHead`, `Outline`, `Shadow`) or its colours (`Tint`, `PaletteSwap`).
+A `Pipeline` doesn't run them one after another over the image. Shape stages work on masks holding one byte per
+pixel of the whole buffer, so each of them is a few operations on a big integer whatever the number of totems.
+Colour stages are composed into one function, evaluated once per distinct colour, and the pixels are mapped in
+a single pass; the removed and painted pixels are then written over them, one by one in small buffers and for
+fixed masks, and by one masked paste per stage in large buffers.
+Colour stages don't change the silhouette seen by the shape stages after them.
+
+New stages subclass `Stage` and can be registered under a name with `register`, like patterns.
+"""
+import sys
+from array import array
+from functools import lru_cache
+from itertools import compress
+from typing import Iterable, Optional, Union, Type, Callable, Sequence
+
+from PIL import Image
+
+from .exceptions import UnknownStage
+
+Color = tuple[int, int, int, int]
+
+# The memo of composed colours is replaced when it grows past this many colours
+_MAX_COLORS = 1 << 16
+# Buffers up to this many pixels are written pixel by pixel, larger ones through masked pastes
+_DIRECT_PIXELS = 2048
+
+
+def _rgba(color: Sequence[int]) -> Color:
+    """Validates an RGB or RGBA colour and returns it as RGBA."""
+    color = tuple(color)
+    if len(color) == 3:
+        color += (255,)
+    if len(color) != 4 or not all(isinstance(value, int) and 0 <= value <= 255 for value in color):
+        raise ValueError(f'Expected an RGB or RGBA colour of integers from 0 to 255, got {color!r}')
+    return color
+
+
+def _pack(color: Color) -> int:
+    """Packs an RGBA colour the way `array('I')` reads it from a buffer."""
+    return int.from_bytes(bytes(color), sys.byteorder)
+
+
+class Grid:
+    """
+    Geometry of a buffer of `count` totems of `width`x`height` pixels stacked vertically.
+
+    Shape stages describe pixels with masks: integers holding one byte per pixel of the buffer, in the order of the
+    pixels (byte `i` is `1 << 8 * i`), set to 1 for the pixels in the mask.
+    """
+
+    def __init__(self, width: int, height: int, count: int):
+        self.width = width
+        self.height = height
+        self.count = count
+        self.pixels = width * height * count
+        self._keep: dict[tuple[int, int], int] = {}
+        self._masks: dict[tuple[tuple[int, int], ...], int] = {}
+        self._positions: dict[int, list[int]] = {}
+
+    def _repeat(self, totem: bytes) -> int:
+        return int.from_bytes(totem * self.count, 'little')
+
+    def mask(self, positions: Iterable[tuple[int, int]]) -> int:
+        """Returns the mask of the given (x, y) pixels in every totem."""
+        positions = tuple(positions)
+        mask = self._masks.get(positions)
+        if mask is None:
+            totem = bytearray(self.width * self.height)
+            for x, y in positions:
+                if 0 <= x < self.width and 0 <= y < self.height:
+                    totem[y * self.width + x] = 1
+            mask = self._masks[positions] = self._repeat(bytes(totem))
+            self._positions[mask] = self._find(mask)
+        return mask
+
+    def shift(self, mask: int, dx: int, dy: int) -> int:
+        """Moves every pixel of the mask by (dx, dy) within its own totem, dropping the pixels moved outside it."""
+        keep = self._keep.get((dx, dy))
+        if keep is None:
+            row = bytes(1 if 0 <= x + dx < self.width else 0 for x in range(self.width))
+            totem = b''.join(row if 0 <= y + dy < self.height else bytes(self.width) for y in range(self.height))
+            keep = self._keep[dx, dy] = self._repeat(totem)
+
+        offset = 8 * (dx + dy * self.width)
+        return (mask & keep) << offset if offset >= 0 else (mask & keep) >> -offset
+
+    def _find(self, mask: int) -> list[int]:
+        return list(compress(range(self.pixels), mask.to_bytes(self.pixels, 'little')))
+
+    def positions(self, mask: int) -> list[int]:
+        """Returns the indexes of the pixels in the mask, in ascending order."""
+        found = self._positions.get(mask)
+        return found if found is not None else self._find(mask)
+
+    def known(self, mask: int) -> bool:
+        """Whether the positions of the mask are precomputed."""
+        return mask in self._positions
+
+    def image(self, mask: int) -> Image.Image:
+        """Returns the mask as an 'L' image of the whole buffer, 255 for the pixels in the mask."""
+        data = mask.to_bytes(self.pixels, 'little').translate(_FULL)
+        return Image.frombytes('L', (self.width, self.height * self.count), data)
+
+
+@lru_cache(maxsize=64)
+def _grid(width: int, height: int, count: int) -> Grid:
+    return Grid(width, height, count)
+
+
+class Stage:
+    """
+    Base class of post-processing stages.
+
+    A shape stage overrides `shape`: it gets the mask of the pixels that are not transparent and returns the mask of
+    the pixels it makes transparent and the mask of the transparent pixels it paints with `fill`.
+    A colour stage overrides `color`, which maps the colour of every pixel that is not transparent.
+    A stage may do both; the result must only depend on the arguments, since colours are memoized.
+
+    `__repr__` identifies the stage and its settings in cache keys, so it must include every setting.
+    """
+
+    fill: Optional[Color] = None
+
+    def shape(self, opaque: int, grid: Grid) -> tuple[int, int]:
+        """
+        :param opaque: Mask of the pixels that are not transparent.
+        :param grid: Geometry of the buffer.
+        :return: Masks of the pixels made transparent and of the pixels painted with `fill`.
+        """
+        return 0, 0
+
+    def color(self, color: Color) -> Color:
+        """Maps an RGBA colour, called for colours that are not fully transparent."""
+        return color
+
+    @property
+    def shapes(self) -> bool:
+        return type(self).shape is not Stage.shape
+
+    @property
+    def colors(self) -> bool:
+        return type(self).color is not Stage.color
+
+    def __repr__(self) -> str:
+        return f'{type(self).__name__}()'
+
+    def __eq__(self, other) -> bool:
+        return type(self) is type(other) and repr(self) == repr(other)
+
+    def __hash__(self) -> int:
+        return hash(repr(self))
+
+
+# Pixels removed by head rounding
+ROUNDED_HEAD = ((4, 1), (11, 1))
+
+
+class RoundHead(Stage):
+    """Removes the two top corners of the head. The `round_head` option of the builders."""
+
+    def shape(self, opaque: int, grid: Grid) -> tuple[int, int]:
+        return grid.mask(ROUNDED_HEAD), 0
+
+
+class Outline(Stage):
+    """
+    Paints the transparent pixels next to the totem.
+
+    :param color: RGB or RGBA colour of the outline. Defaults to black.
+    :param thickness: Width of the outline in pixels. Defaults to 1.
+    :param diagonal: Also paint the pixels touching the totem by a corner. Defaults to False.
+    """
+
+    def __init__(self, color: Sequence[int] = (0, 0, 0, 255), thickness: int = 1, diagonal: bool = False):
+        if thickness < 1:
+            raise ValueError('The thickness of the outline must be at least 1')
+        self.fill = _rgba(color)
+        self.thickness = thickness
+        self.diagonal = diagonal
+
+    def shape(self, opaque: int, grid: Grid) -> tuple[int, int]:
+        offsets = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+        if self.diagonal:
+            offsets += [(-1, -1), (1, -1), (-1, 1), (1, 1)]
+
+        grown = opaque
+        for _ in range(self.thickness):
+            step = grown
+            for dx, dy in offsets:
+                step |= grid.shift(grown, dx, dy)
+            grown = step
+        return 0, grown & ~opaque
+
+    def __repr__(self) -> str:
+        return f'Outline(color={self.fill!r}, thickness={self.thickness!r}, diagonal={self.diagonal!r})'
+
+
+class Shadow(Stage):
+    """
+    Paints a drop shadow: the silhouette of the totem moved by the offset, behind the totem.
+
+    :param color: RGB or RGBA colour of the shadow. Defaults to half-transparent black.
+    :param offset: (dx, dy) of the shadow in pixels. Defaults to (1, 1).
+    """
+
+    def __init__(self, color: Sequence[int] = (0, 0, 0, 96), offset: tuple[int, int] = (1, 1)):
+        self.fill = _rgba(color)
+        self.offset = tuple(offset)
+
+    def shape(self, opaque: int, grid: Grid) -> tuple[int, int]:
+        return 0, grid.shift(opaque, *self.offset) & ~opaque
+
+    def __repr__(self) -> str:
+        return f'Shadow(color={self.fill!r}, offset={self.offset!r})'
+
+
+class Tint(Stage):
+    """
+    Multiplies the colours by a colour, like Minecraft tints grass and leather.
+
+    :param color: RGB or RGBA colour to multiply by.
+    :param amount: How much of the tint to apply, from 0 (none) to 1 (full). Defaults to 1.
+    """
+
+    def __init__(self, color: Sequence[int], amount: float = 1.0):
+        if not 0 <= amount <= 1:
+            raise ValueError('The amount of the tint must be between 0 and 1')
+        self.tint = _rgba(color)
+        self.amount = amount
+
+    def color(self, color: Color) -> Color:
+        return tuple(round(value + (value * tint / 255 - value) * self.amount)
+                     for value, tint in zip(color, self.tint))
+
+    def __repr__(self) -> str:
+        return f'Tint(color={self.tint!r}, amount={self.amount!r})'
+
+
+class PaletteSwap(Stage):
+    """
+    Replaces colours. An RGB key matches the colour with any alpha, and an RGB value keeps the alpha of the pixel.
+
+    :param palette: Mapping of the colours to replace to their replacements.
+    """
+
+    def __init__(self, palette: dict[Sequence[int], Sequence[int]]):
+        self.palette: dict[tuple, tuple] = {}
+        for key, value in palette.items():
+            key, value = tuple(key), tuple(value)
+            _rgba(key)
+            _rgba(value)
+            self.palette[key] = value
+
+    def color(self, color: Color) -> Color:
+        value = self.palette.get(color)
+        if value is None:
+            value = self.palette.get(color[:3])
+        if value is None:
+            return color
+        return value if len(value) == 4 else value + color[3:]
+
+    def __repr__(self) -> str:
+        return f'PaletteSwap({dict(sorted(self.palette.items()))!r})'
+
+
+class Pipeline:
+    """
+    A chain of post-processing stages run in one pass over the pixels, see the module documentation.
+    Stages run in the order given: a shape stage sees the shapes of the stages before it, and a colour stage
+    recolours the pixels painted before it, leaving the ones painted after it alone.
+
+    :param stages: The stages, or the names they are registered under (created with their default settings).
+
+    :raises UnknownStage: If there is no stage with a given name.
+    """
+
+    def __init__(self, stages: Iterable[Union[Stage, str]] = ()):
+        self.stages: tuple[Stage, ...] = tuple(get(stage)() if isinstance(stage, str) else stage for stage in stages)
+        self._shapes = [(index, stage) for index, stage in enumerate(self.stages) if stage.shapes]
+        # Packed fill colours of the shape stages, recoloured by the colour stages after them
+        self._fills = {index: bytes(self._recolor(stage.fill, index + 1))
+                       for index, stage in self._shapes if stage.fill is not None}
+        self._recolors = [stage.color for stage in self.stages if stage.colors]
+        self._memo: dict[int, int] = {}
+
+    def __bool__(self) -> bool:
+        return bool(self.stages)
+
+    def __len__(self) -> int:
+        return len(self.stages)
+
+    def __repr__(self) -> str:
+        return f'Pipeline({list(self.stages)!r})'
+
+    def __add__(self, other: Union['Pipeline', Iterable[Union[Stage, str]]]) -> 'Pipeline':
+        return Pipeline((*self.stages, *(other.stages if isinstance(other, Pipeline) else Pipeline(other).stages)))
+
+    def _recolor(self, color: Color, start: int) -> Color:
+        if color[3] == 0:
+            return color
+        for stage in self.stages[start:]:
+            if stage.colors:
+                color = stage.color(color)
+        return color
+
+    def _map(self, pixels: array) -> array:
+        """Maps the packed pixels to their recoloured values through the memo, filling it with the new colours."""
+        memo = self._memo
+        try:
+            return array('I', map(memo.__getitem__, pixels))
+        except KeyError:
+            pass
+
+        missing = set(pixels).difference(memo)
+        if len(memo) + len(missing) > _MAX_COLORS:
+            # Replaced rather than cleared, other threads may still be reading the old one
+            memo = self._memo = {}
+            missing = set(pixels)
+        for pixel in missing:
+            memo[pixel] = _pack(self._recolor(tuple(pixel.to_bytes(4, sys.byteorder)), 0))
+        return array('I', map(memo.__getitem__, pixels))
+
+    def apply(self, data: Union[bytes, bytearray, memoryview], width: int = 16, height: int = 16,
+              count: int = 1) -> bytes:
+        """
+        Runs the stages over raw RGBA pixels.
+
+        :param data: Pixels of `count` totems of `width`x`height` stacked vertically.
+        :param width: Width of a totem. Defaults to 16.
+        :param height: Height of a totem. Defaults to 16.
+        :param count: Number of totems in the buffer. Defaults to 1.
+        :return: The processed pixels.
+
+        :raises ValueError: If the length of the data doesn't match the size.
+        """
+        if len(data) != width * height * count * 4:
+            raise ValueError(f'Expected {width * height * count * 4} bytes of RGBA pixels, got {len(data)}')
+        if not self.stages:
+            return bytes(data)
+
+        grid = _grid(width, height, count)
+        cleared, painted = 0, []
+        if self._shapes:
+            opaque = int.from_bytes(bytes(data)[3::4].translate(_OPAQUE), 'little')
+            for index, stage in self._shapes:
+                removed, filled = stage.shape(opaque, grid)
+                if removed:
+                    cleared |= removed
+                    opaque &= ~removed
+                    painted = [(mask & ~removed, fill) for mask, fill in painted]
+                if filled:
+                    filled &= ~opaque
+                    painted.append((filled, self._fills[index]))
+                    opaque |= filled
+
+        if self._recolors:
+            pixels = array('I')
+            pixels.frombytes(data)
+            data = self._map(pixels).tobytes()
+        if not cleared and not painted:
+            return bytes(data)
+
+        writes = ([(cleared, bytes(4))] if cleared else []) + painted
+        if grid.pixels > _DIRECT_PIXELS and not all(grid.known(mask) for mask, _ in writes):
+            image = Image.frombytes('RGBA', (width, height * count), bytes(data))
+            for mask, fill in writes:
+                image.paste(tuple(fill), None, grid.image(mask))
+            return image.tobytes()
+
+        output = bytearray(data)
+        for mask, fill in writes:
+            for index in grid.positions(mask):
+                output[index * 4:index * 4 + 4] = fill
+        return bytes(output)
+
+    def apply_image(self, image: Image.Image, count: int = 1) -> Image.Image:
+        """
+        Runs the stages over an RGBA image of `count` totems stacked vertically.
+
+        :return: A new image, the given one is left untouched.
+        """
+        width, height = image.width, image.height // count
+        return Image.frombytes('RGBA', image.size, self.apply(image.tobytes(), width, height, count))
+
+
+# Maps the alpha of a pixel to its byte in the mask of the pixels that are not transparent
+_OPAQUE = bytes([0] + [1] * 255)
+# Maps the bytes of a mask to the values of an 'L' image
+_FULL = bytes([0] + [255] * 255)
+
+_registry: dict[str, Type[Stage]] = {
+    'round_head': RoundHead, 'outline': Outline, 'shadow': Shadow, 'tint': Tint, 'palette_swap': PaletteSwap,
+}
+
+
+def register(name: str, stage: Optional[Type[Stage]] = None) -> Union[Type[Stage], Callable]:
+    """
+    Registers a stage class under a name, replacing the stage registered under it before.
+    Can be used as a class decorator, see `wavy_totem_lib.patterns.register`.
+
+    :param name: The name of the stage.
+    :param stage: The stage class. If omitted, returns a decorator registering the decorated class.
+    :return: The stage class, or the decorator.
+    """
+    if stage is None:
+        return lambda cls: register(name, cls)
+
+    _registry[name] = stage
+    return stage
+
+
+def get(name: str) -> Type[Stage]:
+    """
+    Returns the stage class registered under a name.
+
+    :raises UnknownStage: If there is no stage with this name.
+    """
+    stage = _registry.get(name)
+    if stage is None:
+        raise UnknownStage(f'Unknown post-processing stage {name!r}, available: {", ".join(names())}')
+    return stage
+
+
+def names() -> list[str]:
+    """Returns the names of all registered stages, sorted."""
+    return sorted(_registry)
@@ -0,0 +1,156 @@
+import json
+import re
+from pathlib import Path
+from threading import Lock
+from typing import Union, IO, Iterable
+from zipfile import ZipFile, ZIP_STORED, ZIP_DEFLATED
+
+from .exceptions import SmallScale
+from .metrics import stage
+from .totem import Totem
+
+# Resource pack format of Minecraft 1.21.4, the first version with item model definitions
+DEFAULT_PACK_FORMAT = 46
+
+_VANILLA_MODEL = 'minecraft:item/totem_of_undying'
+_INVALID_ID = re.compile(r'[^a-z0-9_.-]+')
+
+
+class ResourcePackWriter:
+    """
+    A class designed to write totems straight into a resource pack archive.
+
+    Every added totem gets its own texture and item model, and is selected by the custom name of the totem item
+    (rename a totem on an anvil to use it). Textures are encoded and written to the archive as they are added,
+    so only the list of names is kept in memory; the item model definition is written on `close`.
+    `add` can be called from several threads at once.
+
+        with ResourcePackWriter('totems.zip') as pack:
+            for name, skin in skins.items():
+                pack.add(name, TotemBuilder(skin).build())
+
+    :param file: Path or writable binary file object of the archive.
+    :param description: Description of the pack shown in the game.
+    :param pack_format: Pack format of the targeted game version. Defaults to 46 (1.21.4).
+    :param namespace: Namespace of the textures and models. Defaults to 'wavy_totem'.
+    :param scale: Scale factor of the textures, see `Totem.scale`. Defaults to 1.
+
+    :raises SmallScale: If the scale factor is less than or equal to 0.
+    """
+    def __init__(self, file: Union[str, Path, IO[bytes]], description: str = 'Totems of undying',
+                 pack_format: int = DEFAULT_PACK_FORMAT, namespace: str = 'wavy_totem', scale: int = 1):
+        if scale <= 0:
+            raise SmallScale()
+
+        self.namespace = namespace
+        self.scale = scale
+        self._zip = ZipFile(file, 'w', ZIP_DEFLATED)
+        self._lock = Lock()
+        self._cases: dict[str, str] = {}  # custom name -> model
+        self._ids: set[str] = set()
+        self._files: dict[str, bytes] = {}  # archive path -> data, written on close so a later call replaces it
+        self._closed = False
+
+        self._write_json('pack.mcmeta', {'pack': {'pack_format': pack_format, 'description': description}})
+
+    def __enter__(self) -> 'ResourcePackWriter':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def _write_json(self, path: str, data: dict):
+        self._zip.writestr(path, json.dumps(data, indent=2, ensure_ascii=False))
+
+    def _id(self, name: str) -> str:
+        """Unique resource location path for a custom name. Call with the lock held."""
+        base = _INVALID_ID.sub('_', name.lower()).strip('_.-') or 'totem'
+        model_id, n = base, 1
+        while model_id in self._ids:
+            n += 1
+            model_id = f'{base}_{n}'
+        self._ids.add(model_id)
+        return model_id
+
+    def add(self, name: str, totem: Totem) -> str:
+        """
+        Adds a totem selected by a custom item name.
+
+        :param name: The custom name of the totem item.
+        :param totem: The totem.
+        :return: Path of the texture in the archive.
+
+        :raises ValueError: If a totem with this name was already added, or the pack is closed.
+        """
+        data = totem.encode('png', factor=self.scale)
+
+        with self._lock:
+            if self._closed:
+                raise ValueError('The resource pack is closed')
+            if name in self._cases:
+                raise ValueError(f'A totem named {name!r} was already added')
+
+            model_id = self._id(name)
+            texture = f'assets/{self.namespace}/textures/item/{model_id}.png'
+            with stage('resourcepack.write'):
+                self._zip.writestr(texture, data, ZIP_STORED)  # PNG is already compressed
+                self._write_json(f'assets/{self.namespace}/models/item/{model_id}.json', {
+                    'parent': 'minecraft:item/generated',
+                    'textures': {'layer0': f'{self.namespace}:item/{model_id}'}
+                })
+            self._cases[name] = f'{self.namespace}:item/{model_id}'
+
+        return texture
+
+    def add_many(self, totems: Iterable[tuple[str, Totem]]) -> list[str]:
+        """
+        Adds totems as they are produced, e.g. by `ParallelRenderer` or `render_stream`.
+
+        :param totems: Pairs of a custom name and a totem.
+        :return: Paths of the textures in the archive.
+        """
+        return [self.add(name, totem) for name, totem in totems]
+
+    def _write_file(self, path: str, data: bytes):
+        with self._lock:
+            if self._closed:
+                raise ValueError('The resource pack is closed')
+            self._files[path] = data
+
+    def set_default(self, totem: Totem):
+        """
+        Replaces the texture of the totem without a custom name. Calling it again replaces the previous totem.
+
+        :param totem: The totem.
+        """
+        data = totem.encode('png', factor=self.scale)
+        self._write_file('assets/minecraft/textures/item/totem_of_undying.png', data)
+
+    def set_icon(self, totem: Totem):
+        """
+        Uses a totem as the icon of the pack. Calling it again replaces the previous icon.
+
+        :param totem: The totem.
+        """
+        self._write_file('pack.png', totem.encode('png', factor=8))
+
+    def close(self):
+        """Writes the item model definition and finishes the archive."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+
+            for path, data in self._files.items():
+                self._zip.writestr(path, data, ZIP_STORED)  # PNG is already compressed
+            if self._cases:
+                self._write_json('assets/minecraft/items/totem_of_undying.json', {'model': {
+                    'type': 'minecraft:select',
+                    'property': 'minecraft:component',
+                    'component': 'minecraft:custom_name',
+                    'cases': [{'when': name, 'model': {'type': 'minecraft:model', 'model': model}}
+                              for name, model in self._cases.items()],
+                    'fallback': {'type': 'minecraft:model', 'model': _VANILLA_MODEL}
+                }})
+
+            self._zip.close()
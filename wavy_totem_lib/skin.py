@@ -1,27 +1,219 @@
+from collections.abc import Mapping
+from functools import cached_property
 from pathlib import Path
-from typing import Union, IO, Optional, Dict
+from typing import Union, IO, Optional, Iterator
 
 from PIL import Image
 
+from .metrics import stage
+
+Box = tuple[int, int, int, int]
+
+FACES = ('front', 'back', 'left', 'right', 'top', 'bottom')
+
+# Note on side placement on skins
+# Top, Bottom
+# Left, Front, Right, Back.
+# (part, second layer, slim) -> face -> crop box. Parts not depending on the model are stored with slim=False.
+REGIONS: dict[tuple[str, bool, bool], dict[str, Box]] = {
+    ('head', False, False): {
+        'front': (8, 8, 16, 16), 'back': (24, 8, 32, 16), 'left': (0, 8, 8, 16),
+        'right': (16, 8, 24, 16), 'top': (8, 0, 16, 8), 'bottom': (16, 0, 24, 8)
+    },
+    ('head', True, False): {
+        'front': (40, 8, 48, 16), 'back': (56, 8, 64, 16), 'left': (32, 8, 40, 16),
+        'right': (48, 8, 56, 16), 'top': (40, 0, 48, 8), 'bottom': (48, 0, 56, 8)
+    },
+    ('body', False, False): {
+        'front': (20, 20, 28, 32), 'back': (32, 20, 40, 32), 'left': (16, 20, 20, 32),
+        'right': (28, 20, 32, 32), 'top': (20, 16, 28, 20), 'bottom': (28, 16, 36, 20)
+    },
+    ('body', True, False): {
+        'front': (20, 36, 28, 48), 'back': (32, 36, 40, 48), 'left': (16, 36, 20, 48),
+        'right': (28, 36, 32, 48), 'top': (20, 32, 28, 36), 'bottom': (28, 32, 36, 36)
+    },
+    ('right_leg', False, False): {
+        'front': (4, 20, 8, 32), 'back': (12, 20, 16, 32), 'left': (0, 20, 4, 32),
+        'right': (8, 20, 12, 32), 'top': (4, 16, 8, 20), 'bottom': (8, 16, 12, 20)
+    },
+    ('right_leg', True, False): {
+        'front': (4, 36, 8, 48), 'back': (12, 36, 16, 48), 'left': (0, 36, 4, 48),
+        'right': (8, 36, 12, 48), 'top': (4, 32, 8, 36), 'bottom': (8, 32, 12, 36)
+    },
+    ('left_leg', False, False): {
+        'front': (20, 52, 24, 64), 'back': (28, 52, 32, 64), 'left': (16, 52, 20, 64),
+        'right': (24, 52, 28, 64), 'top': (20, 48, 24, 52), 'bottom': (24, 48, 28, 52)
+    },
+    ('left_leg', True, False): {
+        'front': (4, 52, 8, 64), 'back': (12, 52, 16, 64), 'left': (0, 52, 4, 64),
+        'right': (8, 52, 12, 64), 'top': (4, 48, 8, 52), 'bottom': (8, 48, 12, 52)
+    },
+    ('right_hand', False, False): {
+        'front': (44, 20, 48, 32), 'back': (52, 20, 56, 32), 'left': (40, 20, 44, 32),
+        'right': (48, 20, 52, 32), 'top': (44, 16, 48, 20), 'bottom': (48, 16, 52, 20)
+    },
+    ('right_hand', False, True): {
+        'front': (44, 20, 47, 32), 'back': (51, 20, 54, 32), 'left': (40, 20, 44, 32),
+        'right': (47, 20, 51, 32), 'top': (44, 16, 47, 20), 'bottom': (47, 16, 51, 20)
+    },
+    ('right_hand', True, False): {
+        'front': (44, 36, 48, 48), 'back': (52, 36, 56, 48), 'left': (40, 36, 44, 48),
+        'right': (48, 36, 52, 48), 'top': (44, 32, 48, 36), 'bottom': (48, 32, 52, 36)
+    },
+    ('right_hand', True, True): {
+        'front': (44, 36, 47, 48), 'back': (51, 36, 54, 48), 'left': (40, 36, 44, 48),
+        'right': (47, 36, 51, 48), 'top': (44, 32, 47, 36), 'bottom': (47, 32, 51, 36)
+    },
+    ('left_hand', False, False): {
+        'front': (36, 52, 40, 64), 'back': (44, 52, 48, 64), 'left': (32, 52, 36, 64),
+        'right': (40, 52, 44, 64), 'top': (36, 48, 40, 52), 'bottom': (40, 48, 44, 52)
+    },
+    ('left_hand', False, True): {
+        'front': (36, 52, 39, 64), 'back': (43, 52, 47, 64), 'left': (32, 52, 36, 64),
+        'right': (39, 52, 43, 64), 'top': (36, 48, 39, 52), 'bottom': (39, 48, 43, 52)
+    },
+    ('left_hand', True, False): {
+        'front': (52, 52, 56, 64), 'back': (60, 52, 64, 64), 'left': (48, 52, 52, 64),
+        'right': (56, 52, 60, 64), 'top': (52, 48, 56, 52), 'bottom': (56, 48, 60, 52)
+    },
+    ('left_hand', True, True): {
+        'front': (52, 52, 55, 64), 'back': (59, 52, 62, 64), 'left': (48, 52, 52, 64),
+        'right': (55, 52, 59, 64), 'top': (52, 48, 55, 52), 'bottom': (55, 48, 59, 52)
+    },
+}
+
+PARTS = ('head', 'body', 'right_hand', 'left_hand', 'right_leg', 'left_leg')
+
+# Blocks of the right limbs of old skins copied to the places of the left ones: (box, destination)
+_LEGACY_LIMBS = (((0, 16, 16, 32), (16, 48)), ((40, 16, 56, 32), (32, 48)))
+
+
+def _normalize(image: Image.Image, resample: Image.Resampling) -> tuple[Image.Image, str]:
+    """
+    Brings an RGBA skin image to the 64x64 layout: HD skins are downsampled in one resize,
+    and old 64x32 skins get the right limbs copied to the places of the left ones.
+    Returns the image and the version of the skin.
+    """
+    width, height = image.size
+    scale = width // 64
+    if width % 64 or scale & (scale - 1) or height not in (width, width // 2):
+        raise ValueError(f'Unsupported skin size {width}x{height}, expected 64x64 or 64x32 '
+                         f'multiplied by a power of two')
+
+    version = 'new' if height == width else 'old'
+    if scale > 1:
+        with stage('skin.downsample'):
+            if resample == Image.Resampling.BOX:
+                # Averages each block in one pass, on premultiplied colours so transparent pixels don't bleed
+                image = image.convert('RGBa').reduce(scale).convert('RGBA')
+            else:
+                image = image.resize((64, height // scale), resample)
+
+    if version == 'old':
+        with stage('skin.normalize'):
+            full = Image.new('RGBA', (64, 64))
+            full.paste(image, (0, 0))
+            for box, destination in _LEGACY_LIMBS:
+                full.paste(image.crop(box), destination)
+            image = full
+
+    return image, version
+
+
+class SkinFaces(Mapping):
+    """
+    A read-only mapping of the faces of a body part (`front`, `back`, `left`, `right`, `top`, `bottom`) to images.
+    Faces are cropped on first access and shared with the skin.
+    """
+    def __init__(self, skin: 'Skin', part: str, second: bool):
+        self._skin = skin
+        self._part = part
+        self._second = second
+
+    def __getitem__(self, face: str) -> Image.Image:
+        if face not in FACES:
+            raise KeyError(face)
+        return self._skin.region(self._part, face, self._second)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(FACES)
+
+    def __len__(self) -> int:
+        return len(FACES)
+
 
 class Skin:
     """
     The `Skin` class represents a Minecraft skin image.
     It provides methods to extract specific parts of the skin image such as the legs, hands, head, etc.
 
+    Regions are cropped once and cached, the returned images are shared and must not be modified.
+
+    Every skin is brought to the 64x64 layout when loaded: HD skins (128x128, 256x256, ...) are downsampled,
+    and old 64x32 skins are extended with their right limbs in place of the left ones, keeping `version` 'old'.
+
     :param filepath: Path or byte representation of the skin file.
     :param slim: Determines whether the skin is slim or not. `Ellipsis` is used for auto-detection.
-    """
-    def __init__(self, filepath: Union[str, bytes, Path, IO[bytes]], slim: bool = ...):
-        self.image = Image.open(filepath)
-        self.version = 'new' if self.image.height == 64 else 'old'
-        self.available_second = True if self.version == 'new' else False
+    :param resample: Filter downsampling HD skins, `Image.Resampling.BOX` (averaging, the default)
+                     or `Image.Resampling.NEAREST`.
 
-        if self.image.mode != 'RGBA':
+    :raises ValueError: If the size of the image is not 64x64 or 64x32 multiplied by a power of two.
+    """
+    def __init__(self, filepath: Union[str, bytes, Path, IO[bytes]], slim: bool = ...,
+                 resample: Image.Resampling = Image.Resampling.BOX):
+        with stage('skin.open'):
+            image = Image.open(filepath)
+        with stage('skin.decode'):
+            image.load()
+
+        if image.mode != 'RGBA':
             # Convert to RGBA if the mode differs from RGBA
-            self.image = self.image.convert('RGBA')
+            with stage('skin.convert'):
+                image = image.convert('RGBA')
+
+        self._setup(image, slim, resample)
+
+    def _setup(self, image: Image.Image, slim: bool, resample: Image.Resampling, version: Optional[str] = None):
+        """Sets the image and the metadata of the skin from its RGBA image."""
+        self.image, detected = _normalize(image, resample)
+        self.version = version or detected
+        self.available_second = True if self.version == 'new' else False
+        if slim is ...:
+            with stage('skin.detect_slim'):
+                slim = self._detect_slim()
+        self.is_slim = slim
+
+    @classmethod
+    def from_rgba(cls, buffer: Union[bytes, bytearray, memoryview], width: int = 64, height: int = 64,
+                  slim: bool = ..., resample: Image.Resampling = Image.Resampling.BOX,
+                  version: Optional[str] = None) -> 'Skin':
+        """
+        Creates a skin from already decoded RGBA pixels, skipping `Image.open` and the conversion.
+        The pixels of a 64x64 skin are not copied: the skin image and `pixels` use the buffer itself, so it must
+        not be changed while the skin is in use. Other sizes are normalized as in the constructor.
+
+        :param buffer: Raw RGBA pixels, row by row; bytes, memoryview or any object supporting the buffer protocol.
+        :param width: Width of the skin image. Defaults to 64.
+        :param height: Height of the skin image. Defaults to 64.
+        :param slim: Determines whether the skin is slim or not. `Ellipsis` is used for auto-detection.
+        :param resample: Filter downsampling HD skins, see `Skin`.
+        :param version: 'old' for the pixels of an old skin already extended to 64x64. Defaults to None,
+                        the version is then taken from the size.
+        :return: The skin.
+
+        :raises ValueError: If the size of the buffer doesn't match the width and height, or the size is not
+                            supported.
+        """
+        view = memoryview(buffer).cast('B')
+        if len(view) != width * height * 4:
+            raise ValueError(f'Expected {width * height * 4} bytes of RGBA pixels, got {len(view)}')
 
-        self.is_slim = self._detect_slim() if slim is ... else slim
+        skin = cls.__new__(cls)
+        image = Image.frombuffer('RGBA', (width, height), view, 'raw', 'RGBA', 0, 1)
+        skin._setup(image, slim, resample, version)
+        if skin.image is image:
+            skin.pixels = view
+        return skin
 
     def _detect_slim(self) -> bool:
         """
@@ -29,283 +221,154 @@ class Skin:
         False – wide, True – slim.
         """
 
-        if self.image.height == 32:
+        if self.version == 'old':
             return False
         return not bool(self.image.getpixel((46, 52))[3])
 
+    @cached_property
+    def pixels(self) -> Union[bytes, memoryview]:
+        """Raw RGBA pixels of the whole skin image."""
+        return self.image.tobytes()
+
+    @cached_property
+    def _crops(self) -> dict[Box, Image.Image]:
+        return {}
+
+    def box(self, part: str, face: str = 'front', second: bool = False) -> Optional[Box]:
+        """
+        Returns the crop box of a face of a body part, taking the model and version of the skin into account.
+        Old skins have no second layer and reuse the right limbs as the left ones.
+
+        :param part: One of `PARTS`: head, body, right_hand, left_hand, right_leg, left_leg.
+        :param face: One of `FACES`: front, back, left, right, top, bottom.
+        :param second: Whether to use the second (top) layer.
+        :return: The (left, upper, right, lower) box, or None if the skin has no second layer.
+        """
+        if second and not self.available_second:
+            return None
+        if self.version == 'old' and part in ('left_hand', 'left_leg'):
+            part = part.replace('left', 'right')
+
+        slim = self.is_slim and part.endswith('_hand')
+        return REGIONS[part, second, slim][face]
+
+    def region(self, part: str, face: str = 'front', second: bool = False) -> Optional[Image.Image]:
+        """
+        Returns a face of a body part as an image. See `Skin.box` for the arguments.
+
+        :return: PIL.Image.Image, shared between calls, or None if the skin has no second layer.
+        """
+        box = self.box(part, face, second)
+        if box is None:
+            return None
+
+        crop = self._crops.get(box)
+        if crop is None:
+            crop = self._crops[box] = self.image.crop(box)
+        return crop
+
+    def faces(self, part: str, second: bool = False) -> Optional[SkinFaces]:
+        """
+        Returns all faces of a body part. See `Skin.box` for the arguments.
+
+        :return: A mapping of face names to images, or None if the skin has no second layer.
+        """
+        if second and not self.available_second:
+            return None
+        return SkinFaces(self, part, second)
+
     @property
-    def right_leg(self) -> Dict[str, Image.Image]:
-        # Note on side placement on skins
-        # Top, Bottom
-        # Left, Front, Right, Back.
-        return {
-            'front': self.image.crop((4, 20, 8, 32)),
-            'back': self.image.crop((12, 20, 16, 32)),
-            'left': self.image.crop((0, 20, 4, 32)),
-            'right': self.image.crop((8, 20, 12, 32)),
-            'top': self.image.crop((4, 16, 8, 20)),
-            'bottom': self.image.crop((8, 16, 12, 20))
-        }
+    def right_leg(self) -> SkinFaces:
+        return self.faces('right_leg')
 
     @property
     def right_leg_front(self) -> Image.Image:
-        return self.image.crop((4, 20, 8, 32))
+        return self.region('right_leg')
 
     @property
-    def right_leg_second(self) -> Optional[Dict[str, Image.Image]]:
-        if not self.available_second:
-            return None
-
-        return {
-            'front': self.image.crop((4, 36, 8, 48)),
-            'back': self.image.crop((12, 36, 16, 48)),
-            'left': self.image.crop((0, 36, 4, 48)),
-            'right': self.image.crop((8, 36, 12, 48)),
-            'top': self.image.crop((4, 32, 8, 36)),
-            'bottom': self.image.crop((8, 32, 12, 36))
-        }
+    def right_leg_second(self) -> Optional[SkinFaces]:
+        return self.faces('right_leg', second=True)
 
     @property
     def right_leg_second_front(self) -> Optional[Image.Image]:
-        if not self.available_second:
-            return None
-        return self.image.crop((4, 36, 8, 48))
+        return self.region('right_leg', second=True)
 
     @property
-    def left_leg(self) -> Dict[str, Image.Image]:
-        if self.version == 'old':
-            return self.right_leg
-
-        return {
-            'front': self.image.crop((20, 52, 24, 64)),
-            'back': self.image.crop((28, 52, 32, 64)),
-            'left': self.image.crop((16, 52, 20, 64)),
-            'right': self.image.crop((24, 52, 28, 64)),
-            'top': self.image.crop((20, 48, 24, 52)),
-            'bottom': self.image.crop((24, 48, 28, 52))
-        }
+    def left_leg(self) -> SkinFaces:
+        return self.faces('left_leg')
 
     @property
     def left_leg_front(self) -> Image.Image:
-        if self.version == 'old':
-            return self.right_leg_front
-        return self.image.crop((20, 52, 24, 64))
+        return self.region('left_leg')
 
     @property
-    def left_leg_second(self) -> Optional[Dict[str, Image.Image]]:
-        if not self.available_second:
-            return None
-
-        return {
-            'front': self.image.crop((4, 52, 8, 64)),
-            'back': self.image.crop((12, 52, 16, 64)),
-            'left': self.image.crop((0, 52, 4, 64)),
-            'right': self.image.crop((8, 52, 12, 64)),
-            'top': self.image.crop((4, 48, 8, 52)),
-            'bottom': self.image.crop((8, 48, 12, 52))
-        }
+    def left_leg_second(self) -> Optional[SkinFaces]:
+        return self.faces('left_leg', second=True)
 
     @property
     def left_leg_second_front(self) -> Optional[Image.Image]:
-        if not self.available_second:
-            return None
-        return self.image.crop((4, 52, 8, 64))
+        return self.region('left_leg', second=True)
 
     @property
-    def right_hand(self) -> Dict[str, Image.Image]:
-        if self.is_slim:
-            return {
-                'front': self.image.crop((44, 20, 47, 32)),
-                'back': self.image.crop((51, 20, 54, 32)),
-                'left': self.image.crop((40, 20, 44, 32)),
-                'right': self.image.crop((47, 20, 51, 32)),
-                'top': self.image.crop((44, 16, 47, 20)),
-                'bottom': self.image.crop((47, 16, 51, 20))
-            }
-
-        return {
-            'front': self.image.crop((44, 20, 48, 32)),
-            'back': self.image.crop((52, 20, 56, 32)),
-            'left': self.image.crop((40, 20, 44, 32)),
-            'right': self.image.crop((48, 20, 52, 32)),
-            'top': self.image.crop((44, 16, 48, 20)),
-            'bottom': self.image.crop((48, 16, 52, 20))
-        }
+    def right_hand(self) -> SkinFaces:
+        return self.faces('right_hand')
 
     @property
     def right_hand_front(self) -> Image.Image:
-        if self.is_slim:
-            return self.image.crop((44, 20, 47, 32))
-        return self.image.crop((44, 20, 48, 32))
+        return self.region('right_hand')
 
     @property
-    def right_hand_second(self) -> Optional[Dict[str, Image.Image]]:
-        if not self.available_second:
-            return None
-
-        if self.is_slim:
-            return {
-                'front': self.image.crop((44, 36, 47, 48)),
-                'back': self.image.crop((51, 36, 54, 48)),
-                'left': self.image.crop((40, 36, 44, 48)),
-                'right': self.image.crop((47, 36, 51, 48)),
-                'top': self.image.crop((44, 32, 47, 36)),
-                'bottom': self.image.crop((47, 32, 51, 36))
-            }
-
-        return {
-            'front': self.image.crop((44, 36, 48, 48)),
-            'back': self.image.crop((52, 36, 56, 48)),
-            'left': self.image.crop((40, 36, 44, 48)),
-            'right': self.image.crop((48, 36, 52, 48)),
-            'top': self.image.crop((44, 32, 48, 36)),
-            'bottom': self.image.crop((48, 32, 52, 36))
-        }
+    def right_hand_second(self) -> Optional[SkinFaces]:
+        return self.faces('right_hand', second=True)
 
     @property
     def right_hand_second_front(self) -> Optional[Image.Image]:
-        if not self.available_second:
-            return None
-
-        if self.is_slim:
-            return self.image.crop((44, 36, 48, 48))
-
-        return self.image.crop((44, 36, 48, 48))
+        return self.region('right_hand', second=True)
 
     @property
-    def left_hand(self) -> Dict[str, Image.Image]:
-        if self.version == 'old':
-            return self.right_hand
-
-        if self.is_slim:
-            return {
-                'front': self.image.crop((36, 52, 39, 64)),
-                'back': self.image.crop((43, 52, 47, 64)),
-                'left': self.image.crop((32, 52, 36, 64)),
-                'right': self.image.crop((39, 52, 43, 64)),
-                'top': self.image.crop((36, 48, 39, 52)),
-                'bottom': self.image.crop((39, 48, 43, 52))
-            }
-
-        return {
-            'front': self.image.crop((36, 52, 40, 64)),
-            'back': self.image.crop((44, 52, 48, 64)),
-            'left': self.image.crop((32, 52, 36, 64)),
-            'right': self.image.crop((40, 52, 44, 64)),
-            'top': self.image.crop((36, 48, 40, 52)),
-            'bottom': self.image.crop((40, 48, 44, 52))
-        }
+    def left_hand(self) -> SkinFaces:
+        return self.faces('left_hand')
 
     @property
     def left_hand_front(self) -> Image.Image:
-        if self.version == 'old':
-            return self.right_hand_front
-
-        if self.is_slim:
-            return self.image.crop((36, 52, 39, 64))
-
-        return self.image.crop((36, 52, 40, 64))
+        return self.region('left_hand')
 
     @property
-    def left_hand_second(self) -> Optional[Dict[str, Image.Image]]:
-        if not self.available_second:
-            return None
-
-        if self.is_slim:
-            return {
-                'front': self.image.crop((52, 52, 55, 64)),
-                'back': self.image.crop((59, 52, 62, 64)),
-                'left': self.image.crop((48, 52, 52, 64)),
-                'right': self.image.crop((55, 52, 59, 64)),
-                'top': self.image.crop((52, 48, 55, 52)),
-                'bottom': self.image.crop((55, 48, 59, 52))
-            }
-
-        return {
-            'front': self.image.crop((52, 52, 56, 64)),
-            'back': self.image.crop((60, 52, 64, 64)),
-            'left': self.image.crop((48, 52, 52, 64)),
-            'right': self.image.crop((56, 52, 60, 64)),
-            'top': self.image.crop((52, 48, 56, 52)),
-            'bottom': self.image.crop((56, 48, 60, 52))
-        }
+    def left_hand_second(self) -> Optional[SkinFaces]:
+        return self.faces('left_hand', second=True)
 
     @property
     def left_hand_second_front(self) -> Optional[Image.Image]:
-        if not self.available_second:
-            return None
-
-        if self.is_slim:
-            return self.image.crop((52, 52, 55, 64))
-
-        return self.image.crop((52, 52, 56, 64))
+        return self.region('left_hand', second=True)
 
     @property
-    def body(self) -> Dict[str, Image.Image]:
-        return {
-            'front': self.image.crop((20, 20, 28, 32)),
-            'back': self.image.crop((32, 20, 40, 32)),
-            'left': self.image.crop((16, 20, 20, 32)),
-            'right': self.image.crop((28, 20, 32, 32)),
-            'top': self.image.crop((20, 16, 28, 20)),
-            'bottom': self.image.crop((28, 16, 36, 20))
-        }
+    def body(self) -> SkinFaces:
+        return self.faces('body')
 
     @property
     def body_front(self) -> Image.Image:
-        return self.image.crop((20, 20, 28, 32))
+        return self.region('body')
 
     @property
-    def body_second(self) -> Optional[Dict[str, Image.Image]]:
-        if not self.available_second:
-            return None
-
-        return {
-            'front': self.image.crop((20, 36, 28, 48)),
-            'back': self.image.crop((32, 36, 40, 48)),
-            'left': self.image.crop((16, 36, 20, 48)),
-            'right': self.image.crop((28, 36, 32, 48)),
-            'top': self.image.crop((20, 32, 28, 36)),
-            'bottom': self.image.crop((28, 32, 36, 36))
-        }
+    def body_second(self) -> Optional[SkinFaces]:
+        return self.faces('body', second=True)
 
     @property
     def body_second_front(self) -> Optional[Image.Image]:
-        if not self.available_second:
-            return None
-        return self.image.crop((20, 36, 28, 48))
+        return self.region('body', second=True)
 
     @property
-    def head(self) -> Dict[str, Image.Image]:
-        return {
-            'front': self.image.crop((8, 8, 16, 16)),
-            'back': self.image.crop((24, 8, 32, 16)),
-            'left': self.image.crop((0, 8, 8, 16)),
-            'right': self.image.crop((16, 8, 24, 16)),
-            'top': self.image.crop((8, 0, 16, 8)),
-            'bottom': self.image.crop((16, 0, 24, 8))
-        }
+    def head(self) -> SkinFaces:
+        return self.faces('head')
 
     @property
     def head_front(self) -> Image.Image:
-        return self.image.crop((8, 8, 16, 16))
+        return self.region('head')
 
     @property
-    def head_second(self) -> Optional[Dict[str, Image.Image]]:
-        if not self.available_second:
-            return None
-
-        return {
-            'front': self.image.crop((40, 8, 48, 16)),
-            'back': self.image.crop((56, 8, 64, 16)),
-            'left': self.image.crop((32, 8, 40, 16)),
-            'right': self.image.crop((48, 8, 56, 16)),
-            'top': self.image.crop((40, 0, 48, 8)),
-            'bottom': self.image.crop((48, 0, 56, 8))
-        }
+    def head_second(self) -> Optional[SkinFaces]:
+        return self.faces('head', second=True)
 
     @property
     def head_second_front(self) -> Optional[Image.Image]:
-        if not self.available_second:
-            return None
-        return self.image.crop((40, 8, 48, 16))
+        return self.region('head', second=True)
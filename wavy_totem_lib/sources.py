@@ -0,0 +1,453 @@
+"""
+Asynchronous sources of skin files: a directory, a dictionary in memory or an HTTP service.
+
+Every source has the same interface, `await source.fetch(name)` returns the skin file or None if there is no such
+skin, so sources can be swapped freely and passed straight to `TotemApp`:
+
+    async with HTTPSource('https://skins.example.com/{name}.png', max_connections=16) as source:
+        builder = await source.builder('notch', round_head=True)
+        totem = await builder.build_async()
+
+`LocalSkinServer` serves skins from memory over HTTP, so code using `HTTPSource` can be tested and benchmarked
+without network access.
+"""
+import asyncio
+import hashlib
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from io import BytesIO
+from pathlib import Path
+from typing import Optional, Iterable, Mapping, Union
+from urllib.parse import quote, unquote, urlsplit
+
+from .builder import TotemBuilder
+from .exceptions import FetchFailed
+from .skin import Skin
+
+_Connection = tuple[asyncio.StreamReader, asyncio.StreamWriter]
+
+_REASONS = {200: 'OK', 304: 'Not Modified', 404: 'Not Found', 405: 'Method Not Allowed'}
+
+
+class SkinSource(ABC):
+    """
+    Base class of the skin sources. Subclasses implement `fetch`, the other methods are built on it.
+    Sources are async context managers closing their resources on exit.
+    """
+
+    @abstractmethod
+    async def fetch(self, name: str) -> Optional[bytes]:
+        """
+        Returns the skin file of a name.
+
+        :param name: The name of the skin, e.g. a player name.
+        :return: The contents of the file, or None if there is no such skin.
+
+        :raises FetchFailed: If the skin could not be fetched.
+        """
+
+    async def fetch_many(self, names: Iterable[str]) -> dict[str, Optional[bytes]]:
+        """
+        Fetches several skins concurrently, within the limits of the source.
+
+        :param names: The names of the skins.
+        :return: The skin files by name, None for the missing ones.
+        """
+        names = list(dict.fromkeys(names))
+        return dict(zip(names, await asyncio.gather(*(self.fetch(name) for name in names))))
+
+    async def skin(self, name: str, slim: bool = ...) -> Optional[Skin]:
+        """
+        Fetches and decodes a skin.
+
+        :param name: The name of the skin.
+        :param slim: Determines whether the skin is slim or not. `Ellipsis` is used for auto-detection.
+        :return: The skin, or None if there is no such skin.
+        """
+        data = await self.fetch(name)
+        return None if data is None else Skin(BytesIO(data), slim)
+
+    async def builder(self, name: str, slim: bool = ..., **kwargs) -> Optional[TotemBuilder]:
+        """
+        Fetches a skin and creates the builder of its totem.
+
+        :param name: The name of the skin.
+        :param slim: Determines whether the skin is slim or not. `Ellipsis` is used for auto-detection.
+        :param kwargs: Arguments of `TotemBuilder`.
+        :return: The builder, or None if there is no such skin.
+        """
+        skin = await self.skin(name, slim)
+        return None if skin is None else TotemBuilder(skin, **kwargs)
+
+    async def close(self):
+        """Releases the resources of the source."""
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+
+class MemorySource(SkinSource):
+    """
+    A source serving skin files from a dictionary.
+
+    :param skins: Skin files by name. Defaults to an empty dictionary; `skins` can be changed later.
+    """
+    def __init__(self, skins: Optional[Mapping[str, bytes]] = None):
+        self.skins: dict[str, bytes] = dict(skins or {})
+
+    async def fetch(self, name: str) -> Optional[bytes]:
+        return self.skins.get(name)
+
+
+class FileSource(SkinSource):
+    """
+    A source reading skin files from a directory, in a thread so the event loop isn't blocked.
+
+    :param directory: The directory of the skins.
+    :param suffix: Suffix of the skin files, the name `notch` is read from `notch.png` by default.
+    """
+    def __init__(self, directory: Union[str, Path], suffix: str = '.png'):
+        self.directory = Path(directory)
+        self.suffix = suffix
+
+    def _read(self, name: str) -> Optional[bytes]:
+        path = self.directory / (name + self.suffix)
+        if Path(name).is_absolute() or '..' in Path(name).parts:
+            return None  # Outside of the directory
+        try:
+            return path.read_bytes()
+        except (FileNotFoundError, IsADirectoryError, NotADirectoryError):
+            return None
+
+    async def fetch(self, name: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self._read, name)
+
+
+class HTTPSource(SkinSource):
+    """
+    A source downloading skin files from an HTTP service over pooled keep-alive connections.
+
+    Responses carrying an ETag or Last-Modified are remembered, and later fetches of the same skin revalidate them
+    with If-None-Match and If-Modified-Since, so an unchanged skin costs a 304 without a body.
+    A 404 or 410 answer means there is no such skin; other statuses raise `FetchFailed`.
+
+    :param url: URL template of the skins with a `{name}` placeholder, e.g. 'https://skins.example.com/{name}.png'.
+    :param max_connections: Maximum number of requests in flight, and of open connections. Defaults to 8.
+    :param timeout: Timeout of a request in seconds. Defaults to 10.
+    :param cache_size: Number of skins remembered for revalidation. Defaults to 1024, 0 disables it.
+    :param headers: Additional request headers, e.g. an API key.
+    :param max_size: Maximum size of a skin file in bytes. Defaults to 1 MiB.
+
+    :raises ValueError: If the URL is not an http(s) URL with a `{name}` placeholder.
+    """
+    def __init__(self, url: str, max_connections: int = 8, timeout: float = 10.0, cache_size: int = 1024,
+                 headers: Optional[Mapping[str, str]] = None, max_size: int = 1 << 20):
+        if '{name}' not in url or urlsplit(url).scheme not in ('http', 'https'):
+            raise ValueError('The URL must be an http(s) URL with a {name} placeholder')
+
+        self.url = url
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self.headers = dict(headers or {})
+        self.max_size = max_size
+
+        self.requests = 0
+        self.revalidated = 0
+        self.connections = 0
+
+        self._idle: dict[tuple[str, str, int], list[_Connection]] = {}
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._ssl = None
+        # url -> (ETag, Last-Modified, body)
+        self._validators: OrderedDict[str, tuple[Optional[str], Optional[str], bytes]] = OrderedDict()
+
+    async def _connect(self, key: tuple[str, str, int]) -> tuple[_Connection, bool]:
+        """Returns an idle connection to the host, or a new one; and whether it was reused."""
+        idle = self._idle.get(key)
+        while idle:
+            reader, writer = idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return (reader, writer), True
+            writer.close()
+
+        scheme, host, port = key
+        ssl = None
+        if scheme == 'https':
+            if self._ssl is None:
+                import ssl as _ssl
+                self._ssl = _ssl.create_default_context()
+            ssl = self._ssl
+        connection = await asyncio.open_connection(host, port, ssl=ssl)
+        self.connections += 1
+        return connection, False
+
+    async def _read_response(self, reader: asyncio.StreamReader) -> tuple[int, dict[str, str], bytes, bool]:
+        """Reads a response, returns the status, headers, body and whether the connection can be reused."""
+        while True:
+            line = await reader.readline()
+            if not line:
+                raise asyncio.IncompleteReadError(b'', None)
+            version, status = line.split(None, 2)[:2]
+            status = int(status)
+
+            headers: dict[str, str] = {}
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                name, _, value = line.decode('latin-1').partition(':')
+                headers[name.strip().lower()] = value.strip()
+
+            # Interim responses such as 100 Continue or 103 Early Hints are followed by the final one
+            if not 100 <= status < 200:
+                break
+
+        keep_alive = version == b'HTTP/1.1' and headers.get('connection', '').lower() != 'close'
+        if status in (204, 304):
+            body = b''
+        elif headers.get('transfer-encoding', '').lower() == 'chunked':
+            body = bytearray()
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                if size == 0:
+                    while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                        pass  # Trailers
+                    break
+                if len(body) + size > self.max_size:
+                    raise FetchFailed(f'The skin is larger than {self.max_size} bytes')
+                body += (await reader.readexactly(size + 2))[:-2]
+            body = bytes(body)
+        elif 'content-length' in headers:
+            length = int(headers['content-length'])
+            if length > self.max_size:
+                raise FetchFailed(f'The skin is larger than {self.max_size} bytes')
+            body = await reader.readexactly(length)
+        else:
+            # The body ends with the connection
+            body = await reader.read(self.max_size + 1)
+            keep_alive = False
+
+        if len(body) > self.max_size:
+            raise FetchFailed(f'The skin is larger than {self.max_size} bytes')
+        return status, headers, body, keep_alive
+
+    async def _request(self, key: tuple[str, str, int], target: str,
+                       headers: dict[str, str]) -> tuple[int, dict[str, str], bytes]:
+        request = f'GET {target} HTTP/1.1\r\n' + ''.join(f'{name}: {value}\r\n' for name, value in headers.items())
+        request = (request + '\r\n').encode('latin-1')
+
+        for attempt in range(2):
+            (reader, writer), reused = await self._connect(key)
+            try:
+                writer.write(request)
+                await writer.drain()
+                status, response_headers, body, keep_alive = await self._read_response(reader)
+            except (ConnectionError, asyncio.IncompleteReadError) as error:
+                writer.close()
+                if reused and attempt == 0:
+                    # The server closed the idle connection, and likely the other ones: retry on a new one
+                    for _, idle in self._idle.pop(key, []):
+                        idle.close()
+                    continue
+                raise FetchFailed(f'The connection to {key[1]} was lost') from error
+            except BaseException:
+                writer.close()  # The state of the connection is unknown
+                raise
+
+            if keep_alive:
+                self._idle.setdefault(key, []).append((reader, writer))
+            else:
+                writer.close()
+            return status, response_headers, body
+
+    async def fetch(self, name: str) -> Optional[bytes]:
+        url = self.url.format(name=quote(name, safe=''))
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80))
+        target = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+
+        host = parts.hostname if parts.port is None else f'{parts.hostname}:{parts.port}'
+        headers = {'Host': host, 'User-Agent': 'wavy-totem-lib', 'Accept': 'image/png', **self.headers}
+        cached = self._validators.get(url)
+        if cached is not None:
+            etag, modified, _ = cached
+            if etag is not None:
+                headers['If-None-Match'] = etag
+            if modified is not None:
+                headers['If-Modified-Since'] = modified
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_connections)
+        async with self._semaphore:
+            self.requests += 1
+            try:
+                status, response_headers, body = await asyncio.wait_for(self._request(key, target, headers),
+                                                                        self.timeout)
+            except asyncio.TimeoutError as error:
+                raise FetchFailed(f'No answer from {parts.hostname} in {self.timeout} seconds') from error
+            except OSError as error:
+                raise FetchFailed(f'Cannot connect to {parts.hostname}: {error}') from error
+
+        if status == 304 and cached is not None:
+            self.revalidated += 1
+            self._validators.move_to_end(url)
+            return cached[2]
+        if status in (404, 410):
+            self._validators.pop(url, None)
+            return None
+        if status != 200:
+            raise FetchFailed(f'{parts.hostname} answered {status} for {name!r}')
+
+        etag, modified = response_headers.get('etag'), response_headers.get('last-modified')
+        if self.cache_size and (etag is not None or modified is not None):
+            self._validators[url] = (etag, modified, body)
+            self._validators.move_to_end(url)
+            while len(self._validators) > self.cache_size:
+                self._validators.popitem(last=False)
+        return body
+
+    async def close(self):
+        """Closes the idle connections."""
+        writers = [writer for idle in self._idle.values() for _, writer in idle]
+        self._idle.clear()
+        for writer in writers:
+            writer.close()
+        for writer in writers:
+            try:
+                await writer.wait_closed()
+            except OSError:
+                pass
+
+
+class LocalSkinServer:
+    """
+    A small HTTP server serving skin files from memory, standing in for a skin service in tests and benchmarks.
+
+    Skins are served at `/{name}.png` with an ETag and Last-Modified, conditional requests get a 304,
+    and connections are kept alive. Use `url` as the template of `HTTPSource`.
+
+        async with LocalSkinServer({'notch': data}) as server, HTTPSource(server.url) as source:
+            assert await source.fetch('notch') == data
+
+    :param skins: Skin files by name.
+    :param host: Address to listen on. Defaults to 127.0.0.1.
+    :param port: Port to listen on. Defaults to 0, a free port.
+    :param delay: Seconds to wait before every response, simulating a remote service. Defaults to 0.
+    """
+    def __init__(self, skins: Optional[Mapping[str, bytes]] = None, host: str = '127.0.0.1', port: int = 0,
+                 delay: float = 0.0):
+        self.host = host
+        self.port = port
+        self.delay = delay
+        self.requests = 0
+        self.connections = 0
+        self._skins: dict[str, tuple[bytes, str, str]] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._handlers: set[asyncio.Task] = set()
+        for name, data in (skins or {}).items():
+            self.set(name, data)
+
+    def set(self, name: str, data: Optional[bytes]):
+        """Adds, replaces or, with None, removes a skin."""
+        if data is None:
+            self._skins.pop(name, None)
+            return
+        etag = '"' + hashlib.sha256(data).hexdigest()[:32] + '"'
+        self._skins[name] = (data, etag, formatdate(time.time(), usegmt=True))
+
+    @property
+    def url(self) -> str:
+        """URL template of the skins, for `HTTPSource`."""
+        return f'http://{self.host}:{self.port}/{{name}}.png'
+
+    async def start(self):
+        """Starts listening; the port is known afterwards."""
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def close(self):
+        """Stops the server and closes the open connections."""
+        if self._server is not None:
+            self._server.close()
+            for handler in list(self._handlers):
+                handler.cancel()
+            await asyncio.gather(*self._handlers, return_exceptions=True)
+            await self._server.wait_closed()
+            self._server = None
+
+    async def __aenter__(self) -> 'LocalSkinServer':
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def _respond(self, method: str, path: str, headers: dict[str, str]) -> tuple[int, dict[str, str], bytes]:
+        if method not in ('GET', 'HEAD'):
+            return 405, {'Allow': 'GET, HEAD'}, b''
+
+        name = unquote(path.split('?', 1)[0].lstrip('/'))
+        entry = self._skins.get(name.removesuffix('.png')) if name.endswith('.png') else None
+        if entry is None:
+            return 404, {}, b''
+
+        data, etag, modified = entry
+        validators = {'ETag': etag, 'Last-Modified': modified}
+        if 'if-none-match' in headers:
+            if etag in (tag.strip() for tag in headers['if-none-match'].split(',')):
+                return 304, validators, b''
+        elif 'if-modified-since' in headers:
+            try:
+                if parsedate_to_datetime(headers['if-modified-since']) >= parsedate_to_datetime(modified):
+                    return 304, validators, b''
+            except (TypeError, ValueError):
+                pass
+        return 200, {**validators, 'Content-Type': 'image/png'}, data
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        handler = asyncio.current_task()
+        self._handlers.add(handler)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line.strip():
+                    break
+                method, path = line.decode('latin-1').split()[:2]
+
+                headers: dict[str, str] = {}
+                while (line := await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    name, _, value = line.decode('latin-1').partition(':')
+                    headers[name.strip().lower()] = value.strip()
+
+                self.requests += 1
+                if self.delay:
+                    await asyncio.sleep(self.delay)
+
+                status, response_headers, body = self._respond(method, path, headers)
+                close = headers.get('connection', '').lower() == 'close'
+                head = [f'HTTP/1.1 {status} {_REASONS.get(status, "")}',
+                        *(f'{name}: {value}' for name, value in response_headers.items())]
+                if status != 304:
+                    head.append(f'Content-Length: {len(body)}')
+                if close:
+                    head.append('Connection: close')
+                writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1'))
+                if method == 'GET':
+                    writer.write(body)
+                await writer.drain()
+                if close:
+                    break
+        except (ConnectionError, ValueError):
+            pass
+        except asyncio.CancelledError:
+            pass  # Closing the server; asyncio would report a cancelled connection handler as failed
+        finally:
+            self._handlers.discard(handler)
+            writer.close()
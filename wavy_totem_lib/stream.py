@@ -0,0 +1,106 @@
+import asyncio
+from concurrent.futures import Executor
+from io import BytesIO
+from pathlib import Path
+from typing import Type, Union, Iterable, AsyncIterable, AsyncIterator, Optional, IO, Any
+
+from .builder import TotemBuilder
+from .layers import TopLayer, ALL_TOP_LAYERS
+from .patterns import resolve
+from .patterns.abstract import Abstract
+from .skin import Skin
+from .totem import Totem
+
+StreamItem = Union[Skin, bytes, bytearray, memoryview, str, Path, IO[bytes]]
+
+
+def _process(item: StreamItem, settings: tuple) -> Totem:
+    """Decodes the skin and renders its totem; runs in the executor."""
+    pattern, top_layers, round_head, encode, kwargs = settings
+    if isinstance(item, (bytes, bytearray, memoryview)):
+        item = BytesIO(item)
+    skin = item if isinstance(item, Skin) else Skin(item)
+    totem = TotemBuilder(skin, pattern, top_layers, round_head).build(**kwargs)
+
+    if encode is not None:
+        # Memoized by the totem, so the consumer gets the bytes without encoding on the loop
+        totem.encode(encode[0], factor=encode[1])
+    return totem
+
+
+async def _iterate(source: Union[AsyncIterable[StreamItem], Iterable[StreamItem]]) -> AsyncIterator[StreamItem]:
+    if isinstance(source, AsyncIterable):
+        async for item in source:
+            yield item
+    else:
+        for item in source:
+            yield item
+
+
+async def render_stream(source: Union[AsyncIterable[StreamItem], Iterable[StreamItem]], *,
+                        pattern: Union[str, Type[Abstract]] = 'wavy',
+                        top_layers: list[TopLayer] | None = ALL_TOP_LAYERS, round_head: bool = False,
+                        concurrency: int = 4, max_pending: int = 16,
+                        executor: Optional[Executor] = None, encode: Optional[tuple[str, int]] = None,
+                        **kwargs) -> AsyncIterator[Totem]:
+    """
+    Renders a stream of skins, yielding totems in the order of the source.
+
+    Skins are read from the source while earlier ones are still decoding, rendering or encoding, at most
+    `concurrency` of them run in the executor at once. When `max_pending` skins are read but not yet yielded,
+    reading pauses until the consumer catches up, so memory stays bounded however fast the source is.
+    Closing or cancelling the iterator cancels the skins still waiting.
+
+    :param source: Async or regular iterable of skins: Skin objects, encoded bytes, paths or binary files.
+    :param pattern: The pattern class or the registered name of the pattern to use for building the totems.
+                    Defaults to 'wavy'.
+    :param top_layers: A list of top layers to apply to the totems. Defaults to ALL_TOP_LAYERS.
+    :param round_head: Determines whether to round the head or not. Defaults to False.
+    :param concurrency: Maximum number of skins decoded and rendered at the same time. Defaults to 4.
+    :param max_pending: Maximum number of skins read from the source but not yielded yet. Defaults to 16.
+    :param executor: Executor running the decoding and rendering. Defaults to the default executor of the loop.
+    :param encode: Optional (format, factor) to encode every totem with in the executor too,
+                   `Totem.encode` then returns the bytes right away.
+    :param kwargs: Additional keyword arguments passed to the pattern.
+    :return: Async iterator over the built Totem objects.
+    """
+    loop = asyncio.get_running_loop()
+    settings = (resolve(pattern), top_layers if top_layers is not None else [], round_head, encode, kwargs)
+    semaphore = asyncio.Semaphore(concurrency)
+    # A slot is taken before reading the next skin and given back once its totem is yielded
+    pending = asyncio.Semaphore(max(max_pending, 1))
+    queue: asyncio.Queue[Optional[asyncio.Future]] = asyncio.Queue()
+
+    async def process(item: StreamItem) -> Totem:
+        async with semaphore:
+            return await loop.run_in_executor(executor, _process, item, settings)
+
+    async def feed():
+        items = _iterate(source)
+        try:
+            while True:
+                await pending.acquire()
+                try:
+                    item = await items.__anext__()
+                except StopAsyncIteration:
+                    break
+                # Queued right away, so a cancelled feeder never leaves a task nobody cancels
+                queue.put_nowait(asyncio.ensure_future(process(item)))
+        except Exception as error:
+            failed: asyncio.Future[Any] = loop.create_future()
+            failed.set_exception(error)
+            queue.put_nowait(failed)
+        queue.put_nowait(None)
+
+    feeder = asyncio.ensure_future(feed())
+    try:
+        while (task := await queue.get()) is not None:
+            totem = await task
+            pending.release()
+            yield totem
+    finally:
+        feeder.cancel()
+        while not queue.empty():
+            task = queue.get_nowait()
+            if task is not None:
+                task.cancel()
@@ -1,34 +1,149 @@
-from typing import Type
+from io import BytesIO
+from typing import Type, Iterable, Optional, Union, IO
 
 from PIL import Image
 
 from .layers import TopLayer
 from .exceptions import SmallScale
+from .metrics import stage
 from .patterns.abstract import Abstract
 
+DEFAULT_SCALES = (1, 2, 4, 8, 16, 32)
+
+ENCODE_FORMATS = ('png', 'webp', 'raw')
+
+# PNG compression level for palette and RGBA images, lossless WebP method; picked as fast for 16x16 images
+_DEFAULT_LEVELS = {'png': (6, 1), 'webp': 0}
+
+
+# Bits of `Totem._flags` besides the top layers, whose values don't overlap them
+_SLIM = 1
+_ROUNDED_HEAD = 2
+
+# The same size tuple shared by all totems of that size
+_SIZES: dict[tuple[int, int], tuple[int, int]] = {}
+
 
 class Totem:
     """
     The `Totem` class represents a Minecraft totem texture.
     Usually this class get after the work of a style or builder.
 
+    The totem keeps its raw RGBA pixels and packs the slim, rounded head and top layer flags into one integer,
+    so hundreds of thousands of totems can be kept in memory. The PIL image is created on first access of `image`.
+
     :param image: An Image object from PIL.
     :param pattern: The pattern used to create the totem.
     :param slim: Determines whether the totem is slim.
     :param top_layers: List of included second layers.
     :param rounded_head: Determines whether the head is rounded or not.
     """
-    def __init__(self, image: Image.Image, pattern: Type[Abstract], slim: bool, top_layers: list[TopLayer],
+    __slots__ = ('_data', '_size', '_flags', '_pattern', '_image', '_scales', '_encoded')
+
+    def __init__(self, image: Image.Image, pattern: Type[Abstract], slim: bool, top_layers: Iterable[TopLayer],
                  rounded_head: bool):
-        self.image = image
-        self.slim = slim
-        self.pattern = pattern
-        self.rounded_head = rounded_head
-        self.top_layers = top_layers
+        if image.mode != 'RGBA':
+            image = image.convert('RGBA')
+        self._set(image.tobytes(), image.size, pattern, slim, top_layers, rounded_head)
+
+    def _set(self, data: bytes, size: tuple[int, int], pattern: Type[Abstract], slim: bool,
+             top_layers: Iterable[TopLayer], rounded_head: bool):
+        flags = (_SLIM if slim else 0) | (_ROUNDED_HEAD if rounded_head else 0)
+        for layer in top_layers or ():
+            flags |= layer.value
+
+        self._data = data
+        self._size = _SIZES.setdefault(size, size)
+        self._flags = flags
+        self._pattern = pattern
+        self._image: Optional[Image.Image] = None
+        self._scales: Optional[dict[int, Image.Image]] = None
+        self._encoded: Optional[dict[tuple[str, int, Optional[int]], bytes]] = None
+
+    @classmethod
+    def from_rgba(cls, data: Union[bytes, bytearray, memoryview], pattern: Type[Abstract], slim: bool,
+                  top_layers: Iterable[TopLayer], rounded_head: bool, width: int = 16, height: int = 16) -> 'Totem':
+        """
+        Creates the totem from raw RGBA pixels without making a PIL image.
+
+        :param data: The pixels, `width * height * 4` bytes. Copied unless given as bytes.
+        :param width: Width of the totem. Defaults to 16.
+        :param height: Height of the totem. Defaults to 16.
+
+        :raises ValueError: If the length of the data doesn't match the size.
+        """
+        if len(data) != width * height * 4:
+            raise ValueError(f'Expected {width * height * 4} bytes of RGBA pixels, got {len(data)}')
+
+        totem = cls.__new__(cls)
+        totem._set(data if isinstance(data, bytes) else bytes(data), (width, height), pattern, slim, top_layers,
+                   rounded_head)
+        return totem
+
+    @property
+    def image(self) -> Image.Image:
+        """
+        The totem image, created on first access and kept afterwards; changes made to it are kept too.
+        Every access drops the memoized encodings and scale levels, so change the image through this property
+        rather than through a reference kept from before encoding.
+        """
+        self._invalidate()
+        if self._image is None:
+            self._image = self._new_image()
+        return self._image
+
+    @image.setter
+    def image(self, image: Image.Image):
+        if image.mode != 'RGBA':
+            image = image.convert('RGBA')
+        self._set(image.tobytes(), image.size, self._pattern, self.slim, self.top_layers, self.rounded_head)
+        self._image = image
+
+    def _invalidate(self):
+        """Drops everything derived from the pixels, as the image may be about to change."""
+        self._encoded = None
+        self._scales = None
+
+    def _new_image(self) -> Image.Image:
+        return Image.frombytes('RGBA', self._size, self._data)
+
+    def _source(self) -> Image.Image:
+        """The image to scale and encode from, without keeping a new one on the totem."""
+        return self._image if self._image is not None else self._new_image()
+
+    @property
+    def size(self) -> tuple[int, int]:
+        """Size of the unscaled totem as (width, height)."""
+        return self._size
+
+    @property
+    def pattern(self) -> Type[Abstract]:
+        """The pattern used to create the totem."""
+        return self._pattern
+
+    @property
+    def slim(self) -> bool:
+        """Determines whether the totem is slim."""
+        return bool(self._flags & _SLIM)
+
+    @property
+    def rounded_head(self) -> bool:
+        """Determines whether the head is rounded or not."""
+        return bool(self._flags & _ROUNDED_HEAD)
+
+    @property
+    def top_layers(self) -> list[TopLayer]:
+        """List of included second layers, in the order of TopLayer."""
+        return [layer for layer in TopLayer if self._flags & layer.value]
+
+    def tobytes(self) -> bytes:
+        """Returns the raw RGBA pixels of the unscaled totem."""
+        return self._data if self._image is None else self._image.tobytes()
 
     def scale(self, *, factor: int) -> Image.Image:
         """
         Scale method scales an image by a given factor.
+        Every pixel becomes a `factor`x`factor` square, so the result is lossless.
 
         :param factor: The factor by which the image will be scaled. Must be greater than 0.
         :rtype factor: int
@@ -39,13 +154,135 @@ class Totem:
         if factor <= 0:
             raise SmallScale()
 
-        new_image = Image.new('RGBA', (factor * self.image.width, factor * self.image.height))
-        pixels = self.image.load()
+        return self._upscale(self._source(), factor)
+
+    def scales(self, factors: Iterable[int] = DEFAULT_SCALES) -> dict[int, Image.Image]:
+        """
+        Returns the totem at several scale factors at once (an image pyramid).
+
+        Each level is built from the largest already known level whose factor divides it,
+        so 32x is made from 16x, 16x from 8x and so on. Levels are cached on the totem until `image` is accessed,
+        the returned images are shared and must not be modified.
+
+        :param factors: Scale factors to produce. Each must be greater than 0.
+        :return: A dictionary mapping each requested factor to the scaled image.
+
+        :raises SmallScale: If any scale factor is less than or equal to 0.
+        """
+        factors = list(factors)
+        if any(factor <= 0 for factor in factors):
+            raise SmallScale()
+
+        if self._scales is None:
+            self._scales = {1: self._source()}
+
+        for factor in sorted(set(factors)):
+            if factor in self._scales:
+                continue
+
+            base = max(known for known in self._scales if factor % known == 0)
+            self._scales[factor] = self._upscale(self._scales[base], factor // base)
+
+        return {factor: self._scales[factor] for factor in factors}
+
+    @staticmethod
+    def _upscale(image: Image.Image, factor: int) -> Image.Image:
+        """Nearest-neighbour upscaling by an integer factor done by Pillow in a single pass."""
+        with stage('totem.scale'):
+            if factor == 1:
+                return image.copy()
+            return image.resize((image.width * factor, image.height * factor), Image.Resampling.NEAREST)
+
+    def _palette(self, colors: list[tuple[int, tuple]]) -> Image.Image:
+        """The totem as a 'P' image with an RGBA palette made of the given colours."""
+        data = self.tobytes()
+        indexes = {}
+        palette = bytearray()
+        for _, color in colors:
+            indexes[bytes(color)] = len(indexes)
+            palette += bytes(color)
+
+        image = Image.frombytes('P', self._size, bytes(indexes[data[i:i + 4]] for i in range(0, len(data), 4)))
+        image.putpalette(palette, 'RGBA')
+        return image
+
+    def encode(self, format: str = 'png', *, factor: int = 1, level: Optional[int] = None) -> bytes:
+        """
+        Encodes the totem, scaled by the given factor. Results are memoized per (format, factor, level),
+        so repeated calls return the same bytes object without encoding again.
+
+        PNG uses an indexed palette when the totem has at most 256 colours and the image is scaled
+        (or has at most 16 colours), which is both smaller and faster to compress. WebP is always lossless.
+
+        :param format: 'png', 'webp' or 'raw' (RGBA pixels).
+        :param factor: Scale factor, see `Totem.scale`. Defaults to 1.
+        :param level: PNG compression level (0-9) or WebP method (0-6). Defaults to fast settings.
+        :return: The encoded image.
+
+        :raises SmallScale: If the scale factor is less than or equal to 0.
+        :raises ValueError: If the format is not supported.
+        """
+        key = (format, factor, level)
+        if self._encoded is None:
+            self._encoded = {}
+        data = self._encoded.get(key)
+        if data is not None:
+            return data
+
+        if format not in ENCODE_FORMATS:
+            raise ValueError(f'Unsupported format {format!r}, use one of {", ".join(ENCODE_FORMATS)}')
+        if factor <= 0:
+            raise SmallScale()
+
+        with stage(f'totem.encode.{format}'):
+            data = self._encode(format, factor, level)
+
+        self._encoded[key] = data
+        return data
+
+    def _encode(self, format: str, factor: int, level: Optional[int]) -> bytes:
+        """Encodes the totem without memoization."""
+        if format == 'raw':
+            return self.tobytes() if factor == 1 else self.scales([factor])[factor].tobytes()
+
+        output = BytesIO()
+        if format == 'webp':
+            method = _DEFAULT_LEVELS['webp'] if level is None else level
+            self.scales([factor])[factor].save(output, 'WEBP', lossless=True, exact=True, method=method,
+                                               quality=method * 100 // 6)
+            return output.getvalue()
+
+        colors = self._source().getcolors(256)
+        if colors is not None and (factor > 1 or len(colors) <= 16):
+            image = self._upscale(self._palette(colors), factor)
+            compress_level = _DEFAULT_LEVELS['png'][0] if level is None else level
+        else:
+            image = self.scales([factor])[factor]
+            compress_level = _DEFAULT_LEVELS['png'][1] if level is None else level
+
+        image.save(output, 'PNG', compress_level=compress_level)
+        return output.getvalue()
+
+    def encode_into(self, buffer: Union[IO[bytes], bytearray, memoryview], format: str = 'png', *, factor: int = 1,
+                    level: Optional[int] = None) -> int:
+        """
+        Writes the encoded totem straight into a caller-supplied buffer.
+        See `Totem.encode` for the encoding arguments.
+
+        :param buffer: A writable binary file object, or a writable buffer such as bytearray, memoryview or mmap.
+                       Buffers are written from their start.
+        :return: Number of bytes written.
+
+        :raises ValueError: If the buffer is too small.
+        """
+        data = self.encode(format, factor=factor, level=level)
 
-        for x in range(self.image.width):
-            for y in range(self.image.height):
-                for i in range(factor):
-                    for j in range(factor):
-                        new_image.putpixel((x * factor + i, y * factor + j), pixels[x, y])
+        if hasattr(buffer, 'write'):
+            buffer.write(data)
+            return len(data)
 
-        return new_image
+        view = memoryview(buffer).cast('B')
+        if len(view) < len(data):
+            raise ValueError(f'Buffer too small: {len(data)} bytes needed, {len(view)} available')
+        view[:len(data)] = data
+        return len(data)